@@ -1,28 +1,17 @@
-from PIL import Image
-import sys
-import os
+import image_utils
 
 def analyze_image(path):
     try:
-        img = Image.open(path)
-        img = img.convert('RGBA')
-        width, height = img.size
+        pixels = image_utils.load_rgba(path)
+        height, width = pixels.shape[:2]
         print(f"Image: {path}, Size: {width}x{height}")
         
-        # Get data
-        pixels = list(img.getdata())
-        
         # Analyze corners
-        corners = [
-            pixels[0],
-            pixels[width-1],
-            pixels[(height-1)*width],
-            pixels[height*width-1]
-        ]
+        corners = [tuple(int(v) for v in pixels[y, x]) for y, x in ((0, 0), (0, -1), (-1, 0), (-1, -1))]
         print(f"Corner pixels (RGBA): {corners}")
         
         # Find bounding box of non-transparent pixels
-        bbox = img.getbbox()
+        bbox = image_utils.bbox(image_utils.visible(pixels))
         if bbox:
             print(f"Non-transparent bbox: {bbox}")
             cw = bbox[2] - bbox[0]
@@ -32,28 +21,13 @@ def analyze_image(path):
         else:
             print("Image is fully transparent")
 
-        # Find bounding box of non-white pixels (assuming white is > 240, 240, 240)
-        left, top, right, bottom = width, height, 0, 0
-        found_non_white = False
-        
-        for y in range(height):
-            for x in range(width):
-                r, g, b, a = pixels[y*width + x]
-                # Check if visible and not white
-                if a > 0:
-                    if r < 250 or g < 250 or b < 250:
-                        if x < left: left = x
-                        if y < top: top = y
-                        if x > right: right = x
-                        if y > bottom: bottom = y
-                        found_non_white = True
+        # Find bounding box of visible, non-white pixels (white is >= 250 in every channel)
+        content = image_utils.bbox(image_utils.visible(pixels) & ~image_utils.near_white(pixels, 249))
         
-        if found_non_white:
-             # right and bottom are indices, so width is right - left + 1
-            content_w = right - left + 1
-            content_h = bottom - top + 1
-            print(f"Non-white content bbox: ({left}, {top}, {right+1}, {bottom+1})")
-            print(f"Non-white Content size: {content_w}x{content_h}")
+        if content:
+            left, top, right, bottom = content
+            print(f"Non-white content bbox: {content}")
+            print(f"Non-white Content size: {right - left}x{bottom - top}")
         else:
             print("No non-white pixels found")
 
@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from gemini import GeminiError, is_retryable
+from metrics import timed
+from ratelimit import TokenBucket
+
+# Requests per minute allowed by our Gemini API tier; 0 disables the rate limit
+GEMINI_RPM = float(os.environ.get("GEMINI_RPM", "1000"))
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", "20"))
+# How long a lookup may wait for a slot, and how many may wait at once
+GEMINI_QUEUE_TIMEOUT = float(os.environ.get("GEMINI_QUEUE_TIMEOUT", "5"))
+GEMINI_MAX_QUEUE = int(os.environ.get("GEMINI_MAX_QUEUE", "500"))
+# Consecutive upstream failures that open the breaker, and how long it stays open
+GEMINI_BREAKER_THRESHOLD = int(os.environ.get("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.environ.get("GEMINI_BREAKER_COOLDOWN", "30"))
+
+PREMIUM = 0
+FREE = 1
+# Work nobody is waiting on, such as pre-analyzing a PDF's vocabulary
+BACKGROUND = 2
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    """Raised instead of calling Gemini when the call would only add to an overload."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """429s, 5xx and network errors mean Gemini is struggling; a bad request or bad JSON does not."""
+    if isinstance(error, GeminiError):
+        return error.status_code is None or is_retryable(error.status_code)
+    return isinstance(error, httpx.HTTPError)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive upstream failures and rejects calls for
+    `cooldown` seconds; then lets one probe through per cooldown, closing again
+    as soon as one succeeds.
+    """
+
+    def __init__(self, threshold: int = GEMINI_BREAKER_THRESHOLD, cooldown: float = GEMINI_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_until = 0.0
+        self.opens = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now >= self.opened_until:
+            # A probe that never reports back (shed, cancelled) doesn't wedge the breaker half-open
+            self.state = "half_open"
+            self.opened_until = now + self.cooldown
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(1.0, self.opened_until - time.monotonic())
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self.opens += 1
+            self.opened_until = time.monotonic() + self.cooldown
+
+
+class GeminiScheduler:
+    """
+    Process-wide admission control in front of Gemini: calls wait in a priority
+    queue (premium users first) for a token-bucket slot matching the API tier,
+    and are rejected with `Overloaded` when the queue is full, the wait would be
+    too long, or the circuit breaker is open.
+    """
+
+    def __init__(
+        self,
+        rpm: float = GEMINI_RPM,
+        burst: int = GEMINI_BURST,
+        queue_timeout: float = GEMINI_QUEUE_TIMEOUT,
+        max_queue: int = GEMINI_MAX_QUEUE,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.bucket = TokenBucket.per_minute(rpm, burst) if rpm else None
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.breaker = breaker or CircuitBreaker()
+        self._waiters: list = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = {PREMIUM: 0, FREE: 0, BACKGROUND: 0}
+        self.shed = {"breaker": 0, "queue_full": 0, "timeout": 0}
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _estimated_wait(self, position: int) -> float:
+        return self.bucket.wait_time() + position / self.bucket.rate
+
+    def _reject(self, reason: str, message: str, retry_after: float):
+        self.shed[reason] += 1
+        raise Overloaded(message, math.ceil(retry_after))
+
+    async def acquire(self, priority: int = FREE):
+        """Waits for permission to send one Gemini request."""
+        if not self.breaker.allow():
+            self._reject("breaker", "Gemini is unavailable; circuit breaker open.", self.breaker.retry_after())
+
+        # Callers already queued go first, even when a token happens to be free
+        if self.bucket is not None and (self._waiters or not self.bucket.try_acquire()):
+            # Shed right away rather than after waiting out a timeout we already know we'd hit
+            queued = [p for p, _, future in self._waiters if not future.done()]
+            ahead = sum(1 for p in queued if p <= priority)
+            if len(queued) >= self.max_queue or self._estimated_wait(ahead) > self.queue_timeout:
+                self._reject("queue_full", "Too many analyses queued; try again shortly.", self._estimated_wait(len(queued)))
+
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            if self._dispatcher is None:
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            try:
+                with timed("admission"):
+                    await asyncio.wait_for(future, self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("timeout", "Timed out waiting for a Gemini slot.", self.queue_timeout)
+
+        self.admitted[priority] += 1
+
+    async def _dispatch(self):
+        """Hands out tokens as they refill, always to the highest-priority, longest-waiting caller."""
+        try:
+            while self._waiters:
+                future = self._waiters[0][2]
+                if future.done():
+                    # Callers that timed out or disconnected don't use up a token
+                    heapq.heappop(self._waiters)
+                    continue
+                if not self.bucket.try_acquire():
+                    await asyncio.sleep(self.bucket.wait_time())
+                    continue
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+        finally:
+            self._dispatcher = None
+
+    def record(self, error: Optional[BaseException] = None):
+        """Feeds the outcome of an admitted call to the circuit breaker."""
+        if error is not None and is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            # Gemini answered, even if the answer was unusable
+            self.breaker.record_success()
+
+    async def run(self, fn: Callable[[], Awaitable[T]], priority: int = FREE) -> T:
+        await self.acquire(priority)
+        try:
+            result = await fn()
+        except Exception as e:
+            self.record(e)
+            raise
+        self.record()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "queued": self.queued,
+            "admitted": {"premium": self.admitted[PREMIUM], "free": self.admitted[FREE], "background": self.admitted[BACKGROUND]},
+            "shed": dict(self.shed)
+        }
+
+
+gemini_scheduler = GeminiScheduler()
+
+
+def get_gemini_scheduler() -> GeminiScheduler:
+    return gemini_scheduler
@@ -0,0 +1,119 @@
+"""
+Stand-in for the Gemini generateContent and streamGenerateContent endpoints, used by the load tests.
+
+Usage:
+    python -m bench.fake_gemini --port 8090 --latency-ms 300 --jitter-ms 100 --error-rate 0.02
+
+Point the backend at it with GEMINI_API_BASE=http://127.0.0.1:8090 (any GEMINI_API_KEY works).
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Batch prompts embed the word list as a JSON array; single prompts quote the word
+WORD_LIST = re.compile(r'\[\s*("[^"\]]*"(?:\s*,\s*"[^"\]]*")*)\s*\]')
+QUOTED_WORD = re.compile(r'"([A-Za-z][A-Za-z\'-]*)"')
+STREAM_CHUNK_CHARS = 24
+STREAM_FIRST_CHUNK = 0.2
+
+
+def etymology(word: str) -> dict:
+    return {
+        "root": f"{word[:4]} (stand-in root)",
+        "prefix": "None",
+        "suffix": "None",
+        "translation": "测试释义",
+        "desc": f"{word} 的测试词源说明",
+    }
+
+
+def answer(prompt: str, json_mode: bool = False) -> str:
+    words = WORD_LIST.search(prompt)
+    if words:
+        return json.dumps([{"word": w, **etymology(w)} for w in json.loads(f"[{words.group(1)}]")], ensure_ascii=False)
+    word = QUOTED_WORD.search(prompt)
+    text = json.dumps(etymology(word.group(1) if word else "word"), ensure_ascii=False)
+    # Without JSON response mode the model tends to wrap its answer in a Markdown fence
+    return text if json_mode else "```json\n" + text + "\n```"
+
+
+def chunk(prompt: str, text: str, sent: str, finish_reason: Optional[str] = None) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}}
+    if finish_reason:
+        candidate["finishReason"] = finish_reason
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(sent) // 4,
+            "totalTokenCount": (len(prompt) + len(sent)) // 4,
+        },
+    }
+
+
+async def stream_chunks(prompt: str, text: str, delay: float):
+    """Splits the answer into pieces spread over `delay`, like token-by-token generation."""
+    pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+    for index, piece in enumerate(pieces):
+        if index:
+            await asyncio.sleep(delay / len(pieces))
+        last = index == len(pieces) - 1
+        sent = text[:(index + 1) * STREAM_CHUNK_CHARS]
+        yield f"data: {json.dumps(chunk(prompt, piece, sent, 'STOP' if last else None), ensure_ascii=False)}\r\n\r\n"
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    app.state.calls = 0
+
+    @app.post("/models/{target}")
+    async def generate(target: str, request: Request):
+        app.state.calls += 1
+        delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000 if jitter_ms else latency_ms / 1000
+        streaming = target.endswith(":streamGenerateContent")
+        # Streamed answers start after a fifth of the latency and finish at the same time as unary ones
+        first_byte = delay * STREAM_FIRST_CHUNK if streaming else delay
+        if first_byte:
+            await asyncio.sleep(first_byte)
+
+        if random.random() < error_rate:
+            status = random.choice([429, 503])
+            return JSONResponse({"error": {"code": status, "message": "Injected failure"}}, status_code=status)
+
+        body = await request.json()
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        json_mode = (body.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+        text = answer(prompt, json_mode)
+        if streaming:
+            return StreamingResponse(stream_chunks(prompt, text, delay - first_byte), media_type="text/event-stream")
+        return chunk(prompt, text, text, "STOP")
+
+    @app.get("/stats")
+    def stats():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 429/503")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
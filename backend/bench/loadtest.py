@@ -0,0 +1,351 @@
+"""
+Drives a realistic traffic mix against the backend and reports RPS and tail latency per route.
+
+The backend runs as a separate uvicorn process on the SQLite storage backend,
+talking to bench/fake_gemini.py instead of Gemini, so nothing leaves the machine.
+
+Usage (from backend/):
+    python -m bench.loadtest
+    python -m bench.loadtest --concurrency 1,16,64 --duration 20 --output bench.json
+    python -m bench.loadtest --gemini-latency-ms 800 --gemini-error-rate 0.05 --vocabulary 5000
+    python -m bench.loadtest --mix analyze=1 --concurrency 32
+
+Results are JSON, one entry per concurrency level, so runs on different commits can be diffed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+import httpx
+import jwt
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = "bench-secret-bench-secret-bench-secret"
+
+DEFAULT_MIX = "analyze=50,wordbook_list=15,wordbook_add=10,user_me=15,pdf_list=5,pdf_update=5"
+
+BASE_WORDS = [
+    "abandon", "benevolent", "capture", "deduction", "eloquent", "fracture", "generate", "hydrate",
+    "inspect", "journal", "kinetic", "liberate", "malfunction", "neglect", "obstruct", "portable",
+    "quarantine", "reconstruct", "submarine", "transport", "unicycle", "vivid", "wardrobe", "xenophobia",
+    "yearning", "zealous", "abduct", "bicycle", "contradict", "dictionary", "export", "incredible",
+    "manuscript", "predict", "spectator", "telephone", "universe", "visible", "biology", "autograph",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    samples = sorted(latencies)
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown route in --mix: {name} (choose from {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def vocabulary(size: int) -> List[str]:
+    words = list(BASE_WORDS[:size])
+    while len(words) < size:
+        words.append(f"{BASE_WORDS[len(words) % len(BASE_WORDS)]}{len(words) // len(BASE_WORDS)}")
+    return words
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Users and seed data
+
+class BenchUser:
+    def __init__(self, user_id: str):
+        self.id = user_id
+        self.pdf_id = str(uuid.uuid4())
+        token = jwt.encode(
+            {"sub": user_id, "email": f"{user_id}@bench.local", "aud": "authenticated", "role": "authenticated",
+             "exp": int(time.time()) + 24 * 3600},
+            JWT_SECRET,
+            algorithm="HS256",
+        )
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+def seed(db_path: str, users: List[BenchUser], words: List[str], wordbook_size: int):
+    """Writes profiles, wordbook rows and one PDF per user straight into the SQLite file."""
+    sys.path.insert(0, BACKEND_DIR)
+    from storage.sqlite_backend import SCHEMA, now
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    with conn:
+        # Premium users, so the free quota never turns the run into a stream of 403s
+        conn.executemany(
+            "insert into profiles (id, email, is_premium, query_usage_current_month, created_at) values (?, ?, 1, 0, ?)",
+            [(u.id, f"{u.id}@bench.local", now()) for u in users],
+        )
+        conn.executemany(
+            "insert into wordbook (id, user_id, word, parsed_data, created_at) values (?, ?, ?, ?, ?)",
+            [
+                (str(uuid.uuid4()), u.id, w, json.dumps({"root": w}), now())
+                for u in users for w in random.sample(words, min(wordbook_size, len(words)))
+            ],
+        )
+        conn.executemany(
+            "insert into user_pdfs (id, user_id, filename, storage_path, last_page, uploaded_at) values (?, ?, ?, ?, 1, ?)",
+            [(u.pdf_id, u.id, "bench.pdf", f"{u.id}/bench.pdf", now()) for u in users],
+        )
+    conn.close()
+
+
+# Processes
+
+def wait_until_up(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+
+@contextmanager
+def running(command: List[str], env: dict, health_url: str):
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_up(health_url)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# Traffic
+
+async def analyze(client, user, words):
+    return await client.post("/analyze/", params={"word": random.choice(words)}, headers=user.headers)
+
+
+async def wordbook_list(client, user, words):
+    return await client.get("/wordbook/", params={"limit": 20}, headers=user.headers)
+
+
+async def wordbook_add(client, user, words):
+    word = random.choice(words)
+    return await client.post("/wordbook/", json={"word": word, "parsed_data": {"root": word}}, headers=user.headers)
+
+
+async def user_me(client, user, words):
+    return await client.get("/user/me", headers=user.headers)
+
+
+async def pdf_list(client, user, words):
+    return await client.get("/pdf/", headers=user.headers)
+
+
+async def pdf_update(client, user, words):
+    return await client.patch(f"/pdf/{user.pdf_id}", json={"last_page": random.randint(1, 300), "annotations": None}, headers=user.headers)
+
+
+SCENARIOS = {
+    "analyze": analyze,
+    "wordbook_list": wordbook_list,
+    "wordbook_add": wordbook_add,
+    "user_me": user_me,
+    "pdf_list": pdf_list,
+    "pdf_update": pdf_update,
+}
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, warmup: float, mix: Dict[str, float],
+                    users: List[BenchUser], words: List[str]) -> dict:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    status_codes = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        started = time.monotonic()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    return
+                name = random.choices(names, weights)[0]
+                t0 = time.perf_counter()
+                try:
+                    response = await SCENARIOS[name](client, random.choice(users), words)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0
+                elapsed = time.perf_counter() - t0
+                if now < measure_from:
+                    continue
+                status_codes[status] += 1
+                if 200 <= status < 300:
+                    latencies[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+        cpu_started = time.process_time()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        # A load generator pinned near one core measures itself, not the backend
+        client_cpu = (time.process_time() - cpu_started) / (time.monotonic() - started)
+
+    routes = {name: summarize(latencies[name], errors[name], duration) for name in names}
+    everything = [sample for name in names for sample in latencies[name]]
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "total": summarize(everything, sum(errors.values()), duration),
+        "status_codes": {str(code): n for code, n in sorted(status_codes.items())},
+        "client_cpu": round(client_cpu, 2),
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the backend against a fake Gemini and SQLite")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Route weights, e.g. analyze=5,user_me=1")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=500, help="Distinct words looked up (controls cache hit ratio)")
+    parser.add_argument("--wordbook-size", type=int, default=50, help="Seeded wordbook rows per user")
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the backend")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    words = vocabulary(args.vocabulary)
+    users = [BenchUser(f"00000000-0000-4000-8000-{i:012d}") for i in range(args.users)]
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    with tempfile.TemporaryDirectory(prefix="word-parser-bench-") as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        seed(db_path, users, words, args.wordbook_size)
+
+        gemini_port, app_port = free_port(), free_port()
+        env = {
+            **os.environ,
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_PATH": db_path,
+            "GEMINI_API_BASE": f"http://127.0.0.1:{gemini_port}",
+            "GEMINI_API_KEY": "bench",
+            "SUPABASE_JWT_SECRET": JWT_SECRET,
+            "GEMINI_BACKOFF": "0.05",
+            # The fake server has no quota; set GEMINI_RPM to measure admission control itself
+            "GEMINI_RPM": os.environ.get("GEMINI_RPM", "0"),
+        }
+        env.pop("SUPABASE_URL", None)
+
+        fake_gemini = [
+            sys.executable, "-m", "bench.fake_gemini", "--port", str(gemini_port),
+            "--latency-ms", str(args.gemini_latency_ms), "--jitter-ms", str(args.gemini_jitter_ms),
+            "--error-rate", str(args.gemini_error_rate),
+        ]
+        backend = [
+            sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ]
+
+        with running(fake_gemini, env, f"http://127.0.0.1:{gemini_port}/stats"), \
+                running(backend, env, f"http://127.0.0.1:{app_port}/health"):
+            results = []
+            for level in levels:
+                print(f"Running concurrency {level} for {args.duration:g}s...", file=sys.stderr)
+                result = asyncio.run(run_level(
+                    f"http://127.0.0.1:{app_port}", level, args.duration, args.warmup, mix, users, words
+                ))
+                if result["client_cpu"] > 0.8:
+                    print(f"Warning: the load generator used {result['client_cpu']:.0%} of a core; "
+                          "results at this level are client-bound.", file=sys.stderr)
+                results.append(result)
+            gemini_calls = httpx.get(f"http://127.0.0.1:{gemini_port}/stats").json()["calls"]
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "config": {
+            "mix": mix,
+            "users": args.users,
+            "vocabulary": args.vocabulary,
+            "wordbook_size": args.wordbook_size,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "gemini_jitter_ms": args.gemini_jitter_ms,
+            "gemini_error_rate": args.gemini_error_rate,
+            "workers": args.workers,
+        },
+        "gemini_calls": gemini_calls,
+        "levels": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
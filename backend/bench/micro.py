@@ -0,0 +1,158 @@
+"""
+Micro-benchmarks for the per-request CPU work: parsing Gemini responses, verifying tokens,
+cursors and the offline morphological analyzer.
+
+Usage (from backend/):
+    python -m bench.micro
+    python -m bench.micro --only auth --output micro.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = "bench-secret-bench-secret-bench-secret"
+
+# deps.py reads its configuration at import time
+os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+os.environ.pop("SUPABASE_URL", None)
+sys.path.insert(0, BACKEND_DIR)
+
+import jwt  # noqa: E402
+
+import deps  # noqa: E402
+from bench.fake_gemini import answer  # noqa: E402
+from morphology import MorphAnalyzer  # noqa: E402
+from pagination import decode_cursor, encode_cursor  # noqa: E402
+from prompts import PartialAnswer, batch_request, etymology_request, parse_batch, parse_etymology, response_text  # noqa: E402
+
+
+def gemini_response(payload: dict) -> dict:
+    prompt = payload["contents"][0]["parts"][0]["text"]
+    return {"candidates": [{"content": {"parts": [{"text": answer(prompt, json_mode=True)}]}}]}
+
+
+def bench(fn: Callable, repeat: int, number: int) -> dict:
+    """Best-of-`repeat` timing of `number` calls, reported per call."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    best = min(runs)
+    return {
+        "calls": number * repeat,
+        "best_us": round(best * 1e6, 3),
+        "median_us": round(statistics.median(runs) * 1e6, 3),
+        "ops_per_s": round(1 / best) if best else None,
+    }
+
+
+def bench_async(coro_fn: Callable, repeat: int, number: int) -> dict:
+    loop = asyncio.new_event_loop()
+    try:
+        return bench(lambda: loop.run_until_complete(coro_fn()), repeat, number)
+    finally:
+        loop.close()
+
+
+def parse_benchmarks(repeat: int, number: int) -> Dict[str, dict]:
+    single = gemini_response(etymology_request("reconstruct"))
+    words = [f"word{i}" for i in range(50)]
+    batch = gemini_response(batch_request(words))
+    # The same answer cut off halfway, as after hitting the output token limit
+    truncated = response_text(single)[:len(response_text(single)) * 3 // 4]
+
+    def parse_truncated():
+        try:
+            parse_etymology(truncated)
+        except PartialAnswer:
+            pass
+
+    return {
+        "parse_single": bench(lambda: parse_etymology(response_text(single)), repeat, number),
+        "parse_single_truncated": bench(parse_truncated, repeat, number),
+        "parse_batch_50": bench(lambda: parse_batch(response_text(batch), words), repeat, max(1, number // 20)),
+    }
+
+
+def auth_benchmarks(repeat: int, number: int) -> Dict[str, dict]:
+    claims = {"sub": "00000000-0000-4000-8000-000000000001", "aud": "authenticated", "exp": int(time.time()) + 3600}
+    token = jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+    header = f"Bearer {token}"
+
+    async def cached():
+        return await deps.get_current_user(header)
+
+    async def uncached():
+        deps.auth_cache.clear()
+        return await deps.get_current_user(header)
+
+    return {
+        "jwt_verify_hs256": bench(lambda: deps.verify_token_locally(token), repeat, number),
+        "get_current_user_cold": bench_async(uncached, repeat, number),
+        "get_current_user_cached": bench_async(cached, repeat, number),
+    }
+
+
+def cursor_benchmarks(repeat: int, number: int) -> Dict[str, dict]:
+    cursor = encode_cursor("2024-05-01T12:30:45.123456+00:00", "6f1c2e0a-5b7d-4e8f-9a0b-1c2d3e4f5a6b")
+    return {
+        "cursor_encode": bench(lambda: encode_cursor("2024-05-01T12:30:45.123456+00:00", "6f1c2e0a-5b7d-4e8f-9a0b-1c2d3e4f5a6b"), repeat, number),
+        "cursor_decode": bench(lambda: decode_cursor(cursor), repeat, number),
+    }
+
+
+def offline_benchmarks(repeat: int, number: int) -> Dict[str, dict]:
+    analyzer = MorphAnalyzer.load()
+    return {
+        "offline_transparent": bench(lambda: analyzer.analyze("unhappiness"), repeat, number),
+        "offline_unsegmentable": bench(lambda: analyzer.analyze("xenophobia"), repeat, number),
+    }
+
+
+GROUPS = {
+    "parse": parse_benchmarks,
+    "auth": auth_benchmarks,
+    "cursor": cursor_benchmarks,
+    "offline": offline_benchmarks,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run backend micro-benchmarks")
+    parser.add_argument("--only", help=f"Comma-separated groups ({', '.join(GROUPS)})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=2000, help="Calls per timed run")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    results = {}
+    for name in groups:
+        if name not in GROUPS:
+            raise SystemExit(f"Unknown group: {name}")
+        results.update(GROUPS[name](args.repeat, args.number))
+
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+
+    output = json.dumps({"commit": commit, "python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
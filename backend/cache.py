@@ -0,0 +1,236 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+ETYMOLOGY_CACHE_SIZE = int(os.environ.get("ETYMOLOGY_CACHE_SIZE", "20000"))
+ETYMOLOGY_CACHE_TTL = int(os.environ.get("ETYMOLOGY_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def normalize_word(word: str) -> str:
+    return word.strip().lower()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a size bound and a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight coroutine."""
+
+    def __init__(self):
+        self._calls: dict = {}
+
+    async def do(self, key, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns `(result, shared)`; `shared` is True when another caller ran `fn`."""
+        future = self._calls.get(key)
+        if future is not None:
+            # Shield so a disconnecting follower does not cancel the shared call.
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when there are no followers
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._calls.pop(key, None)
+
+
+class EtymologyCache:
+    """
+    Two-tier cache for etymology results: an in-process LRU in front of the
+    shared `etymology_cache` table, keyed by normalized word and prompt version.
+    """
+
+    def __init__(self, maxsize: int = ETYMOLOGY_CACHE_SIZE, ttl: float = ETYMOLOGY_CACHE_TTL):
+        self.memory = TTLCache(maxsize, ttl)
+        self.flights = SingleFlight()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    async def _load(self, storage, words: List[str], prompt_version: str) -> Dict[str, dict]:
+        try:
+            return await storage.get_etymologies(words, prompt_version)
+        except Exception as e:
+            # The persistent tier is best-effort; fall through to the model.
+            print(f"Etymology cache read failed: {e}")
+            return {}
+
+    async def _store(self, storage, entries: Dict[str, dict], prompt_version: str):
+        try:
+            await storage.put_etymologies(entries, prompt_version)
+        except Exception as e:
+            print(f"Etymology cache write failed: {e}")
+
+    async def get(self, storage, word: str, prompt_version: str) -> Tuple[Optional[dict], Optional[str]]:
+        key = (word, prompt_version)
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data, "memory"
+
+        if storage is not None:
+            data = (await self._load(storage, [word], prompt_version)).get(word)
+            if data is not None:
+                self.db_hits += 1
+                self.memory.set(key, data)
+                return data, "db"
+
+        return None, None
+
+    async def get_or_fetch(self, storage, word: str, prompt_version: str, fetch: Callable[[str], Awaitable[dict]]) -> Tuple[dict, str]:
+        """
+        Returns `(data, source)` where source is "memory", "db", "shared" or "miss".
+        Concurrent misses for the same word share a single `fetch` call.
+        """
+        word = normalize_word(word)
+        data = self.memory.get((word, prompt_version))
+        if data is not None:
+            self.memory_hits += 1
+            return data, "memory"
+
+        async def load():
+            cached, cached_source = await self.get(storage, word, prompt_version)
+            if cached is not None:
+                return cached, cached_source
+            self.misses += 1
+            fresh = await fetch(word)
+            self.memory.set((word, prompt_version), fresh)
+            if storage is not None:
+                await self._store(storage, {word: fresh}, prompt_version)
+            return fresh, "miss"
+
+        # The persistent lookup runs inside the flight too, so a burst of
+        # requests for a cold word costs one table read and one Gemini call.
+        (data, source), shared = await self.flights.do((word, prompt_version), load)
+        if shared:
+            self.shared_hits += 1
+            source = "shared"
+        return data, source
+
+    async def get_many(self, storage, words: List[str], prompt_version: str) -> Dict[str, dict]:
+        """Looks up already-normalized words, using one table query for everything not in memory."""
+        found = {}
+        missing = []
+        for word in words:
+            data = self.memory.get((word, prompt_version))
+            if data is not None:
+                found[word] = data
+            else:
+                missing.append(word)
+        self.memory_hits += len(found)
+
+        if missing and storage is not None:
+            loaded = await self._load(storage, missing, prompt_version)
+            for word, data in loaded.items():
+                self.memory.set((word, prompt_version), data)
+            self.db_hits += len(loaded)
+            found.update(loaded)
+
+        self.misses += len(words) - len(found)
+        return found
+
+    async def get_stale(self, storage, words: List[str], prompt_versions: List[str]) -> Dict[str, dict]:
+        """
+        Looks up entries written under older prompt versions, newest first. Used only
+        when Gemini can't be reached; not counted as hits or misses.
+        """
+        found = {}
+        for version in prompt_versions:
+            missing = []
+            for word in words:
+                if word in found:
+                    continue
+                data = self.memory.get((word, version))
+                if data is not None:
+                    found[word] = data
+                else:
+                    missing.append(word)
+            if missing and storage is not None:
+                found.update(await self._load(storage, missing, version))
+        self.stale_hits += len(found)
+        return found
+
+    async def store(self, storage, word: str, prompt_version: str, data: dict):
+        """Caches an entry the caller generated itself after `get` missed; counted as a miss."""
+        self.misses += 1
+        self.memory.set((word, prompt_version), data)
+        if storage is not None:
+            await self._store(storage, {word: data}, prompt_version)
+
+    async def put_many(self, storage, entries: Dict[str, dict], prompt_version: str):
+        if not entries:
+            return
+        for word, data in entries.items():
+            self.memory.set((word, prompt_version), data)
+        if storage is not None:
+            await self._store(storage, entries, prompt_version)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.db_hits + self.shared_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self.memory)
+        }
+
+
+etymology_cache = EtymologyCache()
+
+
+def get_etymology_cache() -> EtymologyCache:
+    return etymology_cache
@@ -1,5 +1,8 @@
 import os
-from supabase import create_client, Client
+from typing import Optional
+
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,15 +10,44 @@ load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 
-if not url or not key:
-    # Fail gracefully if env vars are missing during import time, 
-    # but actual calls will fail.
-    print("Warning: SUPABASE_URL or SUPABASE_KEY not found in environment.")
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "10"))
+
+supabase: Optional[AsyncClient] = None
+http_client: Optional[httpx.AsyncClient] = None
+
+async def init_supabase() -> Optional[AsyncClient]:
+    """Creates the async Supabase client on one pooled HTTP client. Called from the app lifespan."""
+    global supabase, http_client
+    if supabase is not None:
+        return supabase
+
+    if not url or not key:
+        # Fail gracefully if env vars are missing at startup,
+        # but actual calls will fail.
+        print("Warning: SUPABASE_URL or SUPABASE_KEY not found in environment.")
+        return None
+
+    http_client = httpx.AsyncClient(
+        timeout=SUPABASE_TIMEOUT,
+        limits=httpx.Limits(max_connections=SUPABASE_MAX_CONNECTIONS, max_keepalive_connections=SUPABASE_MAX_CONNECTIONS),
+    )
+    options = AsyncClientOptions(
+        httpx_client=http_client,
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    supabase = await acreate_client(url, key, options=options)
+    return supabase
+
+async def close_supabase():
+    global supabase, http_client
+    if http_client is not None:
+        await http_client.aclose()
     supabase = None
-else:
-    supabase: Client = create_client(url, key)
+    http_client = None
 
-def get_supabase() -> Client:
+def get_supabase() -> AsyncClient:
     if not supabase:
         raise Exception("Supabase client not initialized. Check environment variables.")
     return supabase
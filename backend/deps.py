@@ -1,18 +1,136 @@
-from fastapi import Header, HTTPException, Depends
-from supabase import Client
-from .database import get_supabase
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
 
-async def get_current_user(authorization: str = Header(None), supabase: Client = Depends(get_supabase)):
+import jwt
+from fastapi import Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from database import get_supabase
+from cache import TTLCache
+from metrics import timed
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+# Legacy Supabase projects sign access tokens with this HS256 secret;
+# projects on asymmetric keys are verified against the JWKS endpoint instead.
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.environ.get("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+# Call supabase.auth.get_user when a token cannot be verified locally
+AUTH_REMOTE_FALLBACK = os.environ.get("AUTH_REMOTE_FALLBACK", "false").lower() == "true"
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", "300"))
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+@dataclass
+class AuthUser:
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    expires_at: float = 0
+    claims: dict = field(default_factory=dict)
+
+
+class LocalVerificationUnavailable(Exception):
+    pass
+
+
+auth_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+jwks_client = jwt.PyJWKClient(SUPABASE_JWKS_URL, cache_keys=True) if SUPABASE_JWKS_URL else None
+
+
+def verify_token_locally(token: str) -> AuthUser:
+    alg = jwt.get_unverified_header(token).get("alg")
+
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET not configured")
+        key = SUPABASE_JWT_SECRET
+    elif alg in ASYMMETRIC_ALGORITHMS:
+        if not jwks_client:
+            raise LocalVerificationUnavailable("No JWKS endpoint configured")
+        try:
+            key = jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as e:
+            raise LocalVerificationUnavailable(str(e))
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {alg}")
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+    return AuthUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        expires_at=claims["exp"],
+        claims=claims,
+    )
+
+
+async def verify_token_remotely(token: str) -> AuthUser:
+    # Verify the token with Supabase Auth
+    user = await get_supabase().auth.get_user(token)
+    if not user or not user.user:
+        raise HTTPException(status_code=401, detail="Invalid Token or Session Expired")
+    # The signature was checked remotely; the unverified expiry only bounds how long we cache it
+    exp = jwt.decode(token, options={"verify_signature": False}).get("exp") or time.time() + AUTH_CACHE_TTL
+    return AuthUser(
+        id=user.user.id,
+        email=user.user.email,
+        role=user.user.role,
+        expires_at=exp,
+    )
+
+
+async def get_current_user(authorization: str = Header(None)) -> AuthUser:
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
-    
+
+    with timed("auth"):
+        return await authenticate(authorization)
+
+
+async def authenticate(authorization: str) -> AuthUser:
     token = authorization.replace("Bearer ", "")
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+
+    cached = auth_cache.get(cache_key)
+    if cached is not None:
+        if cached.expires_at > time.time():
+            return cached
+        auth_cache.pop(cache_key)
+        raise HTTPException(status_code=401, detail="Invalid Token or Session Expired")
+
     try:
-        # Verify the token with Supabase Auth
-        user = supabase.auth.get_user(token)
-        if not user:
-             raise HTTPException(status_code=401, detail="Invalid Token or Session Expired")
-        return user.user
+        try:
+            if jwt.get_unverified_header(token).get("alg") == "HS256":
+                user = verify_token_locally(token)
+            else:
+                # Fetching the JWKS is blocking I/O, but only happens on a key cache miss
+                user = await run_in_threadpool(verify_token_locally, token)
+        except LocalVerificationUnavailable as e:
+            if not AUTH_REMOTE_FALLBACK:
+                raise
+            print(f"Local token verification unavailable ({e}), falling back to Supabase Auth")
+            user = await verify_token_remotely(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Invalid Token or Session Expired")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Auth Error: {e}")
         raise HTTPException(status_code=401, detail="Authentication Failed")
+
+    auth_cache.set(cache_key, user)
+    return user
@@ -0,0 +1,145 @@
+"""
+Offline etymology bundle: a compact binary dictionary shipped inside the extension,
+so common words are answered without a network call.
+
+Layout, all integers little-endian u32 unless noted:
+
+    header       magic "ETYB", format (u16), reserved (u16), entry count, metadata length
+    metadata     UTF-8 JSON, space-padded to a multiple of 4 bytes
+    key offsets  count + 1 offsets into the key blob
+    values       count (offset, length) pairs into the value blob
+    key blob     UTF-8 words sorted bytewise, for binary search
+    value blob   compact JSON entries; words with identical entries share one
+
+background.js reads the same layout. Bump FORMAT_VERSION on any change; readers skip
+bundles of a format they don't know instead of misreading them.
+"""
+import json
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"ETYB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode(entries: Dict[str, dict], metadata: Optional[dict] = None) -> bytes:
+    """Packs {word: entry} into a bundle; the same input always gives the same bytes."""
+    words = sorted(entries, key=lambda w: w.encode("utf-8"))
+    meta = _json(metadata or {})
+    meta += b" " * (-len(meta) % 4)
+
+    keys = bytearray()
+    key_offsets = [0]
+    values = bytearray()
+    value_index: List[int] = []
+    shared: Dict[bytes, int] = {}
+    for word in words:
+        keys += word.encode("utf-8")
+        key_offsets.append(len(keys))
+        value = _json(entries[word])
+        if value not in shared:
+            shared[value] = len(values)
+            values += value
+        value_index += (shared[value], len(value))
+
+    return b"".join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(words), len(meta)),
+        meta,
+        struct.pack(f"<{len(key_offsets)}I", *key_offsets),
+        struct.pack(f"<{len(value_index)}I", *value_index),
+        bytes(keys),
+        bytes(values),
+    ])
+
+
+class Bundle:
+    """Read access to an encoded bundle, searching it the same way background.js does."""
+
+    def __init__(self, data: bytes):
+        if len(data) < HEADER.size:
+            raise BundleError("Truncated bundle header")
+        magic, version, _, count, meta_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise BundleError("Not an etymology bundle")
+        if version != FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle format {version}, expected {FORMAT_VERSION}")
+
+        pos = HEADER.size
+        self.metadata = json.loads(data[pos:pos + meta_length] or b"{}")
+        pos += meta_length
+        try:
+            self._key_offsets = struct.unpack_from(f"<{count + 1}I", data, pos)
+            pos += 4 * (count + 1)
+            self._values = struct.unpack_from(f"<{2 * count}I", data, pos)
+            pos += 8 * count
+        except struct.error:
+            raise BundleError("Truncated bundle index")
+        self._keys_start = pos
+        self._values_start = pos + self._key_offsets[-1]
+        end = max((self._values[2 * i] + self._values[2 * i + 1] for i in range(count)), default=0)
+        if self._values_start + end > len(data):
+            raise BundleError("Truncated bundle data")
+        self._data = data
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, index: int) -> bytes:
+        return self._data[self._keys_start + self._key_offsets[index]:self._keys_start + self._key_offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._key(i).decode("utf-8") for i in range(self.count))
+
+    def get(self, word: str) -> Optional[dict]:
+        target = word.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            key = self._key(middle)
+            if key < target:
+                low = middle + 1
+            elif key > target:
+                high = middle
+            else:
+                offset, length = self._values[2 * middle], self._values[2 * middle + 1]
+                start = self._values_start + offset
+                return json.loads(self._data[start:start + length])
+        return None
+
+
+def deflated_size(data: bytes) -> int:
+    """About what the bundle adds to the zip, which stores it deflated at level 9."""
+    return len(zlib.compress(data, 9))
+
+
+def fit(ranked: List[Tuple[str, dict]], max_bytes: int, metadata: Optional[dict] = None) -> Tuple[bytes, int]:
+    """
+    The bundle of the longest prefix of `ranked` (best words first) whose deflated size
+    stays within `max_bytes`; returns it with the number of words it holds.
+    """
+    def build(n: int) -> bytes:
+        return encode(dict(ranked[:n]), metadata)
+
+    data = build(len(ranked))
+    if deflated_size(data) <= max_bytes:
+        return data, len(ranked)
+    # Binary search on the prefix length; size grows with it
+    low, high = 0, len(ranked)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if deflated_size(build(middle)) <= max_bytes:
+            low = middle
+        else:
+            high = middle - 1
+    return build(low), low
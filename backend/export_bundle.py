@@ -0,0 +1,131 @@
+"""
+Exports etymologies into the extension's offline bundle (format in etymology_bundle.py).
+
+Usage:
+    python export_bundle.py --output bundle.bin
+    python export_bundle.py --words words.txt --limit 20000 --max-kb 96 --output bundle.bin
+    python export_bundle.py --json entries.json --output bundle.bin
+
+Words are taken most frequent first from a frequency list in warm_cache.py's format
+(default: data/common_words.txt) and looked up under their lemma in the etymology cache
+for the current PROMPT_VERSION, or in a {word: entry} JSON file with --json (whose own
+order is used when no list is given). Both the lemma and the word as listed are bundled,
+since the extension looks words up without lemmatizing. Words are added until the
+bundle's deflated size reaches --max-kb. pack_extension.py --bundle runs this.
+Uses the same environment as the server (STORAGE_BACKEND, SQLITE_PATH, ...).
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import etymology_bundle  # noqa: E402
+from cache import normalize_word  # noqa: E402
+from lemmatizer import get_lemmatizer  # noqa: E402
+from prompts import PROMPT_VERSION  # noqa: E402
+from storage import close_storage, init_storage  # noqa: E402
+from vocabulary import COMMON_WORDS  # noqa: E402
+from warm_cache import LOOKUP_CHUNK, WORD, load_words  # noqa: E402
+
+DEFAULT_MAX_KB = 96
+
+
+def read_common_words(path: str = COMMON_WORDS, limit: Optional[int] = None) -> List[str]:
+    """The common-words list in file order, which is roughly most frequent first."""
+    words = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith("#"):
+                words.extend(line.split())
+    words = list(dict.fromkeys(words))
+    return words[:limit] if limit else words
+
+
+def load_json_entries(path: str) -> Dict[str, dict]:
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, dict):
+        raise SystemExit(f"{path} must hold a {{word: entry}} object")
+    return {normalize_word(word): entry for word, entry in entries.items() if isinstance(entry, dict)}
+
+
+async def load_cached_entries(lemmas: List[str]) -> Dict[str, dict]:
+    storage = await init_storage()
+    if storage is None:
+        raise SystemExit("No storage configured; nothing to export from (see STORAGE_BACKEND).")
+    try:
+        entries = {}
+        for start in range(0, len(lemmas), LOOKUP_CHUNK):
+            entries.update(await storage.get_etymologies(lemmas[start:start + LOOKUP_CHUNK], PROMPT_VERSION))
+        return entries
+    finally:
+        await close_storage()
+
+
+def rank(words: List[str], entries: Dict[str, dict]) -> List[Tuple[str, dict]]:
+    """
+    (key, entry) pairs in list order: each word's lemma, then the word itself if it differs,
+    answered like the API would (with its lemma's entry) unless it has one of its own.
+    """
+    lemmatizer = get_lemmatizer()
+    ranked = {}
+    for word in words:
+        lemma = lemmatizer.lemmatize(word) if lemmatizer else word
+        if lemma in entries:
+            ranked.setdefault(lemma, entries[lemma])
+        entry = entries.get(word, entries.get(lemma))
+        if entry is not None:
+            ranked.setdefault(word, entry)
+    return list(ranked.items())
+
+
+async def export(args) -> int:
+    # 1. The words to bundle, best first
+    json_entries = load_json_entries(args.json) if args.json else None
+    if args.words:
+        words = load_words(args.words, args.limit)
+    elif json_entries is not None:
+        words = list(json_entries)[:args.limit] if args.limit else list(json_entries)
+    else:
+        words = read_common_words(limit=args.limit)
+    words = [w for w in words if WORD.match(w)]
+
+    # 2. Their entries, from the JSON file or the cache
+    if json_entries is not None:
+        entries = json_entries
+    else:
+        lemmatizer = get_lemmatizer()
+        lemmas = list(dict.fromkeys((lemmatizer.lemmatize(w) if lemmatizer else w) for w in words))
+        entries = await load_cached_entries(list(dict.fromkeys(lemmas + words)))
+    ranked = rank(words, entries)
+
+    # 3. As many as fit the size cap
+    metadata = {"prompt_version": PROMPT_VERSION}
+    data, count = etymology_bundle.fit(ranked, args.max_kb * 1024, metadata)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(
+        f"{len(words)} words listed, {len(ranked)} with entries; bundled {count} "
+        f"({len(data) / 1024:.1f} KB, {etymology_bundle.deflated_size(data) / 1024:.1f} KB deflated) into {args.output}"
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export etymologies into the extension's offline bundle")
+    parser.add_argument("--output", required=True, help="Bundle file to write")
+    parser.add_argument("--json", help="Read entries from a {word: entry} JSON file instead of the cache")
+    parser.add_argument("--words", help="Frequency list ranking the words (default: data/common_words.txt, or the --json order)")
+    parser.add_argument("--limit", type=int, help="Only the N most frequent words of the list")
+    parser.add_argument("--max-kb", type=int, default=DEFAULT_MAX_KB, help="Cap on the bundle's deflated size in KB")
+    args = parser.parse_args()
+    return asyncio.run(export(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
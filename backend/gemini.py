@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from metrics import timed
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Per-attempt and overall deadlines, in seconds (15s per attempt matches background.js)
+GEMINI_ATTEMPT_TIMEOUT = float(os.environ.get("GEMINI_ATTEMPT_TIMEOUT", "15"))
+GEMINI_TOTAL_TIMEOUT = float(os.environ.get("GEMINI_TOTAL_TIMEOUT", "40"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF = float(os.environ.get("GEMINI_BACKOFF", "1.0"))
+GEMINI_MAX_CONNECTIONS = int(os.environ.get("GEMINI_MAX_CONNECTIONS", "100"))
+
+# Send a second, hedged request once an attempt is slower than this latency
+# percentile of recent successful calls. 0 disables hedging.
+GEMINI_HEDGE_PERCENTILE = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+
+
+class GeminiError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class GeminiClient:
+    """Async Gemini client on a shared connection pool, with retries and optional hedging."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = GEMINI_API_KEY,
+        api_base: str = GEMINI_API_BASE,
+        model: str = GEMINI_MODEL,
+        attempt_timeout: float = GEMINI_ATTEMPT_TIMEOUT,
+        total_timeout: float = GEMINI_TOTAL_TIMEOUT,
+        max_retries: int = GEMINI_MAX_RETRIES,
+        backoff: float = GEMINI_BACKOFF,
+        hedge_percentile: float = GEMINI_HEDGE_PERCENTILE,
+        max_connections: int = GEMINI_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.tokens = {"prompt": 0, "output": 0, "thoughts": 0}
+        self._latencies = deque(maxlen=500)
+        self._http = httpx.AsyncClient(
+            base_url=api_base,
+            headers={"Content-Type": "application/json", "x-goog-api-key": api_key or ""},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        samples = sorted(self._latencies)
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return samples[index]
+
+    async def _send(self, payload: dict, timeout: float) -> httpx.Response:
+        self.requests += 1
+        started = time.monotonic()
+        response = await self._http.post(f"/models/{self.model}:generateContent", json=payload, timeout=timeout)
+        if response.status_code == 200:
+            self._latencies.append(time.monotonic() - started)
+        return response
+
+    async def _send_hedged(self, payload: dict, timeout: float) -> httpx.Response:
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._send(payload, timeout)
+
+        primary = asyncio.ensure_future(self._send(payload, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        backup = asyncio.ensure_future(self._send(payload, timeout - delay))
+        pending = {primary, backup}
+        last = primary
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and task.result().status_code == 200:
+                        return task.result()
+            # Neither request succeeded; surface the last outcome to the retry loop.
+            return last.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _count_tokens(self, result: dict):
+        usage = result.get("usageMetadata") or {}
+        self.tokens["prompt"] += usage.get("promptTokenCount", 0)
+        self.tokens["output"] += usage.get("candidatesTokenCount", 0)
+        self.tokens["thoughts"] += usage.get("thoughtsTokenCount", 0)
+
+    async def generate(self, payload: dict) -> dict:
+        """POST a generateContent request, retrying 429/5xx and network errors with jittered backoff."""
+        if not self.api_key:
+            raise GeminiError("GEMINI_API_KEY not configured")
+
+        with timed("gemini"):
+            result = await self._generate(payload)
+        self._count_tokens(result)
+        return result
+
+    async def _generate(self, payload: dict) -> dict:
+        deadline = time.monotonic() + self.total_timeout
+        last_error = GeminiError("Gemini request exceeded its total deadline")
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            retry_after = None
+            try:
+                response = await self._send_hedged(payload, min(self.attempt_timeout, remaining))
+            except httpx.HTTPError as e:
+                last_error = GeminiError(f"Request failed: {e!r}")
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                last_error = GeminiError(f"API Error: {response.text}", response.status_code)
+                if not is_retryable(response.status_code):
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+
+            if not await self._backoff(attempt, retry_after, deadline):
+                break
+
+        raise last_error
+
+    async def _backoff(self, attempt: int, retry_after: Optional[str], deadline: float) -> bool:
+        """Sleeps before the next attempt; returns False when no attempt is left within the deadline."""
+        if attempt == self.max_retries:
+            return False
+
+        # Exponential backoff with jitter (same base schedule as fetchWithRetry in background.js)
+        wait = random.uniform(0.5, 1.0) * self.backoff * (2 ** attempt)
+        if retry_after and retry_after.isdigit():
+            wait = max(wait, float(retry_after))
+        if wait >= deadline - time.monotonic():
+            return False
+        self.retries += 1
+        await asyncio.sleep(wait)
+        return True
+
+    async def stream(self, payload: dict) -> AsyncIterator[dict]:
+        """
+        Yields the chunks of a streamGenerateContent call as they arrive. Failures
+        before the first chunk are retried like `generate`; once text has been
+        yielded an error is raised to the caller instead.
+        """
+        if not self.api_key:
+            raise GeminiError("GEMINI_API_KEY not configured")
+
+        deadline = time.monotonic() + self.total_timeout
+        last_error = GeminiError("Gemini request exceeded its total deadline")
+
+        with timed("gemini"):
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                retry_after = None
+                streamed = False
+                usage = None
+                try:
+                    self.requests += 1
+                    async with self._http.stream(
+                        "POST",
+                        f"/models/{self.model}:streamGenerateContent",
+                        params={"alt": "sse"},
+                        json=payload,
+                        timeout=min(self.attempt_timeout, remaining),
+                    ) as response:
+                        if response.status_code == 200:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                chunk = json.loads(line[5:])
+                                # Each chunk repeats the running totals; the last one is final
+                                usage = chunk.get("usageMetadata") or usage
+                                streamed = True
+                                yield chunk
+                            self._count_tokens({"usageMetadata": usage})
+                            return
+                        await response.aread()
+                        last_error = GeminiError(f"API Error: {response.text}", response.status_code)
+                        if not is_retryable(response.status_code):
+                            raise last_error
+                        retry_after = response.headers.get("Retry-After")
+                except httpx.HTTPError as e:
+                    if streamed:
+                        raise GeminiError(f"Stream interrupted: {e!r}")
+                    last_error = GeminiError(f"Request failed: {e!r}")
+
+                if not await self._backoff(attempt, retry_after, deadline):
+                    break
+
+        raise last_error
+
+
+gemini_client: Optional[GeminiClient] = None
+
+
+async def init_gemini() -> GeminiClient:
+    global gemini_client
+    if gemini_client is None:
+        gemini_client = GeminiClient()
+    return gemini_client
+
+
+async def close_gemini():
+    global gemini_client
+    if gemini_client is not None:
+        await gemini_client.aclose()
+        gemini_client = None
+
+
+def get_gemini() -> GeminiClient:
+    if not gemini_client:
+        raise Exception("Gemini client not initialized. Is the app lifespan running?")
+    return gemini_client
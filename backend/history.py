@@ -0,0 +1,69 @@
+import asyncio
+import os
+from typing import List, Optional
+
+from metrics import timed
+from storage import get_storage
+
+HISTORY_FLUSH_SIZE = int(os.environ.get("HISTORY_FLUSH_SIZE", "200"))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", "2.0"))
+# Rows kept for retry when inserts keep failing; older rows are dropped beyond this
+HISTORY_MAX_PENDING = int(os.environ.get("HISTORY_MAX_PENDING", "10000"))
+
+
+class HistoryBuffer:
+    """
+    Collects `search_history` rows in memory and writes them with one bulk
+    insert once `flush_size` rows are pending or every `flush_interval` seconds.
+    """
+
+    def __init__(self, flush_size: int = HISTORY_FLUSH_SIZE, flush_interval: float = HISTORY_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def add(self, user_id: str, words: List[str]):
+        self._rows.extend({"user_id": user_id, "word": word} for word in words)
+        if len(self._rows) >= self.flush_size and not self._lock.locked():
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._rows:
+                return
+            rows, self._rows = self._rows, []
+            try:
+                with timed("history_flush"):
+                    await get_storage().add_history(rows)
+            except Exception as e:
+                print(f"History flush failed ({len(rows)} rows): {e}")
+                self._rows = (rows + self._rows)[-HISTORY_MAX_PENDING:]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the periodic flush and drains whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+history_buffer = HistoryBuffer()
+
+
+def get_history_buffer() -> HistoryBuffer:
+    return history_buffer
@@ -0,0 +1,150 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+WHITESPACE = " \t\r\n"
+
+
+class JsonFieldParser:
+    """
+    Incrementally parses a flat JSON object arriving in arbitrary text chunks,
+    returning each top-level `(key, value)` pair as soon as its value is complete.
+    Anything before the opening brace (such as a Markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+        self.decoder = json.JSONDecoder()
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self.buffer += text
+        fields = []
+        while self.state != "done" and self._step(fields):
+            pass
+        # Drop consumed input so long responses don't make every step rescan it
+        if self.pos > 4096:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        return fields
+
+    def _skip_whitespace(self) -> bool:
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    def _decode(self):
+        """Decodes one value at `pos`, or returns None while it is still incomplete."""
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            return None
+        # A number or literal at the end of the buffer may still be growing ("12" -> "125")
+        if not isinstance(value, (str, dict, list)):
+            rest = self.buffer[end:].lstrip(WHITESPACE)
+            if not rest:
+                return None
+        return value, end
+
+    def _step(self, fields: list) -> bool:
+        if self.state == "start":
+            index = self.buffer.find("{", self.pos)
+            if index < 0:
+                self.pos = len(self.buffer)
+                return False
+            self.pos = index + 1
+            self.state = "key"
+            return True
+
+        if not self._skip_whitespace():
+            return False
+        char = self.buffer[self.pos]
+
+        if self.state == "key":
+            if char == ",":
+                self.pos += 1
+                return True
+            if char == "}":
+                self.pos += 1
+                self.state = "done"
+                return False
+            if char != '"':
+                raise ValueError(f"Unexpected {char!r} in streamed JSON")
+            decoded = self._decode()
+            if decoded is None:
+                return False
+            self.key, self.pos = decoded
+            self.state = "colon"
+            return True
+
+        if self.state == "colon":
+            if char != ":":
+                raise ValueError(f"Expected ':' after {self.key!r} in streamed JSON")
+            self.pos += 1
+            self.state = "value"
+            return True
+
+        decoded = self._decode()
+        if decoded is None:
+            return False
+        value, self.pos = decoded
+        fields.append((self.key, value))
+        self.state = "key"
+        return True
+
+
+def repair_truncated(text: str) -> Optional[str]:
+    """
+    Closes a JSON document that was cut off part-way (the output token limit, a dropped
+    stream): everything up to the last complete value is kept, a half-written value or key
+    is dropped, and the open objects and arrays are closed. Text around a complete
+    document (such as a Markdown fence) is trimmed. None if no value was ever completed.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+    closers = []        # "}" or "]" for each open container, innermost last
+    awaiting_key = False
+    in_string = is_key = escaped = False
+    cut = None          # (end, closers) after the last complete value
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if not is_key:
+                    cut = (i + 1, "".join(reversed(closers)))
+            continue
+        if char == '"':
+            in_string = True
+            is_key = awaiting_key
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            awaiting_key = char == "{"
+            cut = (i + 1, "".join(reversed(closers)))
+        elif char in "}]":
+            closers.pop()
+            if not closers:
+                return text[start:i + 1]
+            awaiting_key = False
+            cut = (i + 1, "".join(reversed(closers)))
+        elif char == ":":
+            awaiting_key = False
+        elif char == ",":
+            # Whatever came before the comma (numbers and literals included) is complete
+            cut = (i, "".join(reversed(closers)))
+            awaiting_key = closers[-1] == "}"
+    if cut is None:
+        return None
+    end, closing = cut
+    return text[start:end] + closing
@@ -0,0 +1,177 @@
+import json
+import os
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+LEMMA_TABLE = os.environ.get(
+    "LEMMA_TABLE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lemmas.json")
+)
+LEMMA_WORDS = os.environ.get(
+    "LEMMA_WORDS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "words.txt")
+)
+LEMMATIZE = os.environ.get("LEMMATIZE", "true").lower() == "true"
+
+# Shorter words are almost never regular inflections ("bus", "red", "sing")
+MIN_INFLECTED_LENGTH = 4
+VOWELS = set("aeiou")
+# Doubled final consonants that belong to the stem: falling -> fall, missing -> miss
+KEEP_DOUBLE = set("lsz")
+# Letters that can't end a word without an e after them: produc(e)d, leav(e)ing, freez(e)ing
+SILENT_E_AFTER = set("cvz")
+
+
+def is_consonant(word: str, index: int) -> bool:
+    char = word[index]
+    if char in VOWELS:
+        return False
+    if char == "y":
+        return index == 0 or not is_consonant(word, index - 1)
+    return True
+
+
+def measure(stem: str) -> int:
+    """Porter's m: the number of vowel-consonant sequences in the stem."""
+    count = 0
+    previous_vowel = False
+    for index in range(len(stem)):
+        consonant = is_consonant(stem, index)
+        if consonant and previous_vowel:
+            count += 1
+        previous_vowel = not consonant
+    return count
+
+
+def has_vowel(stem: str) -> bool:
+    return any(not is_consonant(stem, i) for i in range(len(stem)))
+
+
+def ends_cvc(stem: str) -> bool:
+    """Consonant-vowel-consonant ending whose last letter is not w, x or y (hop, mak, fil)."""
+    return (
+        len(stem) >= 3
+        and is_consonant(stem, len(stem) - 3)
+        and not is_consonant(stem, len(stem) - 2)
+        and is_consonant(stem, len(stem) - 1)
+        and stem[-1] not in "wxy"
+    )
+
+
+def restore_stem(stem: str) -> str:
+    """Undoes the spelling changes -ed and -ing make (Porter step 1b): hop(p)ed, mak(e)ing, creat(e)d."""
+    # -at stems take back their e (relat-ed), except after a vowel digraph (treat-ed, float-ing)
+    if stem.endswith(("bl", "iz")) or (stem.endswith("at") and stem[-3:-2] not in ("e", "o")):
+        return stem + "e"
+    # Soft c and g, v, z, and s after a vowel or r, n, l, p: judg(e)d, caus(e)d, nurs(e)d.
+    # Plenty of stems break this (focus-ed, belong-ing); the word list sorts those out.
+    if stem[-1] in SILENT_E_AFTER and stem[-2] != stem[-1]:
+        return stem + "e"
+    if stem[-1] == "g" and stem[-2] in VOWELS | set("dr"):
+        return stem + "e"
+    if stem[-1] == "s" and stem[-2] in VOWELS | set("rnlp"):
+        return stem + "e"
+    if len(stem) > 2 and stem[-1] == stem[-2] and is_consonant(stem, len(stem) - 1) and stem[-1] not in KEEP_DOUBLE:
+        return stem[:-1]
+    if measure(stem) == 1 and ends_cvc(stem):
+        return stem + "e"
+    return stem
+
+
+class Lemmatizer:
+    """
+    Maps inflected forms to their dictionary form (running -> run, studies -> study,
+    went -> go) so they share one etymology cache entry. Regular inflections are
+    handled by suffix rules; data/lemmas.json lists the irregular forms, plus words
+    that merely look inflected ("news", "morning", "hundred"). An inflected form is
+    only reduced to a stem listed in data/words.txt, so no non-word becomes a cache key.
+    """
+
+    def __init__(self, table: dict, words: Optional[Iterable[str]] = None):
+        self.version = table.get("version", 1)
+        self.irregular = table["irregular"]
+        self.keep = set(table["keep"])
+        # Known base forms; an inflected word whose stem isn't one of them is left alone.
+        # None trusts the suffix rules.
+        self.words = None if words is None else set(words) | set(self.irregular.values()) | self.keep
+        self.changed = 0
+        self.unchanged = 0
+        self._lemma = lru_cache(maxsize=50000)(self._lemmatize)
+
+    @classmethod
+    def load(cls, path: str = LEMMA_TABLE, words_path: str = LEMMA_WORDS) -> "Lemmatizer":
+        with open(path, encoding="utf-8") as f:
+            table = json.load(f)
+        with open(words_path, encoding="utf-8") as f:
+            words = [word for line in f if not line.startswith("#") for word in line.split()]
+        return cls(table, words)
+
+    def lemmatize(self, word: str) -> str:
+        """Lemma of an already-normalized word; the word itself when no rule applies."""
+        lemma = self._lemma(word)
+        if lemma == word:
+            self.unchanged += 1
+        else:
+            self.changed += 1
+        return lemma
+
+    def _lemmatize(self, word: str) -> str:
+        if word in self.irregular:
+            return self.irregular[word]
+        if word in self.keep or len(word) < MIN_INFLECTED_LENGTH or not word.isalpha():
+            return word
+
+        # Plurals and third person singular. Plenty of words just end in s (nowadays, asbestos,
+        # biceps), and past tense and participles often strip to a non-word (receiv, chang),
+        # so each candidate has to be a known word; otherwise the word is its own lemma.
+        if word.endswith("ies") and len(word) > 4:
+            # studies -> study, ties -> tie
+            return self._known(word, [word[:-3] + "y", word[:-1]])
+        if word.endswith(("sses", "xes", "zzes", "ches", "shes")):
+            # boxes -> box, aches -> ache
+            return self._known(word, [word[:-2], word[:-1]])
+        if word.endswith("oes") and len(word) > 4:
+            # heroes -> hero, shoes -> shoe
+            return self._known(word, [word[:-2], word[:-1]])
+        if word.endswith("s") and not word.endswith(("ss", "us", "is", "ous")):
+            return self._known(word, [word[:-1]])
+
+        # Past tense and participles
+        if word.endswith("eed"):
+            return self._known(word, [word[:-1]] if measure(word[:-3]) > 0 else [])
+        if word.endswith("ied") and len(word) > 4:
+            # studied -> study, untied -> untie
+            return self._known(word, [word[:-3] + "y", word[:-1]])
+        for suffix in ("ed", "ing"):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if len(stem) >= 2 and has_vowel(stem):
+                    if self.words is None:
+                        return restore_stem(stem)
+                    # The e goes first, or breathing would be breath
+                    return self._known(word, [stem + "e", restore_stem(stem), stem])
+                return word
+        return word
+
+    def _known(self, word: str, candidates: List[str]) -> str:
+        """The first candidate that is a known word, or `word` itself if none is."""
+        if self.words is None:
+            return candidates[0] if candidates else word
+        return next((c for c in candidates if c in self.words), word)
+
+    def stats(self) -> dict:
+        total = self.changed + self.unchanged
+        return {
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "changed_ratio": round(self.changed / total, 4) if total else 0.0
+        }
+
+
+lemmatizer: Optional[Lemmatizer] = None
+
+
+def get_lemmatizer() -> Optional[Lemmatizer]:
+    """Loads the exception table on first use; None when LEMMATIZE is disabled."""
+    global lemmatizer
+    if lemmatizer is None and LEMMATIZE:
+        lemmatizer = Lemmatizer.load()
+    return lemmatizer
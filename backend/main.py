@@ -1,10 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
-from routers import analyze, wordbook, user, pdf
 
 load_dotenv()
 
-app = FastAPI(title="Word Root Parser Backend")
+import gemini
+from metrics import MetricsMiddleware, metrics_response
+from storage import init_storage, close_storage
+from history import history_buffer
+from progress import progress_buffer
+from vocabulary import vocabulary_indexer
+from routers import analyze, wordbook, user, pdf
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients live for the whole process and are closed on shutdown
+    await init_storage()
+    await gemini.init_gemini()
+    history_buffer.start()
+    progress_buffer.start()
+    yield
+    # Drain buffered history and page turns before the process exits
+    await history_buffer.stop()
+    await progress_buffer.stop()
+    await vocabulary_indexer.stop()
+    await gemini.close_gemini()
+    await close_storage()
+
+app = FastAPI(title="Word Root Parser Backend", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 # Include Routers
 app.include_router(analyze.router)
@@ -19,3 +43,7 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
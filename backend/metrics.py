@@ -0,0 +1,192 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Seconds; spans cached lookups (sub-millisecond) up to Gemini calls with retries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to finishing its response",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Time spent in one stage of request handling (auth, quota, gemini, db.<call>, ...)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Tokens; single-word prompts are tens of tokens, batch answers a few thousand
+TOKEN_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+GEMINI_CALL_TOKENS = Histogram(
+    "gemini_call_tokens",
+    "Tokens used by one Gemini call, per prompt (single, batch, stream) and kind (prompt, output, thoughts)",
+    ["prompt", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+
+# Stage durations for the request being handled, summed per stage name
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records the block's duration in the stage histogram and the current request's Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in timings.items()]
+    entries.append(f"app;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and adds a `Server-Timing` header. For streaming
+    responses the header covers the stages finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Label by route template, not raw path, to keep the series count bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            request_timings.reset(token)
+
+
+class AppStatsCollector:
+    """Exports the counters the caches and the Gemini client already keep, at scrape time."""
+
+    def describe(self):
+        # Keeps registration from calling collect() while the app modules are still importing
+        return []
+
+    def collect(self):
+        # Imported here so the modules that use `timed` can import this one freely
+        import gemini
+        from admission import PREMIUM, FREE, BACKGROUND, gemini_scheduler
+        import lemmatizer
+        import morphology
+        import prompts
+        from cache import etymology_cache
+        from profiles import profile_cache
+        from progress import progress_buffer
+        from vocabulary import vocabulary_indexer
+
+        lookups = CounterMetricFamily("etymology_cache_lookups", "Etymology lookups by where they were served from", labels=["source"])
+        lookups.add_metric(["memory"], etymology_cache.memory_hits)
+        lookups.add_metric(["db"], etymology_cache.db_hits)
+        lookups.add_metric(["shared"], etymology_cache.shared_hits)
+        lookups.add_metric(["miss"], etymology_cache.misses)
+        lookups.add_metric(["stale"], etymology_cache.stale_hits)
+        yield lookups
+
+        profiles = CounterMetricFamily("profile_cache_lookups", "Profile cache lookups", labels=["result"])
+        profiles.add_metric(["hit"], profile_cache.hits)
+        profiles.add_metric(["miss"], profile_cache.misses)
+        yield profiles
+
+        entries = GaugeMetricFamily("cache_entries", "Entries held in in-process caches", labels=["cache"])
+        entries.add_metric(["etymology"], len(etymology_cache.memory))
+        entries.add_metric(["profiles"], len(profile_cache.entries))
+        yield entries
+
+        analyzer = morphology.analyzer
+        if analyzer is not None:
+            offline = CounterMetricFamily("offline_analyzer_lookups", "Words the offline analyzer answered or deferred to Gemini", labels=["result"])
+            offline.add_metric(["answered"], analyzer.answered)
+            offline.add_metric(["deferred"], analyzer.deferred)
+            yield offline
+
+        if lemmatizer.lemmatizer is not None:
+            lemmas = CounterMetricFamily("lemmatizer_lookups", "Lookups whose cache key was changed to a lemma, or left as is", labels=["result"])
+            lemmas.add_metric(["changed"], lemmatizer.lemmatizer.changed)
+            lemmas.add_metric(["unchanged"], lemmatizer.lemmatizer.unchanged)
+            yield lemmas
+
+        admitted = CounterMetricFamily("gemini_admitted", "Gemini calls let through admission control", labels=["priority"])
+        admitted.add_metric(["premium"], gemini_scheduler.admitted[PREMIUM])
+        admitted.add_metric(["free"], gemini_scheduler.admitted[FREE])
+        admitted.add_metric(["background"], gemini_scheduler.admitted[BACKGROUND])
+        yield admitted
+        shed = CounterMetricFamily("gemini_shed", "Gemini calls rejected by admission control", labels=["reason"])
+        for reason, count in gemini_scheduler.shed.items():
+            shed.add_metric([reason], count)
+        yield shed
+        yield GaugeMetricFamily("gemini_queue_depth", "Lookups waiting for a Gemini slot", value=gemini_scheduler.queued)
+        yield GaugeMetricFamily("gemini_breaker_open", "1 while the Gemini circuit breaker is open or half-open", value=int(gemini_scheduler.breaker.state != "closed"))
+
+        pages = CounterMetricFamily("pdf_progress_updates", "PDF page turns reported by clients, and rows written (or dropped after failing) after coalescing", labels=["result"])
+        pages.add_metric(["received"], progress_buffer.received)
+        pages.add_metric(["written"], progress_buffer.written)
+        pages.add_metric(["dropped"], progress_buffer.dropped)
+        yield pages
+
+        indexed = CounterMetricFamily("pdf_vocabulary_indexes", "PDF vocabulary indexes built or failed", labels=["result"])
+        indexed.add_metric(["ready"], vocabulary_indexer.indexed)
+        indexed.add_metric(["failed"], vocabulary_indexer.failed)
+        yield indexed
+        yield CounterMetricFamily("pdf_vocabulary_preanalyzed", "Words pre-analyzed into the etymology cache for PDFs", value=vocabulary_indexer.preanalyzed)
+
+        parses = CounterMetricFamily("gemini_parse_results", "Gemini answers by prompt and how they parsed (ok, repaired, failed)", labels=["prompt", "result"])
+        for prompt, results in prompts.parse_results.items():
+            for result, count in results.items():
+                parses.add_metric([prompt, result], count)
+        yield parses
+
+        client = gemini.gemini_client
+        if client is None:
+            return
+        tokens = CounterMetricFamily("gemini_tokens", "Tokens reported by Gemini usageMetadata", labels=["kind"])
+        for kind, count in client.tokens.items():
+            tokens.add_metric([kind], count)
+        yield tokens
+        yield CounterMetricFamily("gemini_requests", "Gemini HTTP attempts, including retries and hedges", value=client.requests)
+        yield CounterMetricFamily("gemini_retries", "Gemini attempts retried after 429, 5xx or network errors", value=client.retries)
+        yield CounterMetricFamily("gemini_hedges", "Hedged Gemini requests sent", value=client.hedges)
+
+
+REGISTRY.register(AppStatsCollector())
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,128 @@
+"""
+Applies the SQL files in migrations/ in order, once each.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied and pending migrations
+    python migrate.py --dry-run  # show what would be applied
+
+Connects with DATABASE_URL (Supabase: Project Settings -> Database -> Connection string).
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+# Arbitrary constant; keeps two runners from migrating at the same time
+LOCK_ID = 727001
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    path: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding="utf-8") as f:
+            migrations.append(Migration(match.group(1), match.group(2), path, f.read()))
+
+    versions = [m.version for m in migrations]
+    duplicates = {v for v in versions if versions.count(v) > 1}
+    if duplicates:
+        raise SystemExit(f"Duplicate migration versions: {', '.join(sorted(duplicates))}")
+    return migrations
+
+def connect(database_url: str):
+    try:
+        import psycopg
+    except ImportError:
+        raise SystemExit("psycopg is required to run migrations: pip install 'psycopg[binary]'")
+    return psycopg.connect(database_url, autocommit=True)
+
+def ensure_migrations_table(conn):
+    conn.execute("""
+        create table if not exists public.schema_migrations (
+          version text primary key,
+          name text not null,
+          checksum text not null,
+          applied_at timestamp with time zone default now()
+        )
+    """)
+
+def applied_migrations(conn) -> dict:
+    rows = conn.execute("select version, checksum from public.schema_migrations").fetchall()
+    return {version: checksum for version, checksum in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="Show pending migrations without applying them")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise SystemExit("DATABASE_URL is not set.")
+
+    migrations = load_migrations()
+
+    with connect(args.database_url) as conn:
+        conn.execute("select pg_advisory_lock(%s)", (LOCK_ID,))
+        try:
+            ensure_migrations_table(conn)
+            applied = applied_migrations(conn)
+
+            for m in migrations:
+                if m.version in applied and applied[m.version] != m.checksum:
+                    print(f"Warning: {os.path.basename(m.path)} changed after it was applied.")
+
+            pending = [m for m in migrations if m.version not in applied]
+
+            if args.status:
+                for m in migrations:
+                    state = "applied" if m.version in applied else "pending"
+                    print(f"{m.version} {m.name}: {state}")
+                return
+
+            if not pending:
+                print("Database is up to date.")
+                return
+
+            for m in pending:
+                print(f"Applying {m.version} {m.name}...")
+                if args.dry_run:
+                    continue
+                # Each file runs in its own transaction together with its bookkeeping row
+                with conn.transaction():
+                    conn.execute(m.sql)
+                    conn.execute(
+                        "insert into public.schema_migrations (version, name, checksum) values (%s, %s, %s)",
+                        (m.version, m.name, m.checksum),
+                    )
+
+            if not args.dry_run:
+                print(f"Applied {len(pending)} migration(s).")
+        finally:
+            conn.execute("select pg_advisory_unlock(%s)", (LOCK_ID,))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -49,17 +49,28 @@ alter table public.wordbook enable row level security;
 alter table public.search_history enable row level security;
 alter table public.user_pdfs enable row level security;
 
+drop policy if exists "Users can view own profile" on public.profiles;
 create policy "Users can view own profile" on public.profiles for select using (auth.uid() = id);
+drop policy if exists "Users can update own profile" on public.profiles;
 create policy "Users can update own profile" on public.profiles for update using (auth.uid() = id);
 
+drop policy if exists "Users can view own wordbook" on public.wordbook;
 create policy "Users can view own wordbook" on public.wordbook for select using (auth.uid() = user_id);
+drop policy if exists "Users can insert own wordbook" on public.wordbook;
 create policy "Users can insert own wordbook" on public.wordbook for insert with check (auth.uid() = user_id);
+drop policy if exists "Users can delete own wordbook" on public.wordbook;
 create policy "Users can delete own wordbook" on public.wordbook for delete using (auth.uid() = user_id);
 
+drop policy if exists "Users can view own history" on public.search_history;
 create policy "Users can view own history" on public.search_history for select using (auth.uid() = user_id);
+drop policy if exists "Users can insert own history" on public.search_history;
 create policy "Users can insert own history" on public.search_history for insert with check (auth.uid() = user_id);
 
+drop policy if exists "Users can view own pdfs" on public.user_pdfs;
 create policy "Users can view own pdfs" on public.user_pdfs for select using (auth.uid() = user_id);
+drop policy if exists "Users can insert own pdfs" on public.user_pdfs;
 create policy "Users can insert own pdfs" on public.user_pdfs for insert with check (auth.uid() = user_id);
+drop policy if exists "Users can update own pdfs" on public.user_pdfs;
 create policy "Users can update own pdfs" on public.user_pdfs for update using (auth.uid() = user_id);
+drop policy if exists "Users can delete own pdfs" on public.user_pdfs;
 create policy "Users can delete own pdfs" on public.user_pdfs for delete using (auth.uid() = user_id);
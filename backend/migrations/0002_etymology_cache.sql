@@ -0,0 +1,11 @@
+-- Shared etymology cache (one row per normalized word and prompt version).
+-- No policies are defined, so only the backend's service role can read or write it.
+create table if not exists public.etymology_cache (
+  word text not null,
+  prompt_version text not null,
+  data jsonb not null,
+  created_at timestamp with time zone default now(),
+  primary key (word, prompt_version)
+);
+
+alter table public.etymology_cache enable row level security;
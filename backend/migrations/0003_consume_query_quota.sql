@@ -0,0 +1,44 @@
+-- Atomically checks the monthly free quota and adds p_amount to it.
+-- Returns one row (allowed, usage, is_premium); usage is unchanged when not allowed.
+-- A negative p_amount refunds usage for lookups that failed.
+create or replace function public.consume_query_quota(p_user_id uuid, p_amount int default 1, p_free_limit int default 50)
+returns table (allowed boolean, usage int, is_premium boolean)
+language plpgsql
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+declare
+  v_usage int;
+  v_premium boolean;
+begin
+  update public.profiles p
+     set query_usage_current_month = greatest(coalesce(p.query_usage_current_month, 0) + p_amount, 0)
+   where p.id = p_user_id
+     and (p_amount <= 0
+          or coalesce(p.is_premium, false)
+          or coalesce(p.query_usage_current_month, 0) + p_amount <= p_free_limit)
+  returning p.query_usage_current_month, coalesce(p.is_premium, false) into v_usage, v_premium;
+
+  if found then
+    allowed := true;
+  else
+    select coalesce(p.query_usage_current_month, 0), coalesce(p.is_premium, false)
+      into v_usage, v_premium
+      from public.profiles p
+     where p.id = p_user_id;
+    if not found then
+      return;
+    end if;
+    allowed := false;
+  end if;
+
+  usage := v_usage;
+  is_premium := v_premium;
+  return next;
+end;
+$$;
+
+-- Only the backend may move quota; clients must not be able to refund themselves.
+revoke execute on function public.consume_query_quota(uuid, int, int) from public, anon, authenticated;
+grant execute on function public.consume_query_quota(uuid, int, int) to service_role;
@@ -0,0 +1,21 @@
+-- One entry per word per user; lets add/import use insert ... on conflict instead of select-then-insert.
+
+-- Existing duplicates would block the constraint; keep the oldest entry for each word.
+delete from public.wordbook w
+ using public.wordbook d
+ where w.user_id = d.user_id
+   and w.word = d.word
+   and (w.created_at, w.id) > (d.created_at, d.id);
+
+create unique index if not exists wordbook_user_id_word_key on public.wordbook (user_id, word);
+
+do $$
+begin
+  if not exists (select 1 from pg_constraint where conname = 'wordbook_user_id_word_key') then
+    alter table public.wordbook add constraint wordbook_user_id_word_key unique using index wordbook_user_id_word_key;
+  end if;
+end;
+$$;
+
+drop policy if exists "Users can update own wordbook" on public.wordbook;
+create policy "Users can update own wordbook" on public.wordbook for update using (auth.uid() = user_id);
@@ -0,0 +1,10 @@
+-- Composite indexes matching the routers' access pattern: filter by user_id,
+-- newest first, with id as the keyset tie-breaker.
+create index if not exists wordbook_user_id_created_at_idx
+  on public.wordbook (user_id, created_at desc, id desc);
+
+create index if not exists user_pdfs_user_id_uploaded_at_idx
+  on public.user_pdfs (user_id, uploaded_at desc, id desc);
+
+create index if not exists search_history_user_id_created_at_idx
+  on public.search_history (user_id, created_at desc);
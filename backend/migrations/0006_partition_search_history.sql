@@ -0,0 +1,102 @@
+-- Range-partition search_history by month so old months can be dropped
+-- with a cheap `drop table` instead of a large delete.
+
+-- Creates monthly partitions from p_from's month through p_months_ahead months past the current one.
+create or replace function public.ensure_search_history_partitions(p_from date default current_date, p_months_ahead int default 3)
+returns void
+language plpgsql
+as $$
+declare
+  v_month date := date_trunc('month', p_from)::date;
+  v_last date := (date_trunc('month', current_date) + make_interval(months => p_months_ahead))::date;
+begin
+  while v_month <= v_last loop
+    execute format(
+      'create table if not exists public.%I partition of public.search_history for values from (%L) to (%L)',
+      'search_history_' || to_char(v_month, 'YYYY_MM'),
+      to_char(v_month, 'YYYY-MM-DD') || ' 00:00:00+00',
+      to_char((v_month + interval '1 month')::date, 'YYYY-MM-DD') || ' 00:00:00+00'
+    );
+    v_month := (v_month + interval '1 month')::date;
+  end loop;
+end;
+$$;
+
+-- Drops monthly partitions that end on or before p_before; returns how many were dropped.
+create or replace function public.drop_search_history_partitions(p_before date)
+returns int
+language plpgsql
+as $$
+declare
+  v_partition record;
+  v_dropped int := 0;
+begin
+  for v_partition in
+    select c.relname
+      from pg_inherits i
+      join pg_class c on c.oid = i.inhrelid
+     where i.inhparent = 'public.search_history'::regclass
+       and c.relname ~ '^search_history_\d{4}_\d{2}$'
+  loop
+    if (to_date(substring(v_partition.relname from '\d{4}_\d{2}$'), 'YYYY_MM') + interval '1 month')::date <= p_before then
+      execute format('drop table public.%I', v_partition.relname);
+      v_dropped := v_dropped + 1;
+    end if;
+  end loop;
+  return v_dropped;
+end;
+$$;
+
+do $$
+begin
+  if exists (
+    select 1 from pg_class c join pg_namespace n on n.oid = c.relnamespace
+     where n.nspname = 'public' and c.relname = 'search_history' and c.relkind = 'r'
+  ) then
+    alter table public.search_history rename to search_history_unpartitioned;
+    alter index if exists public.search_history_user_id_created_at_idx rename to search_history_unpartitioned_user_id_created_at_idx;
+  end if;
+end;
+$$;
+
+-- The partition key has to be part of the primary key.
+create table if not exists public.search_history (
+  id uuid default uuid_generate_v4() not null,
+  user_id uuid references public.profiles(id) not null,
+  word text not null,
+  created_at timestamp with time zone default now() not null,
+  primary key (id, created_at)
+) partition by range (created_at);
+
+-- Catches rows outside the prepared months if partition maintenance falls behind.
+create table if not exists public.search_history_default partition of public.search_history default;
+
+create index if not exists search_history_user_id_created_at_idx
+  on public.search_history (user_id, created_at desc);
+
+do $$
+declare
+  v_oldest timestamp with time zone;
+begin
+  if to_regclass('public.search_history_unpartitioned') is not null then
+    select min(created_at) into v_oldest from public.search_history_unpartitioned;
+    perform public.ensure_search_history_partitions(coalesce(v_oldest, now())::date, 3);
+    insert into public.search_history (id, user_id, word, created_at)
+      select id, user_id, word, coalesce(created_at, now()) from public.search_history_unpartitioned;
+    drop table public.search_history_unpartitioned;
+  else
+    perform public.ensure_search_history_partitions(current_date, 3);
+  end if;
+end;
+$$;
+
+alter table public.search_history enable row level security;
+
+drop policy if exists "Users can view own history" on public.search_history;
+create policy "Users can view own history" on public.search_history for select using (auth.uid() = user_id);
+drop policy if exists "Users can insert own history" on public.search_history;
+create policy "Users can insert own history" on public.search_history for insert with check (auth.uid() = user_id);
+
+-- Partition maintenance is for the backend and scheduled jobs, not API clients.
+revoke execute on function public.ensure_search_history_partitions(date, int) from public, anon, authenticated;
+revoke execute on function public.drop_search_history_partitions(date) from public, anon, authenticated;
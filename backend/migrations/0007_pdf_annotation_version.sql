@@ -0,0 +1,4 @@
+-- Version counter for optimistic concurrency on PDF annotations.
+-- PATCH /pdf/{id} applies a delta only while the row is still at the version the
+-- client (or the server's read) saw, and bumps it in the same update.
+alter table public.user_pdfs add column if not exists version bigint not null default 0;
@@ -0,0 +1,22 @@
+-- Per-PDF vocabulary index, built in the background after a PDF is registered:
+-- the document's candidate hard words (lemmas) ranked by frequency and rarity,
+-- which are pre-analyzed into etymology_cache so hover lookups hit the cache.
+create table if not exists public.pdf_vocabulary (
+  pdf_id uuid primary key references public.user_pdfs(id) on delete cascade,
+  user_id uuid references public.profiles(id) not null,
+  -- pending -> extracting -> analyzing -> ready, or failed
+  status text not null default 'pending',
+  page_count int,
+  token_count int,
+  -- [{"word": lemma, "count": n, "score": s}, ...] best first
+  words jsonb not null default '[]'::jsonb,
+  analyzed int not null default 0,
+  failed int not null default 0,
+  error text,
+  updated_at timestamp with time zone default now()
+);
+
+alter table public.pdf_vocabulary enable row level security;
+
+drop policy if exists "Users can view own pdf vocabulary" on public.pdf_vocabulary;
+create policy "Users can view own pdf vocabulary" on public.pdf_vocabulary for select using (auth.uid() = user_id);
@@ -0,0 +1,18 @@
+-- Writes a batch of coalesced last_page updates in one statement.
+-- p_pages is a JSON array of {"id", "user_id", "last_page"}; entries whose PDF doesn't
+-- exist or belongs to another user match no row and are skipped.
+create or replace function public.update_pdf_pages(p_pages jsonb)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+  update public.user_pdfs p
+     set last_page = x.last_page
+    from jsonb_to_recordset(p_pages) as x(id uuid, user_id uuid, last_page int)
+   where p.id = x.id
+     and p.user_id = x.user_id;
+$$;
+
+revoke execute on function public.update_pdf_pages(jsonb) from public, anon, authenticated;
+grant execute on function public.update_pdf_pages(jsonb) to service_role;
@@ -0,0 +1,43 @@
+-- Rows that land in search_history_default while a month has no partition (maintenance
+-- fell behind, or a clock ran ahead) made `create table ... partition of` fail for that
+-- month, and so for every later month too. Each missing month is now created as a plain
+-- table, its rows are moved out of the default partition, and it is then attached.
+
+-- Creates monthly partitions from p_from's month through p_months_ahead months past the current one.
+create or replace function public.ensure_search_history_partitions(p_from date default current_date, p_months_ahead int default 3)
+returns void
+language plpgsql
+as $$
+declare
+  v_month date := date_trunc('month', p_from)::date;
+  v_last date := (date_trunc('month', current_date) + make_interval(months => p_months_ahead))::date;
+  v_name text;
+  v_start text;
+  v_end text;
+begin
+  while v_month <= v_last loop
+    v_name := 'search_history_' || to_char(v_month, 'YYYY_MM');
+    v_start := to_char(v_month, 'YYYY-MM-DD') || ' 00:00:00+00';
+    v_end := to_char((v_month + interval '1 month')::date, 'YYYY-MM-DD') || ' 00:00:00+00';
+    if to_regclass(format('public.%I', v_name)) is null then
+      execute format('create table public.%I (like public.search_history including defaults)', v_name);
+      execute format(
+        'with moved as (
+           delete from public.search_history_default
+            where created_at >= %L and created_at < %L
+        returning id, user_id, word, created_at
+         )
+         insert into public.%I (id, user_id, word, created_at) select * from moved',
+        v_start, v_end, v_name
+      );
+      execute format(
+        'alter table public.search_history attach partition public.%I for values from (%L) to (%L)',
+        v_name, v_start, v_end
+      );
+    end if;
+    v_month := (v_month + interval '1 month')::date;
+  end loop;
+end;
+$$;
+
+revoke execute on function public.ensure_search_history_partitions(date, int) from public, anon, authenticated;
@@ -0,0 +1,265 @@
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MORPHEME_LEXICON = os.environ.get(
+    "MORPHEME_LEXICON", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "morphemes.json")
+)
+# Lookups scoring at least this are answered locally; the rest go to Gemini. It sits above
+# the weight of re-, dis-, inter-, mis- and the like, whose words are too often not the sum
+# of their parts to trust one on a free root; known exceptions are listed as "opaque".
+OFFLINE_MIN_CONFIDENCE = float(os.environ.get("OFFLINE_MIN_CONFIDENCE", "0.9"))
+# Lower bar for answering locally when Gemini is overloaded and the alternative is an error
+OFFLINE_FALLBACK_CONFIDENCE = float(os.environ.get("OFFLINE_FALLBACK_CONFIDENCE", "0.5"))
+OFFLINE_ANALYZER = os.environ.get("OFFLINE_ANALYZER", "true").lower() == "true"
+
+MAX_PREFIXES = 2
+MAX_SUFFIXES = 3
+MIN_WORD_LENGTH = 5
+MIN_ROOT_LENGTH = 3
+
+# Confidence multipliers for the parts of a segmentation that are not lexicon weights
+BOUND_ROOT_FACTOR = 0.55
+SPELLING_CHANGE_FACTOR = 0.99
+VOWELS = set("aeiou")
+
+
+@dataclass(frozen=True)
+class Morpheme:
+    kind: str  # "prefix", "root" or "suffix"
+    surface: str  # as spelled inside the word, e.g. "happi"
+    form: str  # dictionary form, e.g. "happy"
+    meaning: str
+    zh: str
+    template: str = "{}"
+    weight: float = 1.0
+    free: bool = True
+    # Part of speech of a root, or of the word a suffix makes ("verb", "noun", "adj", "adv")
+    pos: Optional[str] = None
+    # Spelling rule that produced `surface`, which constrains the next suffix
+    change: Optional[str] = None
+
+
+class Trie:
+    END = "$"
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def insert(self, key: str, value):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(self.END, []).append(value)
+
+    def matches(self, text: str, start: int) -> Iterator[Tuple[int, list]]:
+        """Yields `(end, values)` for every key equal to `text[start:end]`."""
+        node = self.root
+        for index in range(start, len(text)):
+            node = node.get(text[index])
+            if node is None:
+                return
+            if self.END in node:
+                yield index + 1, node[self.END]
+
+
+def spelling_variants(word: str) -> List[Tuple[str, str]]:
+    """Stems a free root takes before suffixes: happy -> happi, move -> mov, run -> runn."""
+    variants = []
+    if len(word) > 2 and word.endswith("y") and word[-2] not in VOWELS:
+        variants.append((word[:-1] + "i", "y_to_i"))
+    if len(word) > 3 and word.endswith("e") and word[-2] not in VOWELS:
+        variants.append((word[:-1], "drop_e"))
+    if (
+        len(word) in (3, 4)
+        and word[-1] not in VOWELS | set("wxy")
+        and word[-2] in VOWELS
+        and word[-3] not in VOWELS
+    ):
+        variants.append((word + word[-1], "double"))
+    return variants
+
+
+def allows(change: Optional[str], suffix: Morpheme) -> bool:
+    if change is None:
+        return True
+    starts_with_vowel = suffix.surface[0] in VOWELS or suffix.surface[0] == "y"
+    if change == "y_to_i":
+        return not suffix.surface.startswith("i")
+    return starts_with_vowel
+
+
+def compose(template: str, inner: str) -> str:
+    """Applies an affix's Chinese template, keeping the result readable when affixes stack."""
+    # Stacked suffixes replace the adjective ending: 无关心的 + {}地 -> 无关心地, not 无关心的地
+    if template.startswith("{}") and not template.startswith("{}的") and inner.endswith("的"):
+        inner = inner[:-1]
+    if template == "{}":
+        return inner
+    # 关系 + {}关系 -> 关系
+    literal = template.replace("{}", "")
+    if literal and literal in inner:
+        return inner
+    return template.format(inner)
+
+
+class MorphAnalyzer:
+    """
+    Segments words into prefixes, a root and suffixes using the curated lexicon
+    in data/morphemes.json, and renders the result in the shape Gemini returns.
+    """
+
+    def __init__(self, lexicon: dict):
+        self.version = lexicon.get("version", 1)
+        self.prefixes = Trie()
+        self.roots = Trie()
+        self.suffixes = Trie()
+        # Prefixes that mean something else on a verb: un- is "not" on happy, "reverse" on lock
+        self.verb_prefixes: Dict[str, Morpheme] = {}
+        # Words that segment cleanly but don't mean the sum of their parts (re + member)
+        self.opaque = set(lexicon.get("opaque", []))
+        self.answered = 0
+        self.deferred = 0
+
+        for text, entry in lexicon["prefixes"].items():
+            self.prefixes.insert(text, Morpheme("prefix", text, text, entry["meaning"], entry["zh"], entry["template"], entry["weight"]))
+            verb = entry.get("verb")
+            if verb:
+                self.verb_prefixes[text] = Morpheme("prefix", text, text, verb["meaning"], verb["zh"], verb["template"], verb["weight"])
+        for text, entry in lexicon["suffixes"].items():
+            self.suffixes.insert(text, Morpheme("suffix", text, text, entry["meaning"], entry["zh"], entry["template"], entry["weight"], pos=entry.get("pos")))
+        for text, entry in lexicon["roots"].items():
+            pos = entry.get("pos")
+            self.roots.insert(text, Morpheme("root", text, text, entry["meaning"], entry["zh"], pos=pos))
+            for surface, change in spelling_variants(text):
+                self.roots.insert(surface, Morpheme("root", surface, text, entry["meaning"], entry["zh"], change=change, pos=pos))
+        for text, entry in lexicon["bound_roots"].items():
+            self.roots.insert(text, Morpheme("root", text, text, entry["meaning"], entry["zh"], free=False))
+
+    @classmethod
+    def load(cls, path: str = MORPHEME_LEXICON) -> "MorphAnalyzer":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def segment(self, word: str) -> Optional[Tuple[float, List[Morpheme]]]:
+        """Best complete segmentation as `(log score, morphemes)`, or None if the lexicon can't cover the word."""
+        memo: Dict[tuple, Optional[Tuple[float, int, List[Morpheme]]]] = {}
+
+        def best(pos: int, phase: str, count: int, change: Optional[str]):
+            key = (pos, phase, count, change)
+            if key in memo:
+                return memo[key]
+
+            # Candidates are (log weight, root length, morphemes); the root length breaks ties
+            candidates = []
+            if phase == "prefix":
+                if count < MAX_PREFIXES:
+                    for end, values in self.prefixes.matches(word, pos):
+                        for prefix in values:
+                            rest = best(end, "prefix", count + 1, None)
+                            if rest:
+                                candidates.append((math.log(prefix.weight) + rest[0], rest[1], [prefix] + rest[2]))
+                rest = best(pos, "root", 0, None)
+                if rest:
+                    candidates.append(rest)
+            elif phase == "root":
+                for end, values in self.roots.matches(word, pos):
+                    if end - pos < MIN_ROOT_LENGTH and end - pos < len(values[0].form):
+                        continue
+                    for root in values:
+                        rest = best(end, "suffix", 0, root.change)
+                        if rest:
+                            score = 0.0 if root.free else math.log(BOUND_ROOT_FACTOR)
+                            if root.change:
+                                score += math.log(SPELLING_CHANGE_FACTOR)
+                            candidates.append((score + rest[0], len(root.form), [root] + rest[2]))
+            else:
+                if pos == len(word):
+                    # A changed stem ("happi") must be followed by a suffix
+                    if change is None:
+                        candidates.append((0.0, 0, []))
+                elif count < MAX_SUFFIXES:
+                    for end, values in self.suffixes.matches(word, pos):
+                        for suffix in values:
+                            if not allows(change, suffix):
+                                continue
+                            rest = best(end, "suffix", count + 1, None)
+                            if rest:
+                                candidates.append((math.log(suffix.weight) + rest[0], 0, [suffix] + rest[2]))
+
+            result = max(candidates, key=lambda c: (c[0], c[1])) if candidates else None
+            memo[key] = result
+            return result
+
+        found = best(0, "prefix", 0, None)
+        return (found[0], found[2]) if found else None
+
+    def analyze(self, word: str) -> Optional[Tuple[dict, float]]:
+        """Returns `(data, confidence)` in the `fetch_etymology` shape, or None when the word can't be segmented."""
+        if len(word) < MIN_WORD_LENGTH or not word.isalpha() or not word.isascii() or word in self.opaque:
+            return None
+        found = self.segment(word)
+        if not found:
+            return None
+
+        score, morphemes = found
+        prefixes = [m for m in morphemes if m.kind == "prefix"]
+        root = next(m for m in morphemes if m.kind == "root")
+        suffixes = [m for m in morphemes if m.kind == "suffix"]
+        confidence = math.exp(score)
+        # Prefixes apply to the root with its suffixes; on a verb some change meaning
+        # (unlock is not 不锁), and those readings are weighted on their own
+        if (suffixes[-1].pos if suffixes else root.pos) == "verb":
+            for index, prefix in enumerate(prefixes):
+                verb = self.verb_prefixes.get(prefix.form)
+                if verb:
+                    prefixes[index] = verb
+                    confidence *= verb.weight / prefix.weight
+        if not prefixes and not suffixes:
+            # A bare root has nothing to explain; Gemini gives a better etymology
+            confidence *= 0.5
+
+        # Suffixes bind tighter than prefixes: un(read-able) -> 不 + 可读的
+        translation = root.zh
+        for affix in suffixes + prefixes[::-1]:
+            translation = compose(affix.template, translation)
+
+        parts = [f"{p.form}-（{p.zh}）" for p in prefixes] + [f"{root.form}（{root.zh}）"] + [f"-{s.form}（{s.zh}）" for s in suffixes]
+        data = {
+            "root": f"{root.form} ({root.meaning})",
+            "prefix": "; ".join(f"{p.form}- ({p.meaning})" for p in prefixes) or "None",
+            "suffix": "; ".join(f"-{s.form} ({s.meaning})" for s in suffixes) or "None",
+            "translation": translation,
+            "desc": f"{' + '.join(parts)}，意为“{translation}”",
+        }
+        return data, round(confidence, 3)
+
+    def lookup(self, word: str, min_confidence: float = OFFLINE_MIN_CONFIDENCE) -> Optional[Tuple[dict, float]]:
+        """Like `analyze`, but only returns answers confident enough to skip Gemini."""
+        result = self.analyze(word)
+        if result and result[1] >= min_confidence:
+            self.answered += 1
+            return result
+        self.deferred += 1
+        return None
+
+    def stats(self) -> dict:
+        total = self.answered + self.deferred
+        return {
+            "answered": self.answered,
+            "deferred": self.deferred,
+            "answer_ratio": round(self.answered / total, 4) if total else 0.0
+        }
+
+
+analyzer: Optional[MorphAnalyzer] = None
+
+
+def get_analyzer() -> Optional[MorphAnalyzer]:
+    """Loads the lexicon on first use; None when OFFLINE_ANALYZER is disabled."""
+    global analyzer
+    if analyzer is None and OFFLINE_ANALYZER:
+        analyzer = MorphAnalyzer.load()
+    return analyzer
@@ -0,0 +1,67 @@
+import base64
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value: str, row_id: str) -> str:
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Cursors are opaque to clients; both halves are validated before they reach a query filter."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value).isoformat(), str(uuid.UUID(row_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_columns(fields: Optional[str], allowed: Iterable[str], required: Iterable[str]) -> str:
+    """
+    Turns a `fields=` query value into a PostgREST select list. The keyset
+    columns in `required` are always included so the next cursor can be built.
+    """
+    if not fields:
+        return "*"
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = list(dict.fromkeys(list(required) + requested))
+    return ",".join(columns)
+
+
+def paginate(rows: List[dict], limit: int, sort_key: str) -> Tuple[List[dict], Optional[str]]:
+    """Storage queries fetch `limit + 1` rows; the extra row only tells us another page exists."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[sort_key], last["id"])
+
+
+def conditional_json(request: Request, payload: dict) -> Response:
+    """Returns the payload with an ETag, or an empty 304 when the client already has it."""
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":"), ensure_ascii=False).encode()
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type=JSONResponse.media_type, headers=headers)
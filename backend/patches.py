@@ -0,0 +1,142 @@
+from typing import Any, List, Tuple
+
+JSON_PATCH = "application/json-patch+json"
+MERGE_PATCH = "application/merge-patch+json"
+
+
+class PatchError(ValueError):
+    """A patch that can't be applied; `conflict` marks a failed `test` operation."""
+
+    def __init__(self, message: str, conflict: bool = False):
+        super().__init__(message)
+        self.conflict = conflict
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7386 JSON Merge Patch. Updates `target` in place where it can; use the return value."""
+    if not isinstance(patch, dict):
+        return patch
+    if not isinstance(target, dict):
+        target = {}
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = apply_merge_patch(target.get(key), value)
+    return target
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """RFC 6901 JSON Pointer -> reference tokens ("/a~1b/0" -> ["a/b", "0"])."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(doc: Any, tokens: List[str]) -> Any:
+    node = doc
+    for token in tokens:
+        if isinstance(node, dict):
+            if token not in node:
+                raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+def _parent(doc: Any, tokens: List[str]) -> Tuple[Any, str]:
+    parent = _resolve(doc, tokens[:-1])
+    if not isinstance(parent, (dict, list)):
+        raise PatchError(f"Not a container: /{'/'.join(tokens[:-1])}")
+    return parent, tokens[-1]
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent, token = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        parent[token] = value
+    else:
+        parent.insert(_index(parent, token, allow_end=True), value)
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the whole document")
+    parent, token = _parent(doc, tokens)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(token)
+    return parent.pop(_index(parent, token))
+
+
+def apply_json_patch(doc: Any, operations: List[dict]) -> Any:
+    """
+    RFC 6902 JSON Patch. Operations are applied in order to `doc` in place, so
+    callers pass a copy they can throw away if a later operation fails.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("A JSON Patch must be an array of operations")
+
+    for operation in operations:
+        if not isinstance(operation, dict) or not isinstance(operation.get("path"), str):
+            raise PatchError(f"Invalid operation: {operation!r}")
+        op = operation.get("op")
+        tokens = parse_pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"'{op}' needs a value")
+        if op in ("move", "copy") and not isinstance(operation.get("from"), str):
+            raise PatchError(f"'{op}' needs a 'from' pointer")
+
+        if op == "add":
+            doc = _add(doc, tokens, operation["value"])
+        elif op == "remove":
+            _remove(doc, tokens)
+        elif op == "replace":
+            _resolve(doc, tokens)
+            if tokens:
+                _remove(doc, tokens)
+            doc = _add(doc, tokens, operation["value"])
+        elif op == "move":
+            source = parse_pointer(operation["from"])
+            if tokens[:len(source)] == source and tokens != source:
+                raise PatchError("Cannot move a value into one of its own children")
+            value = _remove(doc, source) if source else doc
+            doc = _add(doc, tokens, value)
+        elif op == "copy":
+            value = _resolve(doc, parse_pointer(operation["from"]))
+            doc = _add(doc, tokens, _clone(value))
+        elif op == "test":
+            if _resolve(doc, tokens) != operation["value"]:
+                raise PatchError(f"Test failed at {operation['path']}", conflict=True)
+        else:
+            raise PatchError(f"Unknown operation: {op!r}")
+    return doc
+
+
+def _clone(value: Any) -> Any:
+    # Cheaper than deepcopy for plain JSON values
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
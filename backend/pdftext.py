@@ -0,0 +1,46 @@
+"""
+Word extraction from PDF bytes. Runs in the vocabulary indexer's worker processes,
+so it imports nothing from the app and stays cheap to load.
+"""
+import io
+import itertools
+import re
+from collections import Counter
+from typing import Dict, Tuple
+
+from pypdf import PdfReader
+
+# Words hyphenated across a line break: "recon-\nstruction"
+HYPHENATED = re.compile(r"([a-z])-[ \t]*\r?\n\s*([a-z])")
+TOKEN = re.compile(r"[A-Za-z]+")
+# Shorter tokens are function words, initials and extraction debris
+MIN_TOKEN_LENGTH = 3
+
+
+def extract_word_counts(data: bytes, max_pages: int) -> Tuple[int, int, Dict[str, Tuple[int, int]]]:
+    """
+    Returns (page count, token count, {lowercased word: (occurrences, lowercase occurrences)}).
+    Words that never appear in lowercase are mostly names and acronyms.
+    """
+    reader = PdfReader(io.BytesIO(data))
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError("PDF is password protected")
+
+    total: Counter = Counter()
+    lowercase: Counter = Counter()
+    tokens = 0
+    for page in itertools.islice(reader.pages, max_pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # One malformed content stream shouldn't lose the rest of the document
+            continue
+        for token in TOKEN.findall(HYPHENATED.sub(r"\1\2", text)):
+            tokens += 1
+            if len(token) < MIN_TOKEN_LENGTH:
+                continue
+            word = token.lower()
+            total[word] += 1
+            if token[0].islower():
+                lowercase[word] += 1
+    return len(reader.pages), tokens, {word: (count, lowercase[word]) for word, count in total.items()}
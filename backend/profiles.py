@@ -0,0 +1,68 @@
+import os
+from typing import Optional
+
+from cache import SingleFlight, TTLCache
+
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "10000"))
+# Short, because premium upgrades and monthly resets happen outside this process
+PROFILE_CACHE_TTL = int(os.environ.get("PROFILE_CACHE_TTL", "60"))
+
+
+class ProfileCache:
+    """
+    Per-process read-through cache of `profiles` rows. Writes made by this
+    process (usage increments, profile creation) update the cached row in place.
+    """
+
+    def __init__(self, maxsize: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.entries = TTLCache(maxsize, ttl)
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, storage, user_id: str) -> Optional[dict]:
+        profile = self.entries.get(user_id)
+        if profile is not None:
+            self.hits += 1
+            return profile
+
+        async def load():
+            self.misses += 1
+            row = await storage.get_profile(user_id)
+            if row is not None:
+                self.entries.set(user_id, row)
+            return row
+
+        profile, _ = await self.flights.do(user_id, load)
+        return profile
+
+    def peek(self, user_id: str) -> Optional[dict]:
+        """Returns the cached row without loading it or counting a hit."""
+        return self.entries.get(user_id)
+
+    def put(self, user_id: str, profile: dict):
+        self.entries.set(user_id, profile)
+
+    def update(self, user_id: str, **fields):
+        profile = self.entries.get(user_id)
+        if profile is not None:
+            self.entries.set(user_id, {**profile, **fields})
+
+    def invalidate(self, user_id: str):
+        self.entries.pop(user_id)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self.entries)
+        }
+
+
+profile_cache = ProfileCache()
+
+
+def get_profile_cache() -> ProfileCache:
+    return profile_cache
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+from metrics import timed
+from storage import get_storage
+
+PDF_PROGRESS_FLUSH_INTERVAL = float(os.environ.get("PDF_PROGRESS_FLUSH_INTERVAL", "2.0"))
+
+
+class ProgressBuffer:
+    """
+    Coalesces `last_page` updates: clients report every page turn while scrolling,
+    but only the latest page per PDF is written, once every `flush_interval` seconds.
+    All `last_page` writes go through here, so a flush can never overwrite a newer page.
+    """
+
+    def __init__(self, flush_interval: float = PDF_PROGRESS_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pages: Dict[Tuple[str, str], int] = {}
+        self._writing: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+
+    def set(self, user_id: str, pdf_id: str, last_page: int):
+        self._pages[(user_id, pdf_id)] = last_page
+        self.received += 1
+
+    def pending(self, user_id: str, pdf_id: str) -> Optional[int]:
+        """The page waiting to be written, which is newer than what storage returns."""
+        key = (user_id, pdf_id)
+        return self._pages.get(key, self._writing.get(key))
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pages:
+                return
+            pages, self._pages = self._pages, {}
+            self._writing = pages
+            rows = [(user_id, pdf_id, page) for (user_id, pdf_id), page in pages.items()]
+            storage = get_storage()
+            try:
+                with timed("progress_flush"):
+                    await storage.update_pdf_pages(rows)
+                self.written += len(rows)
+            except Exception as e:
+                print(f"PDF progress flush failed ({len(rows)} rows), retrying row by row: {e}")
+                # One bad row fails the whole statement; write the rest and drop the ones that
+                # still fail rather than re-queue them into every later flush
+                for row in rows:
+                    try:
+                        await storage.update_pdf_pages([row])
+                        self.written += 1
+                    except Exception as row_error:
+                        self.dropped += 1
+                        print(f"Dropped PDF progress for {row[1]}: {row_error}")
+            finally:
+                self._writing = {}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the periodic flush and writes whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"received": self.received, "written": self.written, "dropped": self.dropped, "pending": len(self._pages)}
+
+
+progress_buffer = ProgressBuffer()
+
+
+def get_progress_buffer() -> ProgressBuffer:
+    return progress_buffer
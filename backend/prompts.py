@@ -0,0 +1,237 @@
+"""
+Etymology prompts: what is sent to Gemini and how its answer is read back, plus the
+calls that do both (`fetch_etymology`, `fetch_etymology_batch`) for the routers, PDF
+pre-analysis and warm_cache.py.
+
+Requests use JSON response mode with a response schema. The model then writes bare JSON
+with the fields in a fixed order, and the field descriptions in the schema carry the
+instructions the old prompt spelled out, so the prompt text itself is one line. Answers
+are validated into `Etymology`. Output cut off part-way (the token limit, a dropped
+stream) is closed up by `repair_truncated` instead of failing the lookup; fields lost
+to the cut fall back to their defaults when they have one. Such an answer comes back as
+`PartialAnswer`: good enough to show once, never cached, so the next lookup asks again.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, ValidationError
+
+from cache import normalize_word
+from gemini import get_gemini
+from jsonstream import repair_truncated
+from metrics import GEMINI_CALL_TOKENS
+
+# Bump whenever the prompt or the response shape changes, so stale cache entries are not served.
+PROMPT_VERSION = "v4"
+# Older versions, newest first, whose entries are served only while Gemini is unavailable
+PREVIOUS_PROMPT_VERSIONS = ["v3", "v2", "v1"]
+
+# Thinking tokens are billed as output and add seconds of latency; a fixed-shape lookup
+# doesn't need them. Empty leaves the model's default (for models without thinking).
+GEMINI_THINKING_BUDGET = os.environ.get("GEMINI_THINKING_BUDGET", "0")
+
+# Rough token accounting used to pack batch prompts: the fixed instructions,
+# plus the JSON entry the model writes back for each word.
+BATCH_TOKEN_BUDGET = int(os.environ.get("GEMINI_BATCH_TOKEN_BUDGET", "8000"))
+BATCH_PROMPT_TOKENS = 250
+BATCH_ENTRY_TOKENS = 120
+BATCH_CONCURRENCY = int(os.environ.get("GEMINI_BATCH_CONCURRENCY", "4"))
+
+FIELD_DESCRIPTIONS = {
+    "root": "词根及含义 (英文)",
+    "prefix": "前缀及含义 (英文)，无则填 None",
+    "suffix": "后缀及含义 (英文)，无则填 None",
+    "translation": "单词的简短中文释义 (10字以内)",
+    "desc": "根据前缀、后缀和词根总结单词的意思 (简体中文，30字以内)",
+}
+WORD_DESCRIPTION = "被分析的单词 (与输入完全一致)"
+
+
+class Etymology(BaseModel):
+    root: str
+    prefix: str = "None"
+    suffix: str = "None"
+    translation: str
+    desc: str = ""
+
+
+class ResponseParseError(Exception):
+    pass
+
+
+class PartialAnswer(Exception):
+    """An answer that was cut off and repaired; `data` may serve this request but must not be cached."""
+
+    def __init__(self, data: dict):
+        super().__init__("AI response was cut off")
+        self.data = data
+
+
+def object_schema(descriptions: Dict[str, str]) -> dict:
+    fields = list(descriptions)
+    return {
+        "type": "OBJECT",
+        "properties": {name: {"type": "STRING", "description": text} for name, text in descriptions.items()},
+        "required": fields,
+        # Fields arrive in this order, which is also the order the stream endpoint forwards them in
+        "propertyOrdering": fields,
+    }
+
+
+ETYMOLOGY_SCHEMA = object_schema(FIELD_DESCRIPTIONS)
+BATCH_SCHEMA = {"type": "ARRAY", "items": object_schema({"word": WORD_DESCRIPTION, **FIELD_DESCRIPTIONS})}
+
+
+def generation_config(schema: dict) -> dict:
+    config = {"responseMimeType": "application/json", "responseSchema": schema}
+    if GEMINI_THINKING_BUDGET:
+        config["thinkingConfig"] = {"thinkingBudget": int(GEMINI_THINKING_BUDGET)}
+    return config
+
+
+def etymology_request(word: str) -> dict:
+    return {
+        "contents": [{"parts": [{"text": f"分析英语单词 {json.dumps(word)} 的构词。"}]}],
+        "generationConfig": generation_config(ETYMOLOGY_SCHEMA),
+    }
+
+
+def batch_request(words: List[str]) -> dict:
+    return {
+        "contents": [{"parts": [{"text": f"逐个分析以下英语单词的构词，每个单词一个对象：{json.dumps(words)}"}]}],
+        "generationConfig": generation_config(BATCH_SCHEMA),
+    }
+
+
+# Parse outcomes per prompt: "ok", "repaired" (truncated output closed up) or "failed"
+parse_results: Dict[str, Dict[str, int]] = {
+    prompt: {"ok": 0, "repaired": 0, "failed": 0} for prompt in ("single", "batch", "stream")
+}
+
+
+def record_usage(prompt: str, usage: Optional[dict]):
+    """Records one call's token counts from its usageMetadata."""
+    usage = usage or {}
+    GEMINI_CALL_TOKENS.labels(prompt, "prompt").observe(usage.get("promptTokenCount", 0))
+    GEMINI_CALL_TOKENS.labels(prompt, "output").observe(usage.get("candidatesTokenCount", 0))
+    GEMINI_CALL_TOKENS.labels(prompt, "thoughts").observe(usage.get("thoughtsTokenCount", 0))
+
+
+def response_text(result: dict) -> str:
+    """The text of a generateContent response's first candidate."""
+    try:
+        candidate = result["candidates"][0]
+    except (KeyError, IndexError):
+        reason = (result.get("promptFeedback") or {}).get("blockReason")
+        raise ResponseParseError("Failed to parse AI response: no candidates" + (f" (blocked: {reason})" if reason else ""))
+    parts = (candidate.get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def chunk_text(chunk: dict) -> str:
+    """The text of one streamed chunk."""
+    try:
+        return "".join(part.get("text", "") for part in chunk["candidates"][0]["content"]["parts"])
+    except (KeyError, IndexError):
+        # Chunks that only carry usage metadata or a finish reason have no text
+        return ""
+
+
+def decode(text: str) -> Tuple[Any, bool]:
+    """The JSON value in `text` and whether it had to be repaired first."""
+    # JSON mode writes bare JSON, but models without it still wrap answers in Markdown fences
+    clean = text.replace("```json", "").replace("```", "").strip()
+    try:
+        return json.loads(clean), False
+    except json.JSONDecodeError as e:
+        error = e
+    repaired = repair_truncated(clean)
+    if repaired is not None:
+        try:
+            return json.loads(repaired), True
+        except json.JSONDecodeError:
+            pass
+    raise ResponseParseError(f"Failed to parse AI response: {error}")
+
+
+def parse_etymology(text: str, prompt: str = "single") -> dict:
+    """Validates a single-word answer into the cached entry shape; raises `PartialAnswer` if it was repaired."""
+    try:
+        value, repaired = decode(text)
+        data = Etymology.model_validate(value).model_dump()
+    except (ResponseParseError, ValidationError) as e:
+        parse_results[prompt]["failed"] += 1
+        if isinstance(e, ResponseParseError):
+            raise
+        raise ResponseParseError(f"Failed to parse AI response: {e.error_count()} invalid fields")
+    parse_results[prompt]["repaired" if repaired else "ok"] += 1
+    if repaired:
+        raise PartialAnswer(data)
+    return data
+
+
+def parse_batch(text: str, words: List[str]) -> Dict[str, Union[dict, PartialAnswer]]:
+    """
+    Fans a batch answer back out per word. Entries for words that weren't asked for, or
+    that don't validate, are left for the caller. When the answer was cut off, the last
+    entry (the one the cut went through) comes back as a `PartialAnswer`.
+    """
+    try:
+        value, repaired = decode(text)
+        if not isinstance(value, list):
+            raise ResponseParseError("Failed to parse AI response: expected a JSON array")
+    except ResponseParseError:
+        parse_results["batch"]["failed"] += 1
+        raise
+    parse_results["batch"]["repaired" if repaired else "ok"] += 1
+
+    wanted = set(words)
+    fanned = {}
+    for index, entry in enumerate(value):
+        if not isinstance(entry, dict) or not isinstance(entry.get("word"), str):
+            continue
+        word = normalize_word(entry["word"])
+        if word not in wanted:
+            continue
+        try:
+            data = Etymology.model_validate(entry).model_dump()
+        except ValidationError:
+            continue
+        fanned[word] = PartialAnswer(data) if repaired and index == len(value) - 1 else data
+    return fanned
+
+
+def pack_words(words: List[str], budget: int = BATCH_TOKEN_BUDGET) -> List[List[str]]:
+    """Greedily splits words into chunks whose estimated prompt + output tokens fit the budget."""
+    chunks = []
+    current = []
+    used = BATCH_PROMPT_TOKENS
+    for word in words:
+        cost = BATCH_ENTRY_TOKENS + len(word) // 4 + 1
+        if current and used + cost > budget:
+            chunks.append(current)
+            current = []
+            used = BATCH_PROMPT_TOKENS
+        current.append(word)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def fetch_etymology(word: str) -> dict:
+    result = await get_gemini().generate(etymology_request(word))
+    record_usage("single", result.get("usageMetadata"))
+    return parse_etymology(response_text(result))
+
+
+async def fetch_etymology_batch(words: List[str]) -> Dict[str, Union[dict, PartialAnswer]]:
+    result = await get_gemini().generate(batch_request(words))
+    record_usage("batch", result.get("usageMetadata"))
+    # Anything the model dropped is left for the caller
+    return parse_batch(response_text(result), words)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {prompt: dict(results) for prompt, results in parse_results.items()}
@@ -1,84 +1,336 @@
 from fastapi import APIRouter, Depends, HTTPException
-from database import get_supabase
+from fastapi.responses import StreamingResponse
 from deps import get_current_user
-from supabase import Client
-import os
-import requests
+from admission import FREE, PREMIUM, GeminiScheduler, Overloaded, get_gemini_scheduler, is_upstream_failure
+from cache import EtymologyCache, get_etymology_cache, normalize_word
+from gemini import get_gemini
+from history import HistoryBuffer, get_history_buffer
+from profiles import ProfileCache, get_profile_cache
+from metrics import STAGE_LATENCY, timed
+from jsonstream import JsonFieldParser
+from prompts import BATCH_CONCURRENCY, PREVIOUS_PROMPT_VERSIONS, PROMPT_VERSION, PartialAnswer, ResponseParseError, chunk_text, etymology_request, fetch_etymology, fetch_etymology_batch, pack_words, parse_etymology, record_usage
+from morphology import OFFLINE_FALLBACK_CONFIDENCE, MorphAnalyzer, get_analyzer
+from lemmatizer import Lemmatizer, get_lemmatizer
+from storage import StorageBackend, get_storage
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+import asyncio
 import json
+import time
 
 router = APIRouter(prefix="/analyze", tags=["analyze"])
 
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+MAX_FREE_USAGE = 50
+MAX_BATCH_WORDS = 200
+
+# Suggested wait when Gemini fails without the breaker having opened yet
+UNAVAILABLE_RETRY_AFTER = 5
+
+# Proxies such as nginx buffer responses unless told otherwise, which defeats streaming
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+class BatchAnalyzeRequest(BaseModel):
+    words: List[str]
 
 @router.post("/")
-def analyze_word(word: str, current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
-    # 1. Check Usage Quota
+async def analyze_word(word: str, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), cache: EtymologyCache = Depends(get_etymology_cache), history: HistoryBuffer = Depends(get_history_buffer), profiles: ProfileCache = Depends(get_profile_cache), analyzer: Optional[MorphAnalyzer] = Depends(get_analyzer), lemmatizer: Optional[Lemmatizer] = Depends(get_lemmatizer), scheduler: GeminiScheduler = Depends(get_gemini_scheduler)):
     user_id = current_user.id
-    
-    # Query user profile for quota check
-    res = supabase.table("profiles").select("query_usage_current_month, is_premium, premium_expiry").eq("id", user_id).single().execute()
-    
-    if not res.data:
-        # Create profile if not exists (fallback)
-        pass # Implementation TBD
-        
-    usage = res.data.get("query_usage_current_month", 0)
-    is_premium = res.data.get("is_premium", False)
-    
-    MAX_FREE_USAGE = 50
-    if not is_premium and usage >= MAX_FREE_USAGE:
-        raise HTTPException(status_code=403, detail="Monthly free quota exceeded. Upgrade to Premium.")
-        
-    # 2. Call Gemini API (Logic from background.js adapted to Python)
+
+    # 1. Check and consume quota in one atomic call
+    with timed("quota"):
+        quota = await consume_quota(storage, profiles, user_id, 1)
+
+    # 2. Inflected forms share their lemma's entry: "running" is looked up as "run"
+    lemma = lemma_of(lemmatizer, word)
+
+    # 3. Transparent words are segmented locally; nothing is cached for them
+    with timed("offline"):
+        offline = analyzer.lookup(lemma) if analyzer else None
+    if offline:
+        data, confidence = offline
+        history.add(user_id, [word])
+        return {"success": True, "word": word, "lemma": lemma, "data": data, "cache": "offline", "confidence": confidence, "usage": quota["usage"]}
+
+    # 4. Serve from the shared cache, calling Gemini only on a miss, through admission control
+    priority = PREMIUM if quota["is_premium"] else FREE
+
+    async def fetch(w: str) -> dict:
+        return await scheduler.run(lambda: fetch_etymology(w), priority)
+
     try:
-        data = fetch_etymology(word)
-        
-        # 3. Update Usage
-        supabase.table("profiles").update({"query_usage_current_month": usage + 1}).eq("id", user_id).execute()
-        
-        # 4. Optional: Log to history
-        supabase.table("search_history").insert({"user_id": user_id, "word": word}).execute()
-        
-        return {"success": True, "data": data}
-        
+        with timed("etymology"):
+            data, source = await cache.get_or_fetch(storage, lemma, PROMPT_VERSION, fetch)
+    except PartialAnswer as e:
+        # A cut-off answer is shown but not cached, so the next lookup asks Gemini again
+        history.add(user_id, [word])
+        return {"success": True, "word": word, "lemma": lemma, "data": e.data, "cache": "miss", "partial": True, "usage": quota["usage"]}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-def fetch_etymology(word: str):
-    if not GEMINI_API_KEY:
-        raise Exception("GEMINI_API_KEY not configured")
-        
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-    
-    prompt = f"""
-        你是一个专业的词源学家。请分析英语单词 "{word}"。
-        请务必只返回纯 JSON 格式数据，不要包含 Markdown 格式。
-        JSON 结构如下：
-        {{
-            "root": "词根及含义 (英文)",
-            "prefix": "前缀及含义 (英文)，无则填 None",
-            "suffix": "后缀及含义 (英文)，无则填 None",
-            "translation": "单词的简短中文释义 (10字以内)",
-            "desc": "根据前缀、后缀和词根，总结一下单词的意思 (简体中文，30字以内)"
-        }}
-    """
-    
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}]
+        if not isinstance(e, (Overloaded, ResponseParseError)) and not is_upstream_failure(e):
+            await refund_quota(storage, profiles, user_id, 1)
+            raise HTTPException(status_code=500, detail=str(e))
+
+        # 5. Gemini is overloaded, failing or answered unreadably: an older or less certain answer beats an error
+        fallback = await degraded_answers(storage, cache, analyzer, [lemma])
+        if lemma not in fallback:
+            await refund_quota(storage, profiles, user_id, 1)
+            raise unavailable(e, scheduler)
+        data, source, confidence = fallback[lemma]
+        history.add(user_id, [word])
+        response = {"success": True, "word": word, "lemma": lemma, "data": data, "cache": source, "degraded": True, "usage": quota["usage"]}
+        if confidence is not None:
+            response["confidence"] = confidence
+        return response
+
+    # 6. Log the word as the user looked it up (buffered, written in bulk)
+    with timed("history"):
+        history.add(user_id, [word])
+
+    return {"success": True, "word": word, "lemma": lemma, "data": data, "cache": "miss" if source == "miss" else "hit", "usage": quota["usage"]}
+
+@router.post("/batch")
+async def analyze_batch(request: BatchAnalyzeRequest, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), cache: EtymologyCache = Depends(get_etymology_cache), history: HistoryBuffer = Depends(get_history_buffer), profiles: ProfileCache = Depends(get_profile_cache), analyzer: Optional[MorphAnalyzer] = Depends(get_analyzer), lemmatizer: Optional[Lemmatizer] = Depends(get_lemmatizer), scheduler: GeminiScheduler = Depends(get_gemini_scheduler)):
+    user_id = current_user.id
+
+    # 1. Normalize and dedupe, keeping the client's order
+    words = list(dict.fromkeys(w for w in (normalize_word(w) for w in request.words) if w))
+    if not words:
+        return {"success": True, "data": {}, "lemmas": {}, "degraded": [], "partial": [], "errors": {}, "cache": {"hits": 0, "misses": 0, "offline": 0}}
+    if len(words) > MAX_BATCH_WORDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_WORDS} distinct words per batch.")
+
+    # 2. Charge quota for the whole batch in one atomic call
+    with timed("quota"):
+        quota = await consume_quota(storage, profiles, user_id, len(words))
+
+    # 3. Inflected forms of the same word ("runs", "running") are looked up once, as their lemma
+    lemmas = {w: lemma_of(lemmatizer, w) for w in words}
+    unique = list(dict.fromkeys(lemmas.values()))
+
+    # 4. Answer transparent words locally, serve cache hits, then pack the misses
+    #    into as few prompts as the budget allows
+    offline = {}
+    if analyzer:
+        with timed("offline"):
+            for w in unique:
+                answer = analyzer.lookup(w)
+                if answer:
+                    offline[w] = answer[0]
+    lookups = [w for w in unique if w not in offline]
+    with timed("etymology"):
+        results = await cache.get_many(storage, lookups, PROMPT_VERSION)
+    misses = [w for w in lookups if w not in results]
+    errors = {}
+    degraded = {}
+    partial = {}
+
+    if misses:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        priority = PREMIUM if quota["is_premium"] else FREE
+
+        async def run_chunk(chunk):
+            async with semaphore:
+                try:
+                    return await scheduler.run(lambda: fetch_etymology_batch(chunk), priority)
+                except Exception as e:
+                    return {w: e for w in chunk}
+
+        fetched = {}
+        for chunk_result in await asyncio.gather(*(run_chunk(c) for c in pack_words(misses))):
+            fetched.update(chunk_result)
+
+        fresh = {}
+        unavailable_words = []
+        for w in misses:
+            entry = fetched.get(w)
+            if isinstance(entry, dict):
+                fresh[w] = entry
+            elif isinstance(entry, PartialAnswer):
+                # Cut off by the output limit: served, but not cached
+                partial[w] = entry.data
+            elif isinstance(entry, Exception) and (isinstance(entry, (Overloaded, ResponseParseError)) or is_upstream_failure(entry)):
+                unavailable_words.append(w)
+                errors[w] = str(entry)
+            else:
+                errors[w] = str(entry) if entry else "Missing from AI response"
+        await cache.put_many(storage, fresh, PROMPT_VERSION)
+        results.update(fresh)
+        results.update(partial)
+
+        # Words Gemini couldn't take fall back to older or less certain answers
+        if unavailable_words:
+            for w, (data, _, _) in (await degraded_answers(storage, cache, analyzer, unavailable_words)).items():
+                degraded[w] = data
+                del errors[w]
+            results.update(degraded)
+
+    results.update(offline)
+
+    # 5. Results are keyed by the words as requested; give back quota for those we could not serve
+    served = [w for w in words if lemmas[w] in results]
+    failed = {w: errors[lemmas[w]] for w in words if lemmas[w] in errors}
+    usage = quota["usage"]
+    if failed:
+        usage = await refund_quota(storage, profiles, user_id, len(failed)) or usage
+    with timed("history"):
+        history.add(user_id, served)
+
+    return {
+        "success": True,
+        "data": {w: results[lemmas[w]] for w in served},
+        "lemmas": {w: lemma for w, lemma in lemmas.items() if lemma != w},
+        "degraded": [w for w in served if lemmas[w] in degraded],
+        "partial": [w for w in served if lemmas[w] in partial],
+        "errors": failed,
+        "cache": {"hits": len(lookups) - len(misses), "misses": len(misses), "offline": len(offline)},
+        "usage": usage
     }
-    
-    headers = {'Content-Type': 'application/json'}
-    
-    response = requests.post(url, json=payload, headers=headers)
-    
-    if response.status_code != 200:
-         raise Exception(f"API Error: {response.text}")
-         
-    result = response.json()
-    
+
+@router.get("/stream")
+async def analyze_stream(word: str, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), cache: EtymologyCache = Depends(get_etymology_cache), history: HistoryBuffer = Depends(get_history_buffer), profiles: ProfileCache = Depends(get_profile_cache), analyzer: Optional[MorphAnalyzer] = Depends(get_analyzer), lemmatizer: Optional[Lemmatizer] = Depends(get_lemmatizer), scheduler: GeminiScheduler = Depends(get_gemini_scheduler)):
+    """
+    Server-sent events: one event per field (`root`, `prefix`, `suffix`, `translation`,
+    `desc`) as soon as the model has finished writing it, then `done` or `error`.
+    """
+    user_id = current_user.id
+    key = lemma_of(lemmatizer, word)
+
+    # 1. Quota, cache lookup and admission happen before the stream opens, so their errors are plain HTTP errors
+    with timed("quota"):
+        quota = await consume_quota(storage, profiles, user_id, 1)
+    with timed("offline"):
+        offline = analyzer.lookup(key) if analyzer else None
+    replay = None
+    if offline:
+        replay = (offline[0], {"cache": "offline"})
+    else:
+        with timed("etymology"):
+            cached, _ = await cache.get(storage, key, PROMPT_VERSION)
+        if cached is not None:
+            replay = (cached, {"cache": "hit"})
+
+    if replay is None:
+        try:
+            await scheduler.acquire(PREMIUM if quota["is_premium"] else FREE)
+        except Overloaded as e:
+            fallback = (await degraded_answers(storage, cache, analyzer, [key])).get(key)
+            if fallback is None:
+                await refund_quota(storage, profiles, user_id, 1)
+                raise unavailable(e, scheduler)
+            replay = (fallback[0], {"cache": fallback[1], "degraded": True})
+
+    async def events():
+        # 2. Offline answers, cache hits and fallbacks are replayed field by field, so clients handle a single shape
+        if replay is not None:
+            data, source = replay
+            for field, value in data.items():
+                yield sse(field, value)
+            history.add(user_id, [word])
+            yield sse("done", {"word": word, "lemma": key, "data": data, **source, "usage": quota["usage"]})
+            return
+
+        # 3. Otherwise forward each field the moment the streamed JSON completes it
+        started = time.perf_counter()
+        parser = JsonFieldParser()
+        text = []
+        usage = None
+        partial = False
+        try:
+            async for chunk in get_gemini().stream(etymology_request(key)):
+                usage = chunk.get("usageMetadata") or usage
+                piece = chunk_text(chunk)
+                text.append(piece)
+                for field, value in parser.feed(piece):
+                    if started is not None:
+                        STAGE_LATENCY.labels("first_field").observe(time.perf_counter() - started)
+                        started = None
+                    yield sse(field, value)
+            record_usage("stream", usage)
+            data = parse_etymology("".join(text), "stream")
+        except PartialAnswer as e:
+            data, partial = e.data, True
+        except Exception as e:
+            scheduler.record(e)
+            await refund_quota(storage, profiles, user_id, 1)
+            yield sse("error", {"detail": str(e)})
+            return
+        scheduler.record()
+
+        # 4. The complete document goes to the cache, exactly as POST /analyze/ would store it;
+        #    one the stream cut off is only sent
+        if partial:
+            history.add(user_id, [word])
+            yield sse("done", {"word": word, "lemma": key, "data": data, "cache": "miss", "partial": True, "usage": quota["usage"]})
+            return
+        await cache.store(storage, key, PROMPT_VERSION, data)
+        history.add(user_id, [word])
+        yield sse("done", {"word": word, "lemma": key, "data": data, "cache": "miss", "usage": quota["usage"]})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def lemma_of(lemmatizer: Optional[Lemmatizer], word: str) -> str:
+    """Cache key for a word: its normalized lemma, or the normalized word when lemmatizing is off."""
+    key = normalize_word(word)
+    return lemmatizer.lemmatize(key) if lemmatizer else key
+
+async def degraded_answers(storage: StorageBackend, cache: EtymologyCache, analyzer: Optional[MorphAnalyzer], words: List[str]) -> Dict[str, tuple]:
+    """
+    Fallbacks for words Gemini can't answer right now, as `{word: (data, source, confidence)}`:
+    an entry cached for an older prompt ("stale"), else a lower-confidence local segmentation ("offline").
+    """
+    answers = {w: (data, "stale", None) for w, data in (await cache.get_stale(storage, words, PREVIOUS_PROMPT_VERSIONS)).items()}
+    if analyzer:
+        for w in words:
+            result = analyzer.analyze(w) if w not in answers else None
+            if result and result[1] >= OFFLINE_FALLBACK_CONFIDENCE:
+                answers[w] = (result[0], "offline", result[1])
+    return answers
+
+def unavailable(error: Exception, scheduler: GeminiScheduler) -> HTTPException:
+    """503 telling the client when to come back, instead of passing Gemini's error text through."""
+    if isinstance(error, Overloaded):
+        retry_after, detail = error.retry_after, str(error)
+    else:
+        print(f"Gemini unavailable: {error}")
+        retry_after = int(scheduler.breaker.retry_after()) if scheduler.breaker.state != "closed" else UNAVAILABLE_RETRY_AFTER
+        detail = "The analysis service is temporarily unavailable."
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def consume_quota(storage: StorageBackend, profiles: ProfileCache, user_id: str, amount: int) -> dict:
+    """Atomically checks the monthly quota and adds `amount` to it (see migrations/0003_consume_query_quota.sql)."""
+    # Users already known to be over quota are turned away without a round trip
+    cached = profiles.peek(user_id)
+    if cached and not cached.get("is_premium") and (cached.get("query_usage_current_month") or 0) + amount > MAX_FREE_USAGE:
+        raise HTTPException(status_code=403, detail="Monthly free quota exceeded. Upgrade to Premium.")
+
+    quota = await storage.consume_quota(user_id, amount, MAX_FREE_USAGE)
+    if not quota:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    profiles.update(user_id, query_usage_current_month=quota["usage"], is_premium=quota["is_premium"])
+    if not quota["allowed"]:
+        raise HTTPException(status_code=403, detail="Monthly free quota exceeded. Upgrade to Premium.")
+    return quota
+
+async def refund_quota(storage: StorageBackend, profiles: ProfileCache, user_id: str, amount: int) -> Optional[int]:
     try:
-        raw_text = result['candidates'][0]['content']['parts'][0]['text']
-        clean_text = raw_text.replace("```json", "").replace("```", "").strip()
-        return json.loads(clean_text)
-    except (KeyError, json.JSONDecodeError) as e:
-        raise Exception(f"Failed to parse AI response: {e}")
+        quota = await storage.consume_quota(user_id, -amount, MAX_FREE_USAGE)
+    except Exception as e:
+        print(f"Quota refund failed for {user_id}: {e}")
+        profiles.invalidate(user_id)
+        return None
+    if not quota:
+        return None
+    profiles.update(user_id, query_usage_current_month=quota["usage"])
+    return quota["usage"]
+
+@router.get("/cache/stats")
+def cache_stats(current_user = Depends(get_current_user), cache: EtymologyCache = Depends(get_etymology_cache), profiles: ProfileCache = Depends(get_profile_cache), analyzer: Optional[MorphAnalyzer] = Depends(get_analyzer), lemmatizer: Optional[Lemmatizer] = Depends(get_lemmatizer)):
+    stats = {"etymology": cache.stats(), "profiles": profiles.stats()}
+    if analyzer:
+        stats["offline"] = analyzer.stats()
+    if lemmatizer:
+        stats["lemmas"] = lemmatizer.stats()
+    stats["admission"] = get_gemini_scheduler().stats()
+    return {"data": stats}
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from database import get_supabase
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
 from deps import get_current_user
-from supabase import Client
-from typing import Optional, List
-from pydantic import BaseModel
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, conditional_json, decode_cursor, paginate, select_columns
+from patches import JSON_PATCH, MERGE_PATCH, PatchError, apply_json_patch, apply_merge_patch, parse_pointer
+from progress import ProgressBuffer, get_progress_buffer
+from storage import StorageBackend, get_storage
+from vocabulary import PDF_VOCAB_MAX_WORDS, VocabularyIndexer, get_vocabulary_indexer
+from profiles import ProfileCache, get_profile_cache
+from typing import Callable, Optional, List, Tuple
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
 
 router = APIRouter(prefix="/pdf", tags=["pdf"])
@@ -15,22 +19,43 @@ class PDFMetadata(BaseModel):
     annotations: Optional[dict] = None
 
 class PDFUpdate(BaseModel):
-    last_page: Optional[int]
-    annotations: Optional[dict]
+    last_page: Optional[int] = None
+    annotations: Optional[dict] = None
+
+PDF_FIELDS = {"id", "filename", "storage_path", "last_page", "annotations", "version", "uploaded_at"}
+# The document that PATCH bodies apply to
+PATCHABLE_FIELDS = {"last_page", "annotations"}
+# Re-reads allowed when another writer bumps the version between our read and write
+PATCH_ATTEMPTS = 3
 
 @router.get("/")
-def list_pdfs(current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def list_pdfs(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    storage: StorageBackend = Depends(get_storage),
+    progress: ProgressBuffer = Depends(get_progress_buffer)
+):
     user_id = current_user.id
-    res = supabase.table("user_pdfs").select("*").eq("user_id", user_id).order("uploaded_at", desc=True).execute()
-    return {"data": res.data}
+    columns = select_columns(fields, PDF_FIELDS, ["id", "uploaded_at"])
+    rows = await storage.list_pdfs(user_id, limit + 1, decode_cursor(cursor), columns)
+    pdfs, next_cursor = paginate(rows, limit, "uploaded_at")
+    # Page turns not yet flushed are newer than the stored value
+    for pdf in pdfs:
+        page = progress.pending(user_id, pdf["id"]) if "last_page" in pdf else None
+        if page is not None:
+            pdf["last_page"] = page
+    return conditional_json(request, {"data": pdfs, "next_cursor": next_cursor})
 
 @router.post("/")
-def register_pdf(pdf: PDFMetadata, current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def register_pdf(pdf: PDFMetadata, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), profiles: ProfileCache = Depends(get_profile_cache), indexer: VocabularyIndexer = Depends(get_vocabulary_indexer)):
     user_id = current_user.id
     
     # Check if Premium?
-    profile_res = supabase.table("profiles").select("is_premium").eq("id", user_id).single().execute()
-    if not profile_res.data or not profile_res.data.get("is_premium"):
+    profile = await profiles.get(storage, user_id)
+    if not profile or not profile.get("is_premium"):
         # For now, maybe allow free users limited PDFs? Or restrict strictly.
         # User requirement said "Premium user gets PDF management".
         raise HTTPException(status_code=403, detail="PDF management is a Premium feature.")
@@ -43,21 +68,157 @@ def register_pdf(pdf: PDFMetadata, current_user = Depends(get_current_user), sup
         "annotations": pdf.annotations
     }
     
-    res = supabase.table("user_pdfs").insert(payload).execute()
-    return {"success": True, "data": res.data}
+    data = await storage.add_pdf(payload)
+    # Extract and pre-analyze the PDF's vocabulary before the reader starts hovering
+    for row in data:
+        indexer.submit(user_id, row["id"], row["storage_path"])
+    return {"success": True, "data": data}
+
+@router.get("/{pdf_id}/vocabulary")
+async def get_pdf_vocabulary(
+    pdf_id: str,
+    request: Request,
+    limit: int = Query(200, ge=1, le=PDF_VOCAB_MAX_WORDS),
+    current_user = Depends(get_current_user),
+    storage: StorageBackend = Depends(get_storage),
+    indexer: VocabularyIndexer = Depends(get_vocabulary_indexer)
+):
+    """
+    The PDF's candidate hard words (lemmas), best first, with how often each occurs.
+    `status` moves through pending, extracting and analyzing to ready (or failed);
+    by `ready` every listed word that Gemini could answer is in the etymology cache.
+    """
+    user_id = current_user.id
+    index = await storage.get_pdf_vocabulary(user_id, pdf_id)
+
+    # PDFs registered before indexing existed, or whose indexing was cut off by a restart
+    if index is None or indexer.is_stale(index):
+        pdf = await storage.get_pdf(user_id, pdf_id, "id,storage_path")
+        if pdf is None:
+            raise HTTPException(status_code=404, detail="PDF not found.")
+        indexer.submit(user_id, pdf_id, pdf["storage_path"])
+        if index is None:
+            index = {"status": "pending", "page_count": None, "token_count": None, "words": [], "analyzed": 0, "failed": 0, "error": None}
+
+    data = {key: index.get(key) for key in ("status", "page_count", "token_count", "analyzed", "failed", "error", "updated_at")}
+    data["total_words"] = len(index["words"])
+    data["words"] = index["words"][:limit]
+    return conditional_json(request, {"data": data})
 
 @router.patch("/{pdf_id}")
-def update_pdf_progress(pdf_id: str, update: PDFUpdate, current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def update_pdf_progress(pdf_id: str, request: Request, response: Response, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), progress: ProgressBuffer = Depends(get_progress_buffer)):
+    """
+    Updates `{"last_page", "annotations"}` from a full `PDFUpdate` (application/json),
+    a JSON Merge Patch (application/merge-patch+json) or a JSON Patch
+    (application/json-patch+json). With `If-Match: "<version>"`, annotation changes
+    are rejected with 409 once someone else has changed them.
+    """
     user_id = current_user.id
-    
-    payload = {}
-    if update.last_page is not None:
-        payload["last_page"] = update.last_page
-    if update.annotations is not None:
-        payload["annotations"] = update.annotations
-        
-    if not payload:
+    media_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if media_type not in ("application/json", MERGE_PATCH, JSON_PATCH):
+        raise HTTPException(status_code=415, detail=f"Use application/json, {MERGE_PATCH} or {JSON_PATCH}.")
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON.")
+    expected_version = parse_if_match(request.headers.get("if-match"))
+
+    # 1. Every format becomes a function from the current document to the new one
+    apply, touched = parse_update(media_type, body)
+    if not touched:
         return {"success": False, "message": "No data to update"}
+    if not touched <= PATCHABLE_FIELDS:
+        raise HTTPException(status_code=422, detail=f"Only {', '.join(sorted(PATCHABLE_FIELDS))} can be updated.")
+
+    # 2. Page turns are coalesced into one write per PDF and interval. Only the first turn
+    #    since the last flush reads the row, to check that the PDF exists and is the user's
+    page_only = touched == {"last_page"} and (media_type != JSON_PATCH or all(op.get("op") in ("add", "replace") for op in body))
+    if page_only:
+        current = progress.pending(user_id, pdf_id)
+        if current is None:
+            row = await storage.get_pdf(user_id, pdf_id, "id,last_page")
+            if row is None:
+                raise HTTPException(status_code=404, detail="PDF not found.")
+            current = row["last_page"] or 1
+        new = patched(apply, {"last_page": current})
+        progress.set(user_id, pdf_id, new["last_page"])
+        return {"success": True}
+
+    # 3. Annotation changes are applied to the stored document and written back only
+    #    if nobody else wrote in between (compare-and-swap on `version`)
+    for _ in range(PATCH_ATTEMPTS):
+        row = await storage.get_pdf(user_id, pdf_id, "id,last_page,annotations,version")
+        if row is None:
+            raise HTTPException(status_code=404, detail="PDF not found.")
+        if expected_version is not None and row["version"] != expected_version:
+            raise version_conflict(row["version"])
+
+        current = {"last_page": progress.pending(user_id, pdf_id) or row["last_page"], "annotations": row["annotations"]}
+        new = patched(apply, dict(current))
+        if new["last_page"] != current["last_page"]:
+            progress.set(user_id, pdf_id, new["last_page"])
+        if "annotations" not in touched:
+            return {"success": True, "version": row["version"]}
+
+        updated = await storage.update_pdf_versioned(user_id, pdf_id, {"annotations": new["annotations"]}, row["version"])
+        if updated is not None:
+            response.headers["ETag"] = f'"{updated["version"]}"'
+            return {"success": True, "version": updated["version"]}
+
+    raise HTTPException(status_code=409, detail="The PDF is being changed concurrently; retry.")
+
+def parse_update(media_type: str, body) -> Tuple[Callable[[dict], dict], set]:
+    """Returns the update as a function over the document, plus the top-level fields it may change."""
+    if media_type == JSON_PATCH:
+        if not isinstance(body, list) or not all(isinstance(op, dict) for op in body):
+            raise HTTPException(status_code=400, detail="A JSON Patch must be an array of operations.")
+        try:
+            pointers = [parse_pointer(p) for op in body for p in (op.get("path"), op.get("from")) if isinstance(p, str)]
+        except PatchError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        # An empty pointer targets the whole document, which isn't a field we allow
+        return (lambda doc: apply_json_patch(doc, body)), {tokens[0] if tokens else "" for tokens in pointers}
+
+    if media_type == MERGE_PATCH:
+        if not isinstance(body, dict):
+            raise HTTPException(status_code=400, detail="A merge patch must be a JSON object.")
+        return (lambda doc: apply_merge_patch(doc, body)), set(body)
+
+    try:
+        update = PDFUpdate.model_validate(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    fields = {k: v for k, v in (("last_page", update.last_page), ("annotations", update.annotations)) if v is not None}
+    # Plain JSON keeps its original meaning: each field sent replaces the stored one
+    return (lambda doc: {**doc, **fields}), set(fields)
+
+
+def patched(apply: Callable[[dict], dict], doc: dict) -> dict:
+    try:
+        new = apply(doc)
+    except PatchError as e:
+        # RFC 5789: a failed `test` means the document is not in the state the client expected
+        raise HTTPException(status_code=409 if e.conflict else 422, detail=str(e))
+    if not isinstance(new, dict) or not set(new) <= PATCHABLE_FIELDS:
+        raise HTTPException(status_code=422, detail=f"Only {', '.join(sorted(PATCHABLE_FIELDS))} can be updated.")
+    last_page = new.get("last_page")
+    if not isinstance(last_page, int) or isinstance(last_page, bool) or last_page < 1:
+        raise HTTPException(status_code=422, detail="last_page must be a positive integer.")
+    if not isinstance(new.get("annotations"), (dict, type(None))):
+        raise HTTPException(status_code=422, detail="annotations must be an object or null.")
+    return {"last_page": last_page, "annotations": new.get("annotations")}
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    if not value or value.strip() == "*":
+        return None
+    tag = value.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(status_code=400, detail="If-Match must be the version from a previous response.")
+    return int(tag)
 
-    res = supabase.table("user_pdfs").update(payload).eq("id", pdf_id).eq("user_id", user_id).execute()
-    return {"success": True}
+def version_conflict(version: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"The annotations were changed elsewhere (now at version {version}); re-read them and retry.",
+        headers={"ETag": f'"{version}"'},
+    )
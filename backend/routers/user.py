@@ -1,18 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
-from database import get_supabase
 from deps import get_current_user
-from supabase import Client
+from storage import StorageBackend, get_storage
+from profiles import ProfileCache, get_profile_cache
 
 router = APIRouter(prefix="/user", tags=["user"])
 
 @router.get("/me")
-def get_my_profile(current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def get_my_profile(current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage), profiles: ProfileCache = Depends(get_profile_cache)):
     user_id = current_user.id
     
-    # 1. Get Profile from Supabase
-    res = supabase.table("profiles").select("*").eq("id", user_id).single().execute()
+    # 1. Get Profile (read through the per-process profile cache)
+    profile = await profiles.get(storage, user_id)
     
-    if not res.data:
+    if not profile:
         # Create default profile if missing
         new_profile = {
             "id": user_id,
@@ -20,7 +20,8 @@ def get_my_profile(current_user = Depends(get_current_user), supabase: Client =
             "is_premium": False,
             "query_usage_current_month": 0
         }
-        create_res = supabase.table("profiles").insert(new_profile).execute()
-        return {"data": create_res.data[0]}
+        created = await storage.create_profile(new_profile)
+        profiles.put(user_id, created)
+        return {"data": created}
         
-    return {"data": res.data}
+    return {"data": profile}
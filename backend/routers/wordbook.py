@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from database import get_supabase
+from fastapi import APIRouter, Depends, Body, Query, Request
+from fastapi.responses import StreamingResponse
 from deps import get_current_user
-from supabase import Client
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, conditional_json, decode_cursor, paginate, select_columns
+from storage import StorageBackend, get_storage
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+import csv
+import io
+import json
 
 router = APIRouter(prefix="/wordbook", tags=["wordbook"])
 
@@ -12,21 +16,32 @@ class WordItem(BaseModel):
     context_sentence: Optional[str] = None
     parsed_data: Optional[dict] = None
 
+WORDBOOK_FIELDS = {"id", "word", "context_sentence", "parsed_data", "created_at"}
+
+# Rows per upsert statement for bulk imports, and the most lines one import may carry
+BULK_CHUNK_SIZE = 500
+MAX_BULK_ROWS = 50000
+MAX_BULK_ERRORS = 100
+
 @router.get("/")
-async def get_wordbook(current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def get_wordbook(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    storage: StorageBackend = Depends(get_storage)
+):
     user_id = current_user.id
-    res = supabase.table("wordbook").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-    return {"data": res.data}
+    columns = select_columns(fields, WORDBOOK_FIELDS, ["id", "created_at"])
+    rows = await storage.list_words(user_id, limit + 1, decode_cursor(cursor), columns)
+    words, next_cursor = paginate(rows, limit, "created_at")
+    return conditional_json(request, {"data": words, "next_cursor": next_cursor})
 
 @router.post("/")
-async def add_word(item: WordItem, current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def add_word(item: WordItem, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage)):
     user_id = current_user.id
     
-    # Check if exists
-    existing = supabase.table("wordbook").select("id").eq("user_id", user_id).eq("word", item.word).execute()
-    if existing.data:
-        return {"success": False, "message": "Word already in wordbook"}
-        
     payload = {
         "user_id": user_id,
         "word": item.word,
@@ -34,11 +49,124 @@ async def add_word(item: WordItem, current_user = Depends(get_current_user), sup
         "parsed_data": item.parsed_data
     }
     
-    res = supabase.table("wordbook").insert(payload).execute()
-    return {"success": True, "data": res.data}
+    # Single insert-if-absent on the unique (user_id, word) key
+    data = await storage.add_word(payload)
+    if not data:
+        return {"success": False, "message": "Word already in wordbook"}
+    return {"success": True, "data": data}
+
+@router.post("/bulk")
+async def import_words(
+    request: Request,
+    overwrite: bool = True,
+    current_user = Depends(get_current_user),
+    storage: StorageBackend = Depends(get_storage)
+):
+    """
+    Imports NDJSON (one `WordItem` object per line) with chunked upserts on
+    `(user_id, word)`, so re-running the same import is harmless. Lines past
+    MAX_BULK_ROWS are not read; the response says so with `truncated`, and the
+    rest can be sent as another import.
+    """
+    user_id = current_user.id
+    chunk = {}
+    imported = 0
+    line_no = 0
+    errors = []
+    truncated = False
+
+    async def flush():
+        nonlocal imported
+        if chunk:
+            await storage.upsert_words(list(chunk.values()), overwrite)
+            imported += len(chunk)
+            chunk.clear()
+
+    async for line in read_lines(request):
+        line_no += 1
+        if line_no > MAX_BULK_ROWS:
+            # Earlier chunks are already written, so stop here rather than fail the whole import
+            truncated = True
+            break
+        if not line.strip():
+            continue
+        try:
+            item = WordItem.model_validate_json(line)
+        except ValidationError as e:
+            if len(errors) < MAX_BULK_ERRORS:
+                errors.append({"line": line_no, "error": e.errors(include_url=False)[0]["msg"]})
+            continue
+
+        # A statement may not touch the same key twice; the last line for a word wins
+        chunk[item.word] = {
+            "user_id": user_id,
+            "word": item.word,
+            "context_sentence": item.context_sentence,
+            "parsed_data": item.parsed_data
+        }
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await flush()
+
+    await flush()
+    return {"success": True, "imported": imported, "errors": errors, "truncated": truncated}
+
+@router.get("/export")
+async def export_words(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    storage: StorageBackend = Depends(get_storage)
+):
+    user_id = current_user.id
+    columns = select_columns(fields, WORDBOOK_FIELDS, ["id", "created_at"])
+    rows = storage.iter_words(user_id, columns)
+
+    if format == "csv":
+        header = [c for c in ["id", "word", "context_sentence", "parsed_data", "created_at"] if columns == "*" or c in columns.split(",")]
+        body = iter_csv(rows, header)
+        media_type = "text/csv"
+    else:
+        body = iter_ndjson(rows)
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="wordbook.{format}"'
+    })
+
+async def read_lines(request: Request):
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+async def iter_ndjson(rows):
+    async for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def csv_value(value):
+    # JSON columns are written as JSON text so they survive a round trip
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+async def iter_csv(rows, header: List[str]):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    async for row in rows:
+        writer.writerow([csv_value(row.get(c)) for c in header])
+        if out.tell() > 64 * 1024:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
 
 @router.delete("/{word_id}")
-async def delete_word(word_id: str, current_user = Depends(get_current_user), supabase: Client = Depends(get_supabase)):
+async def delete_word(word_id: str, current_user = Depends(get_current_user), storage: StorageBackend = Depends(get_storage)):
     user_id = current_user.id
-    res = supabase.table("wordbook").delete().eq("id", word_id).eq("user_id", user_id).execute()
+    await storage.delete_word(user_id, word_id)
     return {"success": True}
@@ -0,0 +1,46 @@
+import os
+from typing import Optional
+
+from database import init_supabase
+from .base import StorageBackend
+from .instrumented import InstrumentedStorage
+from .supabase_backend import SupabaseStorage
+from .sqlite_backend import SQLiteStorage
+
+# "supabase" (default) or "sqlite" for single-node deployments and benchmarks
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "word_parser.db")
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+# Where uploaded PDFs live: a Supabase Storage bucket, or a local directory with sqlite
+PDF_STORAGE_BUCKET = os.environ.get("PDF_STORAGE_BUCKET", "pdfs")
+PDF_STORAGE_DIR = os.environ.get("PDF_STORAGE_DIR", "pdfs")
+
+storage: Optional[StorageBackend] = None
+
+async def init_storage() -> Optional[StorageBackend]:
+    global storage
+    if storage is not None:
+        return storage
+
+    if STORAGE_BACKEND == "sqlite":
+        backend = SQLiteStorage(SQLITE_PATH, SQLITE_POOL_SIZE, PDF_STORAGE_DIR)
+    elif STORAGE_BACKEND == "supabase":
+        client = await init_supabase()
+        backend = SupabaseStorage(client, PDF_STORAGE_BUCKET) if client is not None else None
+    else:
+        raise Exception(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+    if backend is not None:
+        storage = InstrumentedStorage(backend)
+    return storage
+
+async def close_storage():
+    global storage
+    if storage is not None:
+        await storage.close()
+    storage = None
+
+def get_storage() -> StorageBackend:
+    if not storage:
+        raise Exception("Storage not initialized. Check environment variables.")
+    return storage
@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+Cursor = Tuple[str, str]
+
+
+class StorageBackend(ABC):
+    """
+    Everything the routers need from the data layer. Listings are ordered
+    newest first and paged with `(timestamp, id)` keyset cursors; `columns`
+    is either "*" or a comma-separated list already validated by the router.
+    """
+
+    # Profiles
+
+    @abstractmethod
+    async def get_profile(self, user_id: str, columns: str = "*") -> Optional[dict]: ...
+
+    @abstractmethod
+    async def create_profile(self, profile: dict) -> dict: ...
+
+    @abstractmethod
+    async def consume_quota(self, user_id: str, amount: int, free_limit: int) -> Optional[dict]:
+        """Atomically adds `amount` to monthly usage if allowed; returns `{allowed, usage, is_premium}` or None without a profile."""
+
+    # Wordbook
+
+    @abstractmethod
+    async def list_words(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]: ...
+
+    async def iter_words(self, user_id: str, columns: str = "*", page_size: int = 500) -> AsyncIterator[dict]:
+        """Yields every row newest first, one keyset page at a time."""
+        cursor = None
+        while True:
+            rows = await self.list_words(user_id, page_size, cursor, columns)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    @abstractmethod
+    async def add_word(self, row: dict) -> List[dict]:
+        """Inserts unless `(user_id, word)` exists; returns [] for a duplicate."""
+
+    @abstractmethod
+    async def upsert_words(self, rows: List[dict], overwrite: bool = True): ...
+
+    @abstractmethod
+    async def delete_word(self, user_id: str, word_id: str): ...
+
+    # Search history
+
+    @abstractmethod
+    async def add_history(self, rows: List[dict]): ...
+
+    # PDFs
+
+    @abstractmethod
+    async def list_pdfs(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]: ...
+
+    @abstractmethod
+    async def add_pdf(self, row: dict) -> List[dict]: ...
+
+    @abstractmethod
+    async def get_pdf(self, user_id: str, pdf_id: str, columns: str = "*") -> Optional[dict]: ...
+
+    @abstractmethod
+    async def update_pdf(self, user_id: str, pdf_id: str, payload: dict) -> List[dict]: ...
+
+    @abstractmethod
+    async def update_pdf_versioned(self, user_id: str, pdf_id: str, payload: dict, version: int) -> Optional[dict]:
+        """Applies `payload` and bumps `version` only if the row is still at `version`; returns the new row or None."""
+
+    async def update_pdf_pages(self, pages: List[Tuple[str, str, int]]):
+        """Writes coalesced `(user_id, pdf_id, last_page)` updates."""
+        for user_id, pdf_id, last_page in pages:
+            await self.update_pdf(user_id, pdf_id, {"last_page": last_page})
+
+    @abstractmethod
+    async def download_pdf(self, storage_path: str) -> bytes:
+        """Reads an uploaded PDF's bytes by its `storage_path`."""
+
+    @abstractmethod
+    async def get_pdf_vocabulary(self, user_id: str, pdf_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def put_pdf_vocabulary(self, row: dict):
+        """Inserts or replaces the vocabulary index row for `row["pdf_id"]`."""
+
+    # Etymology cache
+
+    @abstractmethod
+    async def get_etymologies(self, words: List[str], prompt_version: str) -> Dict[str, dict]: ...
+
+    @abstractmethod
+    async def put_etymologies(self, entries: Dict[str, dict], prompt_version: str): ...
+
+    async def close(self):
+        pass
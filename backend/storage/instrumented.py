@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Tuple
+
+from metrics import timed
+from .base import Cursor, StorageBackend
+
+
+class InstrumentedStorage(StorageBackend):
+    """Wraps a backend so every data call is timed as a `db.<method>` stage."""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def get_profile(self, user_id: str, columns: str = "*") -> Optional[dict]:
+        with timed("db.get_profile"):
+            return await self.backend.get_profile(user_id, columns)
+
+    async def create_profile(self, profile: dict) -> dict:
+        with timed("db.create_profile"):
+            return await self.backend.create_profile(profile)
+
+    async def consume_quota(self, user_id: str, amount: int, free_limit: int) -> Optional[dict]:
+        with timed("db.consume_quota"):
+            return await self.backend.consume_quota(user_id, amount, free_limit)
+
+    async def list_words(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        with timed("db.list_words"):
+            return await self.backend.list_words(user_id, limit, cursor, columns)
+
+    async def add_word(self, row: dict) -> List[dict]:
+        with timed("db.add_word"):
+            return await self.backend.add_word(row)
+
+    async def upsert_words(self, rows: List[dict], overwrite: bool = True):
+        with timed("db.upsert_words"):
+            return await self.backend.upsert_words(rows, overwrite)
+
+    async def delete_word(self, user_id: str, word_id: str):
+        with timed("db.delete_word"):
+            return await self.backend.delete_word(user_id, word_id)
+
+    async def add_history(self, rows: List[dict]):
+        with timed("db.add_history"):
+            return await self.backend.add_history(rows)
+
+    async def list_pdfs(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        with timed("db.list_pdfs"):
+            return await self.backend.list_pdfs(user_id, limit, cursor, columns)
+
+    async def add_pdf(self, row: dict) -> List[dict]:
+        with timed("db.add_pdf"):
+            return await self.backend.add_pdf(row)
+
+    async def get_pdf(self, user_id: str, pdf_id: str, columns: str = "*") -> Optional[dict]:
+        with timed("db.get_pdf"):
+            return await self.backend.get_pdf(user_id, pdf_id, columns)
+
+    async def update_pdf(self, user_id: str, pdf_id: str, payload: dict) -> List[dict]:
+        with timed("db.update_pdf"):
+            return await self.backend.update_pdf(user_id, pdf_id, payload)
+
+    async def update_pdf_versioned(self, user_id: str, pdf_id: str, payload: dict, version: int) -> Optional[dict]:
+        with timed("db.update_pdf_versioned"):
+            return await self.backend.update_pdf_versioned(user_id, pdf_id, payload, version)
+
+    async def update_pdf_pages(self, pages: List[Tuple[str, str, int]]):
+        with timed("db.update_pdf_pages"):
+            return await self.backend.update_pdf_pages(pages)
+
+    async def download_pdf(self, storage_path: str) -> bytes:
+        with timed("db.download_pdf"):
+            return await self.backend.download_pdf(storage_path)
+
+    async def get_pdf_vocabulary(self, user_id: str, pdf_id: str) -> Optional[dict]:
+        with timed("db.get_pdf_vocabulary"):
+            return await self.backend.get_pdf_vocabulary(user_id, pdf_id)
+
+    async def put_pdf_vocabulary(self, row: dict):
+        with timed("db.put_pdf_vocabulary"):
+            return await self.backend.put_pdf_vocabulary(row)
+
+    async def get_etymologies(self, words: List[str], prompt_version: str) -> Dict[str, dict]:
+        with timed("db.get_etymologies"):
+            return await self.backend.get_etymologies(words, prompt_version)
+
+    async def put_etymologies(self, entries: Dict[str, dict], prompt_version: str):
+        with timed("db.put_etymologies"):
+            return await self.backend.put_etymologies(entries, prompt_version)
+
+    async def close(self):
+        await self.backend.close()
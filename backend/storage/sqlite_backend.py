@@ -0,0 +1,420 @@
+import json
+import os
+import queue
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .base import Cursor, StorageBackend
+
+SCHEMA = """
+create table if not exists profiles (
+  id text primary key,
+  email text,
+  is_premium integer not null default 0,
+  premium_expiry text,
+  query_usage_current_month integer not null default 0,
+  created_at text not null
+);
+
+create table if not exists wordbook (
+  id text primary key,
+  user_id text not null references profiles(id),
+  word text not null,
+  parsed_data text,
+  context_sentence text,
+  created_at text not null,
+  unique (user_id, word)
+);
+create index if not exists wordbook_user_id_created_at_idx on wordbook (user_id, created_at desc, id desc);
+
+create table if not exists search_history (
+  id text primary key,
+  user_id text not null references profiles(id),
+  word text not null,
+  created_at text not null
+);
+create index if not exists search_history_user_id_created_at_idx on search_history (user_id, created_at desc);
+
+create table if not exists user_pdfs (
+  id text primary key,
+  user_id text not null references profiles(id),
+  filename text not null,
+  storage_path text not null,
+  last_page integer default 1,
+  annotations text,
+  version integer not null default 0,
+  uploaded_at text not null
+);
+create index if not exists user_pdfs_user_id_uploaded_at_idx on user_pdfs (user_id, uploaded_at desc, id desc);
+
+create table if not exists pdf_vocabulary (
+  pdf_id text primary key references user_pdfs(id) on delete cascade,
+  user_id text not null references profiles(id),
+  status text not null default 'pending',
+  page_count integer,
+  token_count integer,
+  words text not null default '[]',
+  analyzed integer not null default 0,
+  failed integer not null default 0,
+  error text,
+  updated_at text not null
+);
+
+create table if not exists etymology_cache (
+  word text not null,
+  prompt_version text not null,
+  data text not null,
+  created_at text not null,
+  primary key (word, prompt_version)
+);
+"""
+
+JSON_COLUMNS = {"parsed_data", "annotations", "data", "words"}
+BOOL_COLUMNS = {"is_premium"}
+
+PROFILE_COLUMNS = {"id", "email", "is_premium", "premium_expiry", "query_usage_current_month", "created_at"}
+WORDBOOK_COLUMNS = {"id", "user_id", "word", "parsed_data", "context_sentence", "created_at"}
+PDF_COLUMNS = {"id", "user_id", "filename", "storage_path", "last_page", "annotations", "version", "uploaded_at"}
+VOCABULARY_COLUMNS = ["pdf_id", "user_id", "status", "page_count", "token_count", "words", "analyzed", "failed", "error", "updated_at"]
+
+# Columns added after a table was first created: (table, column, definition)
+ADDED_COLUMNS = [
+    ("user_pdfs", "version", "integer not null default 0"),
+]
+
+# SQLite caps the number of host parameters per statement
+MAX_PARAMS = 500
+
+
+def now() -> str:
+    # Fixed-width ISO timestamps sort correctly as text
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def normalize_timestamp(value: str) -> str:
+    return datetime.fromisoformat(value).astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def select_list(columns: str, allowed: set) -> str:
+    if columns == "*":
+        return "*"
+    names = [c.strip() for c in columns.split(",")]
+    unknown = [c for c in names if c not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return ", ".join(names)
+
+
+def encode(row: dict) -> dict:
+    return {k: json.dumps(v, ensure_ascii=False) if k in JSON_COLUMNS and v is not None else v for k, v in row.items()}
+
+
+def decode(row: sqlite3.Row) -> dict:
+    result = {}
+    for key in row.keys():
+        value = row[key]
+        if key in JSON_COLUMNS and value is not None:
+            value = json.loads(value)
+        elif key in BOOL_COLUMNS:
+            value = bool(value)
+        result[key] = value
+    return result
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by the worker threads."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            uri=self.path.startswith("file:"),
+            check_same_thread=False,
+            # Each connection keeps this many compiled statements; every query
+            # below is a constant SQL string, so repeat calls skip parsing.
+            cached_statements=256,
+            timeout=5.0,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("pragma journal_mode = wal")
+        conn.execute("pragma synchronous = normal")
+        conn.execute("pragma foreign_keys = on")
+        conn.execute("pragma temp_store = memory")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Embedded storage for single-node deployments and benchmarks. Queries run
+    on the threadpool against a pool of WAL-mode connections, so readers never
+    block each other and only writers serialize.
+    """
+
+    def __init__(self, path: str, pool_size: int = 8, pdf_dir: str = "pdfs"):
+        self.pool = ConnectionPool(path, pool_size)
+        # Uploaded PDFs are plain files here; `storage_path` is relative to this directory
+        self.pdf_dir = os.path.abspath(pdf_dir)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, definition in ADDED_COLUMNS:
+                existing = {row["name"] for row in conn.execute(f"pragma table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"alter table {table} add column {column} {definition}")
+
+    async def _run(self, fn: Callable, *args):
+        def call():
+            with self.pool.connection() as conn:
+                return fn(conn, *args)
+        return await run_in_threadpool(call)
+
+    async def close(self):
+        self.pool.close()
+
+    # Profiles
+
+    async def get_profile(self, user_id: str, columns: str = "*") -> Optional[dict]:
+        sql = f"select {select_list(columns, PROFILE_COLUMNS)} from profiles where id = ?"
+
+        def query(conn):
+            row = conn.execute(sql, (user_id,)).fetchone()
+            return decode(row) if row else None
+        return await self._run(query)
+
+    async def create_profile(self, profile: dict) -> dict:
+        row = {"is_premium": False, "query_usage_current_month": 0, "created_at": now(), **profile}
+        row["is_premium"] = int(bool(row["is_premium"]))
+
+        def query(conn):
+            cur = conn.execute(
+                "insert into profiles (id, email, is_premium, premium_expiry, query_usage_current_month, created_at) "
+                "values (:id, :email, :is_premium, :premium_expiry, :query_usage_current_month, :created_at) returning *",
+                {"email": None, "premium_expiry": None, **row},
+            )
+            return decode(cur.fetchone())
+        return await self._run(query)
+
+    async def consume_quota(self, user_id: str, amount: int, free_limit: int) -> Optional[dict]:
+        def query(conn):
+            row = conn.execute(
+                "update profiles set query_usage_current_month = max(query_usage_current_month + :amount, 0) "
+                "where id = :id and (:amount <= 0 or is_premium or query_usage_current_month + :amount <= :limit) "
+                "returning query_usage_current_month, is_premium",
+                {"id": user_id, "amount": amount, "limit": free_limit},
+            ).fetchone()
+            allowed = row is not None
+            if not allowed:
+                row = conn.execute(
+                    "select query_usage_current_month, is_premium from profiles where id = ?", (user_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+            return {"allowed": allowed, "usage": row["query_usage_current_month"], "is_premium": bool(row["is_premium"])}
+        return await self._run(query)
+
+    # Wordbook
+
+    def _list(self, table: str, allowed: set, sort_key: str, user_id: str, limit: int, cursor: Optional[Cursor], columns: str):
+        select = select_list(columns, allowed)
+        if cursor:
+            sort_value, row_id = normalize_timestamp(cursor[0]), cursor[1]
+            sql = (
+                f"select {select} from {table} where user_id = ? and ({sort_key} < ? or ({sort_key} = ? and id < ?)) "
+                f"order by {sort_key} desc, id desc limit ?"
+            )
+            params = (user_id, sort_value, sort_value, row_id, limit)
+        else:
+            sql = f"select {select} from {table} where user_id = ? order by {sort_key} desc, id desc limit ?"
+            params = (user_id, limit)
+
+        def query(conn):
+            return [decode(row) for row in conn.execute(sql, params)]
+        return self._run(query)
+
+    async def list_words(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        return await self._list("wordbook", WORDBOOK_COLUMNS, "created_at", user_id, limit, cursor, columns)
+
+    async def add_word(self, row: dict) -> List[dict]:
+        values = encode({"id": str(uuid.uuid4()), "created_at": now(), "context_sentence": None, "parsed_data": None, **row})
+
+        def query(conn):
+            cur = conn.execute(
+                "insert into wordbook (id, user_id, word, parsed_data, context_sentence, created_at) "
+                "values (:id, :user_id, :word, :parsed_data, :context_sentence, :created_at) "
+                "on conflict (user_id, word) do nothing returning *",
+                values,
+            )
+            return [decode(r) for r in cur.fetchall()]
+        return await self._run(query)
+
+    async def upsert_words(self, rows: List[dict], overwrite: bool = True):
+        conflict = (
+            "do update set parsed_data = excluded.parsed_data, context_sentence = excluded.context_sentence"
+            if overwrite else "do nothing"
+        )
+        sql = (
+            "insert into wordbook (id, user_id, word, parsed_data, context_sentence, created_at) "
+            "values (:id, :user_id, :word, :parsed_data, :context_sentence, :created_at) "
+            f"on conflict (user_id, word) {conflict}"
+        )
+        values = [
+            encode({"id": str(uuid.uuid4()), "created_at": now(), "context_sentence": None, "parsed_data": None, **row})
+            for row in rows
+        ]
+
+        def query(conn):
+            conn.executemany(sql, values)
+        await self._run(query)
+
+    async def delete_word(self, user_id: str, word_id: str):
+        def query(conn):
+            conn.execute("delete from wordbook where id = ? and user_id = ?", (word_id, user_id))
+        await self._run(query)
+
+    # Search history
+
+    async def add_history(self, rows: List[dict]):
+        values = [(str(uuid.uuid4()), r["user_id"], r["word"], r.get("created_at") or now()) for r in rows]
+
+        def query(conn):
+            conn.executemany("insert into search_history (id, user_id, word, created_at) values (?, ?, ?, ?)", values)
+        await self._run(query)
+
+    # PDFs
+
+    async def list_pdfs(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        return await self._list("user_pdfs", PDF_COLUMNS, "uploaded_at", user_id, limit, cursor, columns)
+
+    async def add_pdf(self, row: dict) -> List[dict]:
+        values = encode({"id": str(uuid.uuid4()), "uploaded_at": now(), "last_page": 1, "annotations": None, **row})
+
+        def query(conn):
+            cur = conn.execute(
+                "insert into user_pdfs (id, user_id, filename, storage_path, last_page, annotations, uploaded_at) "
+                "values (:id, :user_id, :filename, :storage_path, :last_page, :annotations, :uploaded_at) returning *",
+                values,
+            )
+            return [decode(r) for r in cur.fetchall()]
+        return await self._run(query)
+
+    async def get_pdf(self, user_id: str, pdf_id: str, columns: str = "*") -> Optional[dict]:
+        sql = f"select {select_list(columns, PDF_COLUMNS)} from user_pdfs where id = ? and user_id = ?"
+
+        def query(conn):
+            row = conn.execute(sql, (pdf_id, user_id)).fetchone()
+            return decode(row) if row else None
+        return await self._run(query)
+
+    async def update_pdf(self, user_id: str, pdf_id: str, payload: dict) -> List[dict]:
+        unknown = set(payload) - PDF_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{column} = :{column}" for column in payload)
+        sql = f"update user_pdfs set {assignments} where id = :pdf_id and user_id = :user_id returning *"
+        values = {**encode(payload), "pdf_id": pdf_id, "user_id": user_id}
+
+        def query(conn):
+            return [decode(r) for r in conn.execute(sql, values).fetchall()]
+        return await self._run(query)
+
+    async def update_pdf_versioned(self, user_id: str, pdf_id: str, payload: dict, version: int) -> Optional[dict]:
+        unknown = set(payload) - PDF_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{column} = :{column}" for column in payload)
+        sql = (
+            f"update user_pdfs set {assignments}, version = version + 1 "
+            "where id = :pdf_id and user_id = :user_id and version = :expected_version returning *"
+        )
+        values = {**encode(payload), "pdf_id": pdf_id, "user_id": user_id, "expected_version": version}
+
+        def query(conn):
+            row = conn.execute(sql, values).fetchone()
+            return decode(row) if row else None
+        return await self._run(query)
+
+    async def update_pdf_pages(self, pages: List[Tuple[str, str, int]]):
+        values = [(last_page, pdf_id, user_id) for user_id, pdf_id, last_page in pages]
+
+        def query(conn):
+            conn.executemany("update user_pdfs set last_page = ? where id = ? and user_id = ?", values)
+        await self._run(query)
+
+    async def download_pdf(self, storage_path: str) -> bytes:
+        path = os.path.abspath(os.path.join(self.pdf_dir, storage_path))
+        if os.path.commonpath([path, self.pdf_dir]) != self.pdf_dir:
+            raise ValueError(f"storage_path escapes the PDF directory: {storage_path}")
+
+        def read():
+            with open(path, "rb") as f:
+                return f.read()
+        return await run_in_threadpool(read)
+
+    async def get_pdf_vocabulary(self, user_id: str, pdf_id: str) -> Optional[dict]:
+        def query(conn):
+            row = conn.execute("select * from pdf_vocabulary where pdf_id = ? and user_id = ?", (pdf_id, user_id)).fetchone()
+            return decode(row) if row else None
+        return await self._run(query)
+
+    async def put_pdf_vocabulary(self, row: dict):
+        values = encode({column: None for column in VOCABULARY_COLUMNS} | {"words": [], "analyzed": 0, "failed": 0, "updated_at": now()} | row)
+        columns = ", ".join(VOCABULARY_COLUMNS)
+        placeholders = ", ".join(f":{column}" for column in VOCABULARY_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in VOCABULARY_COLUMNS if column != "pdf_id")
+
+        def query(conn):
+            conn.execute(f"insert into pdf_vocabulary ({columns}) values ({placeholders}) on conflict (pdf_id) do update set {updates}", values)
+        await self._run(query)
+
+    # Etymology cache
+
+    async def get_etymologies(self, words: List[str], prompt_version: str) -> Dict[str, dict]:
+        def query(conn):
+            found = {}
+            for start in range(0, len(words), MAX_PARAMS):
+                chunk = words[start:start + MAX_PARAMS]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"select word, data from etymology_cache where prompt_version = ? and word in ({placeholders})",
+                    (prompt_version, *chunk),
+                )
+                found.update((row["word"], json.loads(row["data"])) for row in rows)
+            return found
+        return await self._run(query)
+
+    async def put_etymologies(self, entries: Dict[str, dict], prompt_version: str):
+        created_at = now()
+        values = [(word, prompt_version, json.dumps(data, ensure_ascii=False), created_at) for word, data in entries.items()]
+
+        def query(conn):
+            conn.executemany(
+                "insert into etymology_cache (word, prompt_version, data, created_at) values (?, ?, ?, ?) "
+                "on conflict (word, prompt_version) do update set data = excluded.data, created_at = excluded.created_at",
+                values,
+            )
+        await self._run(query)
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Tuple
+
+from postgrest import ReturnMethod
+from supabase import AsyncClient
+
+from database import close_supabase
+from .base import Cursor, StorageBackend
+
+
+def keyset_filter(sort_key: str, cursor: Cursor) -> str:
+    """PostgREST `or` filter selecting rows strictly after `cursor` in (sort_key desc, id desc) order."""
+    sort_value, row_id = cursor
+    return f'{sort_key}.lt."{sort_value}",and({sort_key}.eq."{sort_value}",id.lt.{row_id})'
+
+
+class SupabaseStorage(StorageBackend):
+    """Async data access for every router, backed by Supabase's PostgREST API."""
+
+    def __init__(self, client: AsyncClient, pdf_bucket: str = "pdfs"):
+        self.client = client
+        self.pdf_bucket = pdf_bucket
+
+    # Profiles
+
+    async def get_profile(self, user_id: str, columns: str = "*") -> Optional[dict]:
+        res = await self.client.table("profiles").select(columns).eq("id", user_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    async def create_profile(self, profile: dict) -> dict:
+        res = await self.client.table("profiles").insert(profile).execute()
+        return res.data[0]
+
+    async def consume_quota(self, user_id: str, amount: int, free_limit: int) -> Optional[dict]:
+        res = await self.client.rpc("consume_query_quota", {
+            "p_user_id": user_id,
+            "p_amount": amount,
+            "p_free_limit": free_limit
+        }).execute()
+        return res.data[0] if res.data else None
+
+    # Wordbook
+
+    async def list_words(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        """Returns up to `limit` rows newest first, starting after the `(created_at, id)` cursor."""
+        query = self.client.table("wordbook").select(columns).eq("user_id", user_id)
+        if cursor:
+            query = query.or_(keyset_filter("created_at", cursor))
+        res = await query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+        return res.data
+
+    async def add_word(self, row: dict) -> List[dict]:
+        res = await self.client.table("wordbook").upsert(row, on_conflict="user_id,word", ignore_duplicates=True).execute()
+        return res.data
+
+    async def upsert_words(self, rows: List[dict], overwrite: bool = True):
+        await self.client.table("wordbook").upsert(
+            rows,
+            on_conflict="user_id,word",
+            ignore_duplicates=not overwrite,
+            returning=ReturnMethod.minimal
+        ).execute()
+
+    async def delete_word(self, user_id: str, word_id: str):
+        await self.client.table("wordbook").delete().eq("id", word_id).eq("user_id", user_id).execute()
+
+    # Search history
+
+    async def add_history(self, rows: List[dict]):
+        await self.client.table("search_history").insert(rows).execute()
+
+    # PDFs
+
+    async def list_pdfs(self, user_id: str, limit: int, cursor: Optional[Cursor] = None, columns: str = "*") -> List[dict]:
+        """Returns up to `limit` rows newest first, starting after the `(uploaded_at, id)` cursor."""
+        query = self.client.table("user_pdfs").select(columns).eq("user_id", user_id)
+        if cursor:
+            query = query.or_(keyset_filter("uploaded_at", cursor))
+        res = await query.order("uploaded_at", desc=True).order("id", desc=True).limit(limit).execute()
+        return res.data
+
+    async def add_pdf(self, row: dict) -> List[dict]:
+        res = await self.client.table("user_pdfs").insert(row).execute()
+        return res.data
+
+    async def get_pdf(self, user_id: str, pdf_id: str, columns: str = "*") -> Optional[dict]:
+        res = await self.client.table("user_pdfs").select(columns).eq("id", pdf_id).eq("user_id", user_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    async def update_pdf(self, user_id: str, pdf_id: str, payload: dict) -> List[dict]:
+        res = await self.client.table("user_pdfs").update(payload).eq("id", pdf_id).eq("user_id", user_id).execute()
+        return res.data
+
+    async def update_pdf_versioned(self, user_id: str, pdf_id: str, payload: dict, version: int) -> Optional[dict]:
+        # The version filter makes this a compare-and-swap: a concurrent writer leaves no row to update
+        res = await self.client.table("user_pdfs").update({**payload, "version": version + 1}) \
+            .eq("id", pdf_id).eq("user_id", user_id).eq("version", version).execute()
+        return res.data[0] if res.data else None
+
+    async def update_pdf_pages(self, pages: List[Tuple[str, str, int]]):
+        # One statement for the whole batch (migrations/0009_update_pdf_pages.sql)
+        await self.client.rpc("update_pdf_pages", {
+            "p_pages": [{"id": pdf_id, "user_id": user_id, "last_page": last_page} for user_id, pdf_id, last_page in pages]
+        }).execute()
+
+    async def download_pdf(self, storage_path: str) -> bytes:
+        return await self.client.storage.from_(self.pdf_bucket).download(storage_path)
+
+    async def get_pdf_vocabulary(self, user_id: str, pdf_id: str) -> Optional[dict]:
+        res = await self.client.table("pdf_vocabulary").select("*").eq("pdf_id", pdf_id).eq("user_id", user_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    async def put_pdf_vocabulary(self, row: dict):
+        await self.client.table("pdf_vocabulary").upsert(row, on_conflict="pdf_id", returning=ReturnMethod.minimal).execute()
+
+    # Etymology cache
+
+    async def get_etymologies(self, words: List[str], prompt_version: str) -> Dict[str, dict]:
+        res = await self.client.table("etymology_cache").select("word, data").in_("word", words).eq("prompt_version", prompt_version).execute()
+        return {row["word"]: row["data"] for row in res.data or []}
+
+    async def put_etymologies(self, entries: Dict[str, dict], prompt_version: str):
+        await self.client.table("etymology_cache").upsert([
+            {"word": word, "prompt_version": prompt_version, "data": data}
+            for word, data in entries.items()
+        ]).execute()
+
+    async def close(self):
+        await close_supabase()
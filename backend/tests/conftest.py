@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import jwt
+import pytest
+
+# The backend runs from its own directory with flat imports; do the same for the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level settings are read on import, so the test environment goes in first
+TEST_DIR = tempfile.mkdtemp(prefix="word-parser-tests-")
+JWT_SECRET = "s" * 32
+os.environ.update(
+    STORAGE_BACKEND="sqlite",
+    SQLITE_PATH=os.path.join(TEST_DIR, "test.db"),
+    PDF_STORAGE_DIR=os.path.join(TEST_DIR, "pdfs"),
+    SUPABASE_JWT_SECRET=JWT_SECRET,
+    GEMINI_API_KEY="test",
+)
+os.environ.pop("SUPABASE_URL", None)
+
+
+def auth_headers(user_id: str) -> dict:
+    token = jwt.encode(
+        {"sub": user_id, "email": f"{user_id}@example.com", "aud": "authenticated", "exp": int(time.time()) + 3600},
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def premium_user(client):
+    """Headers for a premium user with a fresh profile."""
+    import profiles
+
+    user_id = f"user-{time.monotonic_ns()}"
+    headers = auth_headers(user_id)
+    client.get("/user/me", headers=headers)
+    with sqlite3.connect(os.environ["SQLITE_PATH"]) as conn:
+        conn.execute("update profiles set is_premium = 1 where id = ?", (user_id,))
+    profiles.get_profile_cache().invalidate(user_id)
+    return headers
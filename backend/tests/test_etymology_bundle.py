@@ -0,0 +1,99 @@
+import pytest
+
+import etymology_bundle
+from etymology_bundle import Bundle, BundleError, deflated_size, encode, fit
+
+
+def entry(word: str) -> dict:
+    return {"root": f"{word} (root)", "prefix": "None", "suffix": "None", "translation": f"{word}的释义", "desc": f"{word}（词根），意为“{word}”"}
+
+
+ENTRIES = {word: entry(word) for word in ["reconstruct", "aardvark", "zymurgy", "étude", "madness", "mad"]}
+
+
+def test_round_trip():
+    data = encode(ENTRIES, {"prompt_version": "v4"})
+    bundle = Bundle(data)
+    assert len(bundle) == len(ENTRIES)
+    assert bundle.metadata == {"prompt_version": "v4"}
+    assert {word: bundle.get(word) for word in bundle} == ENTRIES
+    # Deterministic, whatever the input order
+    assert encode(dict(reversed(list(ENTRIES.items()))), {"prompt_version": "v4"}) == data
+
+
+def test_lookup():
+    bundle = Bundle(encode(ENTRIES))
+    keys = list(bundle)
+    assert keys == sorted(ENTRIES, key=lambda w: w.encode("utf-8"))
+    # First and last keys, a hit in the middle, and misses on either side and in between
+    assert bundle.get(keys[0]) == ENTRIES[keys[0]] == ENTRIES["aardvark"]
+    assert bundle.get(keys[-1]) == ENTRIES[keys[-1]] == ENTRIES["étude"]
+    assert bundle.get("madness") == ENTRIES["madness"]
+    assert bundle.get("mad") == ENTRIES["mad"]
+    for missing in ["a", "maddening", "reconstructs", "zzz", "éx", ""]:
+        assert bundle.get(missing) is None
+
+
+def test_empty_bundle():
+    bundle = Bundle(encode({}))
+    assert len(bundle) == 0
+    assert bundle.get("anything") is None
+
+
+def test_shared_values_are_stored_once():
+    same = {"run": entry("run"), "running": entry("run"), "runs": entry("run")}
+    assert len(encode(same)) < len(encode({**same, "running": entry("running")}))
+    assert Bundle(encode(same)).get("running") == entry("run")
+
+
+def test_rejects_foreign_and_truncated_data():
+    data = encode(ENTRIES)
+    with pytest.raises(BundleError):
+        Bundle(b"XXXX" + data[4:])
+    with pytest.raises(BundleError):
+        Bundle(data[:len(data) - 5])
+    with pytest.raises(BundleError):
+        Bundle(data[:etymology_bundle.HEADER.size - 1])
+
+
+def test_fit_keeps_the_longest_prefix_within_budget():
+    ranked = [(f"word{i:04d}", entry(f"word{i:04d}")) for i in range(400)]
+    full, count = fit(ranked, 10 ** 9)
+    assert count == len(ranked)
+
+    budget = deflated_size(full) // 3
+    data, count = fit(ranked, budget)
+    assert 0 < count < len(ranked)
+    assert deflated_size(data) <= budget
+    # Best words first: exactly the first `count` are kept, and one more would not fit
+    assert list(Bundle(data)) == [word for word, _ in ranked[:count]]
+    assert deflated_size(encode(dict(ranked[:count + 1]))) > budget
+
+
+def test_fit_with_no_room():
+    data, count = fit([("word", entry("word"))], 1)
+    assert count == 0
+    assert len(Bundle(data)) == 0
+
+
+def test_export_trims_to_max_kb(tmp_path):
+    import argparse
+    import asyncio
+    import json
+
+    import export_bundle
+
+    words = [a + b + c for a in "abcdefghijklmnopqrstuvwxyz" for b in "aeiou" for c in "bcdfghjklmnpqrstvwxyz"]
+    entries = {word: entry(word) for word in reversed(words)}
+    source = tmp_path / "entries.json"
+    source.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    output = tmp_path / "bundle.bin"
+    args = argparse.Namespace(json=str(source), words=None, limit=None, max_kb=8, output=str(output))
+
+    assert asyncio.run(export_bundle.export(args)) == 0
+    bundle = Bundle(output.read_bytes())
+    assert deflated_size(output.read_bytes()) <= 8 * 1024
+    assert 0 < len(bundle) < len(entries)
+    # The JSON file's own order ranks the words
+    assert set(bundle) == set(list(entries)[:len(bundle)])
+    assert bundle.metadata["prompt_version"] == export_bundle.PROMPT_VERSION
@@ -0,0 +1,67 @@
+import pytest
+
+from lemmatizer import Lemmatizer, restore_stem
+
+
+@pytest.fixture(scope="module")
+def lemmatizer():
+    return Lemmatizer.load()
+
+
+@pytest.mark.parametrize("word, lemma", [
+    ("received", "receive"),
+    ("increased", "increase"),
+    ("produced", "produce"),
+    ("changing", "change"),
+    ("caused", "cause"),
+    ("leaving", "leave"),
+    ("managed", "manage"),
+    ("experienced", "experience"),
+    ("united", "unite"),
+    ("untied", "untie"),
+    ("breathing", "breathe"),
+])
+def test_restores_the_e(lemmatizer, word, lemma):
+    assert lemmatizer.lemmatize(word) == lemma
+
+
+@pytest.mark.parametrize("word, lemma", [
+    ("running", "run"),
+    ("stopped", "stop"),
+    ("studied", "study"),
+    ("needed", "need"),
+    ("focused", "focus"),
+    ("belonging", "belong"),
+    ("singing", "sing"),
+    ("agreed", "agree"),
+    ("studies", "study"),
+    ("boxes", "box"),
+    ("aches", "ache"),
+    ("cats", "cat"),
+    ("went", "go"),
+])
+def test_other_inflections(lemmatizer, word, lemma):
+    assert lemmatizer.lemmatize(word) == lemma
+
+
+@pytest.mark.parametrize("word", [
+    "morning", "proceed", "zorbed", "blickering",
+    "nowadays", "asbestos", "rhinoceros", "alas", "herpes", "biceps",
+])
+def test_keeps_words_without_a_known_stem(lemmatizer, word):
+    assert lemmatizer.lemmatize(word) == word
+
+
+@pytest.mark.parametrize("stem, restored", [
+    ("produc", "produce"),
+    ("judg", "judge"),
+    ("merg", "merge"),
+    ("caus", "cause"),
+    ("leav", "leave"),
+    ("freez", "freeze"),
+    ("hopp", "hop"),
+    ("relat", "relate"),
+    ("want", "want"),
+])
+def test_restore_stem(stem, restored):
+    assert restore_stem(stem) == restored
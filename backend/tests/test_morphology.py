@@ -0,0 +1,45 @@
+import pytest
+
+from morphology import OFFLINE_MIN_CONFIDENCE, MorphAnalyzer
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return MorphAnalyzer.load()
+
+
+@pytest.mark.parametrize("word", [
+    "remember", "discover", "display", "remove", "recover", "interview", "mislead", "government",
+])
+def test_prefix_on_a_free_root_goes_to_gemini(analyzer, word):
+    # These segment (re + member, dis + cover, ...) but mean something else entirely
+    assert analyzer.lookup(word) is None
+
+
+@pytest.mark.parametrize("word, translation", [
+    ("unhappy", "不快乐"),
+    ("unfair", "不公平"),
+    ("darkness", "黑暗"),
+    ("unhappiness", "不快乐"),
+    ("helpful", "充满帮助的"),
+])
+def test_answers_confident_words_locally(analyzer, word, translation):
+    result = analyzer.lookup(word)
+    assert result is not None
+    data, confidence = result
+    assert confidence >= OFFLINE_MIN_CONFIDENCE
+    assert data["translation"] == translation
+
+
+@pytest.mark.parametrize("word", ["unlock", "unfold", "untie"])
+def test_un_on_a_verb_reverses_rather_than_negates(analyzer, word):
+    # unlock is "open the lock", not 不锁; the reversative reading is too loose to serve offline
+    data, confidence = analyzer.analyze(word)
+    assert data["translation"].startswith("解开")
+    assert confidence < OFFLINE_MIN_CONFIDENCE
+    assert analyzer.lookup(word) is None
+
+
+def test_short_and_unknown_words(analyzer):
+    assert analyzer.analyze("cat") is None
+    assert analyzer.analyze("zqxjkv") is None
@@ -0,0 +1,82 @@
+import json
+import os
+import sqlite3
+
+import httpx
+import pytest
+
+import gemini
+from cache import get_etymology_cache
+from prompts import PROMPT_VERSION, PartialAnswer, parse_batch, parse_etymology
+
+COMPLETE = {"root": "ubiqu (everywhere)", "prefix": "None", "suffix": "-ity (state)", "translation": "无处不在", "desc": "ubiqu（到处） + -ity（状态），意为“无处不在”"}
+# Cut off inside `desc`, as at the output token limit
+TRUNCATED = json.dumps(COMPLETE, ensure_ascii=False)[:-12]
+
+
+@pytest.fixture
+def gemini_text(client, monkeypatch):
+    """Makes every Gemini call, unary or streamed, answer with the text put in the returned list."""
+    texts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        text = texts[-1]
+        if request.url.path.endswith(":streamGenerateContent"):
+            chunk = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            return httpx.Response(200, text=f"data: {json.dumps(chunk)}\r\n\r\n", headers={"content-type": "text/event-stream"})
+        body = {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "MAX_TOKENS"}]}
+        return httpx.Response(200, json=body)
+
+    monkeypatch.setattr(gemini.gemini_client, "_http", httpx.AsyncClient(base_url="http://gemini.test", transport=httpx.MockTransport(handler)))
+    return texts
+
+
+def cached(word: str):
+    with sqlite3.connect(os.environ["SQLITE_PATH"]) as conn:
+        stored = conn.execute("select data from etymology_cache where word = ? and prompt_version = ?", (word, PROMPT_VERSION)).fetchone()
+    return stored, get_etymology_cache().memory.get((word, PROMPT_VERSION))
+
+
+def test_parse_marks_repaired_answers_partial():
+    assert parse_etymology(json.dumps(COMPLETE)) == COMPLETE
+    with pytest.raises(PartialAnswer) as partial:
+        parse_etymology(TRUNCATED)
+    assert partial.value.data["translation"] == "无处不在"
+    assert partial.value.data["desc"] == ""
+
+    batch = json.dumps([{"word": "alpha", **COMPLETE}, {"word": "beta", **COMPLETE}], ensure_ascii=False)[:-14]
+    fanned = parse_batch(batch, ["alpha", "beta"])
+    assert fanned["alpha"] == COMPLETE
+    assert isinstance(fanned["beta"], PartialAnswer)
+
+
+def test_truncated_answer_is_served_but_not_cached(client, premium_user, gemini_text):
+    gemini_text.append(TRUNCATED)
+    body = client.post("/analyze/?word=ubiquity", headers=premium_user).json()
+    assert body["partial"] is True
+    assert body["data"]["translation"] == "无处不在"
+    assert cached("ubiquity") == (None, None)
+
+    # The next lookup asks again, and a complete answer is cached as usual
+    gemini_text.append(json.dumps(COMPLETE, ensure_ascii=False))
+    body = client.post("/analyze/?word=ubiquity", headers=premium_user).json()
+    assert "partial" not in body
+    stored, memory = cached("ubiquity")
+    assert stored is not None and memory == COMPLETE
+
+
+def test_truncated_batch_entry_is_not_cached(client, premium_user, gemini_text):
+    gemini_text.append(json.dumps([{"word": "zygote", **COMPLETE}, {"word": "zymurgy", **COMPLETE}], ensure_ascii=False)[:-14])
+    body = client.post("/analyze/batch", json={"words": ["zygote", "zymurgy"]}, headers=premium_user).json()
+    assert body["partial"] == ["zymurgy"]
+    assert set(body["data"]) == {"zygote", "zymurgy"}
+    assert cached("zygote")[0] is not None
+    assert cached("zymurgy") == (None, None)
+
+
+def test_truncated_stream_is_not_cached(client, premium_user, gemini_text):
+    gemini_text.append(TRUNCATED)
+    events = client.get("/analyze/stream?word=quixotic", headers=premium_user).text
+    done = json.loads(events.split("event: done\ndata: ")[1].split("\n")[0])
+    assert done["partial"] is True
+    assert cached("quixotic") == (None, None)
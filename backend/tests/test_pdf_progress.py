@@ -0,0 +1,50 @@
+import asyncio
+
+import progress
+from conftest import auth_headers
+from progress import ProgressBuffer
+
+
+class FlakyStorage:
+    """Fails any write that includes a row for a PDF in `bad`."""
+
+    def __init__(self, bad):
+        self.bad = set(bad)
+        self.pages = {}
+
+    async def update_pdf_pages(self, pages):
+        if any(pdf_id in self.bad for _, pdf_id, _ in pages):
+            raise ValueError("invalid input syntax for type uuid")
+        for user_id, pdf_id, last_page in pages:
+            self.pages[(user_id, pdf_id)] = last_page
+
+
+def test_flush_drops_failing_rows(monkeypatch):
+    storage = FlakyStorage(bad={"not-a-uuid"})
+    monkeypatch.setattr(progress, "get_storage", lambda: storage)
+    buffer = ProgressBuffer()
+    buffer.set("u1", "pdf-1", 5)
+    buffer.set("u1", "not-a-uuid", 3)
+    buffer.set("u2", "pdf-2", 8)
+
+    asyncio.run(buffer.flush())
+    assert storage.pages == {("u1", "pdf-1"): 5, ("u2", "pdf-2"): 8}
+    assert buffer.stats() == {"received": 3, "written": 2, "dropped": 1, "pending": 0}
+
+    # The bad row is gone, so later flushes go through in one write
+    buffer.set("u1", "pdf-1", 6)
+    asyncio.run(buffer.flush())
+    assert storage.pages[("u1", "pdf-1")] == 6
+    assert buffer.stats()["pending"] == 0
+
+
+def test_page_turn_requires_an_owned_pdf(client, premium_user):
+    pdf = client.post("/pdf/", json={"filename": "a.pdf", "storage_path": "a.pdf"}, headers=premium_user).json()["data"][0]
+
+    assert client.patch(f"/pdf/{pdf['id']}", json={"last_page": 4}, headers=premium_user).json() == {"success": True}
+    assert client.patch("/pdf/does-not-exist", json={"last_page": 4}, headers=premium_user).status_code == 404
+    # Another user's PDF is as good as missing
+    assert client.patch(f"/pdf/{pdf['id']}", json={"last_page": 9}, headers=auth_headers("someone-else")).status_code == 404
+
+    listed = client.get("/pdf/", headers=premium_user).json()["data"]
+    assert listed[0]["last_page"] == 4
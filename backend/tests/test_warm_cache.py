@@ -0,0 +1,58 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def failing_gemini():
+    """bench.fake_gemini answering every call with 429/503, as a separate server process."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_gemini", "--port", str(port), "--latency-ms", "0", "--jitter-ms", "0", "--error-rate", "1.0"],
+        cwd=BACKEND,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base}/stats")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        yield base
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_stops_and_exits_after_consecutive_failures(failing_gemini, tmp_path):
+    words = tmp_path / "words.txt"
+    words.write_text("\n".join(["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta", "kappa"]))
+    env = {
+        **os.environ,
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": str(tmp_path / "warm.db"),
+        "GEMINI_API_BASE": failing_gemini,
+        "GEMINI_MAX_RETRIES": "0",
+    }
+    # Used to hang at interpreter exit, with storage's worker thread never shut down
+    result = subprocess.run(
+        [sys.executable, "warm_cache.py", str(words), "--max-consecutive-failures", "2", "--concurrency", "3", "--include-offline"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 2, result.stderr
+    assert "Stopping after" in result.stdout
+    assert "Traceback" not in result.stderr
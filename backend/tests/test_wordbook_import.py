@@ -0,0 +1,36 @@
+import json
+
+from conftest import auth_headers
+from routers import wordbook
+
+
+def ndjson(words):
+    return "\n".join(json.dumps({"word": word}) for word in words)
+
+
+def new_user(client, user_id):
+    headers = auth_headers(user_id)
+    client.get("/user/me", headers=headers)  # creates the profile the wordbook rows reference
+    return headers
+
+
+def test_import_past_the_limit_keeps_what_it_read(client, monkeypatch):
+    monkeypatch.setattr(wordbook, "MAX_BULK_ROWS", 5)
+    monkeypatch.setattr(wordbook, "BULK_CHUNK_SIZE", 2)
+    headers = new_user(client, "bulk-limit-user")
+    words = [f"word{letter}" for letter in "abcdefgh"]
+
+    response = client.post("/wordbook/bulk", content=ndjson(words), headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["imported"] == 5
+    assert body["truncated"] is True
+
+    # What was reported as imported is exactly what is stored
+    stored = client.get("/wordbook/", params={"fields": "word"}, headers=headers).json()["data"]
+    assert sorted(row["word"] for row in stored) == words[:5]
+
+
+def test_import_within_the_limit_is_not_truncated(client):
+    response = client.post("/wordbook/bulk", content=ndjson(["alpha", "beta"]), headers=new_user(client, "bulk-small-user"))
+    assert response.json() == {"success": True, "imported": 2, "errors": [], "truncated": False}
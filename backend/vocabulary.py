@@ -0,0 +1,243 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from admission import BACKGROUND, Overloaded, get_gemini_scheduler
+from cache import get_etymology_cache
+from lemmatizer import get_lemmatizer
+from metrics import timed
+from morphology import OFFLINE_MIN_CONFIDENCE, get_analyzer
+from pdftext import extract_word_counts
+from prompts import BATCH_CONCURRENCY, PROMPT_VERSION, fetch_etymology_batch, pack_words
+from storage import StorageBackend, get_storage
+
+# Lemmas kept in a PDF's index, best first; all of them are pre-analyzed
+PDF_VOCAB_MAX_WORDS = int(os.environ.get("PDF_VOCAB_MAX_WORDS", "1000"))
+PDF_VOCAB_MIN_LENGTH = int(os.environ.get("PDF_VOCAB_MIN_LENGTH", "5"))
+PDF_MAX_BYTES = int(os.environ.get("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "2000"))
+# PDFs indexed at once, and processes parsing them off the event loop
+PDF_INDEX_CONCURRENCY = int(os.environ.get("PDF_INDEX_CONCURRENCY", "2"))
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", "2"))
+# Hosts a `storage_path` URL may point at; anything else is read from the storage backend
+PDF_DOWNLOAD_HOSTS = {h.strip() for h in os.environ.get("PDF_DOWNLOAD_HOSTS", "").split(",") if h.strip()}
+PDF_DOWNLOAD_TIMEOUT = float(os.environ.get("PDF_DOWNLOAD_TIMEOUT", "30"))
+COMMON_WORDS = os.environ.get(
+    "COMMON_WORDS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "common_words.txt")
+)
+
+# Times an overloaded scheduler is waited out before a chunk is given up
+PREANALYZE_ATTEMPTS = 10
+LOOKUP_CHUNK = 200
+# An unfinished index untouched for this long was abandoned by a restart and is rebuilt
+STALE_AFTER = 600
+# Rarity grows with length (Zipf's law of abbreviation); this length counts as 1.0
+REFERENCE_LENGTH = 8
+
+PENDING_STATUSES = ("pending", "extracting", "analyzing")
+
+
+def load_common_words(path: str = COMMON_WORDS) -> Set[str]:
+    words = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith("#"):
+                words.update(line.split())
+    return words
+
+
+def rank_words(counts: Dict[str, Tuple[int, int]], common: Set[str], limit: int = PDF_VOCAB_MAX_WORDS) -> List[dict]:
+    """
+    Folds word counts into lemmas and ranks the ones a reader is likely to look up:
+    frequent in this document, rare in general. Everyday words, short words and
+    words only ever capitalized (names, acronyms) are left out.
+    """
+    lemmatizer = get_lemmatizer()
+    lemmas: Dict[str, int] = {}
+    for word, (count, lowercase) in counts.items():
+        if not lowercase or word in common:
+            continue
+        lemma = lemmatizer.lemmatize(word) if lemmatizer else word
+        if len(lemma) < PDF_VOCAB_MIN_LENGTH or lemma in common:
+            continue
+        lemmas[lemma] = lemmas.get(lemma, 0) + count
+
+    ranked = [
+        {"word": lemma, "count": count, "score": round((1 + math.log(count)) * len(lemma) / REFERENCE_LENGTH, 3)}
+        for lemma, count in lemmas.items()
+    ]
+    ranked.sort(key=lambda entry: (-entry["score"], entry["word"]))
+    return ranked[:limit]
+
+
+async def read_pdf(storage: StorageBackend, storage_path: str) -> bytes:
+    if storage_path.startswith(("http://", "https://")):
+        host = urlparse(storage_path).hostname
+        if host not in PDF_DOWNLOAD_HOSTS:
+            raise ValueError(f"Downloads from {host} are not allowed (see PDF_DOWNLOAD_HOSTS)")
+        chunks = []
+        size = 0
+        async with httpx.AsyncClient(timeout=PDF_DOWNLOAD_TIMEOUT) as client:
+            async with client.stream("GET", storage_path) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > PDF_MAX_BYTES:
+                        raise ValueError(f"PDF is larger than {PDF_MAX_BYTES} bytes")
+                    chunks.append(chunk)
+        return b"".join(chunks)
+
+    data = await storage.download_pdf(storage_path)
+    if len(data) > PDF_MAX_BYTES:
+        raise ValueError(f"PDF is larger than {PDF_MAX_BYTES} bytes")
+    return data
+
+
+class VocabularyIndexer:
+    """
+    Builds a registered PDF's vocabulary index in the background: extracts its
+    text in a worker process, ranks candidate hard words, and pre-analyzes them
+    into the etymology cache at background priority, so a reader's hover lookups
+    are cache hits instead of one Gemini call per word.
+    """
+
+    def __init__(self, concurrency: int = PDF_INDEX_CONCURRENCY, workers: int = PDF_EXTRACT_WORKERS):
+        self.workers = workers
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._common: Optional[Set[str]] = None
+        self.indexed = 0
+        self.failed = 0
+        self.preanalyzed = 0
+
+    def running(self, pdf_id: str) -> bool:
+        return pdf_id in self._tasks
+
+    def submit(self, user_id: str, pdf_id: str, storage_path: str):
+        """Schedules indexing unless this process is already indexing the PDF."""
+        if pdf_id in self._tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self._index(user_id, pdf_id, storage_path))
+        self._tasks[pdf_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(pdf_id, None))
+
+    def is_stale(self, row: dict) -> bool:
+        """An unfinished index nobody is working on, e.g. because the server restarted mid-way."""
+        if row["status"] not in PENDING_STATUSES or self.running(row["pdf_id"]):
+            return False
+        updated_at = datetime.fromisoformat(row["updated_at"])
+        return (datetime.now(timezone.utc) - updated_at).total_seconds() > STALE_AFTER
+
+    async def _index(self, user_id: str, pdf_id: str, storage_path: str):
+        storage = get_storage()
+        row = {"pdf_id": pdf_id, "user_id": user_id, "status": "pending", "words": [], "analyzed": 0, "failed": 0}
+        await self._save(storage, row)
+        async with self._semaphore:
+            try:
+                # 1. Parse in a worker process; pypdf is pure Python and would stall the event loop
+                row["status"] = "extracting"
+                await self._save(storage, row)
+                data = await read_pdf(storage, storage_path)
+                with timed("pdf_extract"):
+                    page_count, token_count, counts = await asyncio.get_running_loop().run_in_executor(
+                        self._executor(), extract_word_counts, data, PDF_MAX_PAGES
+                    )
+
+                # 2. Rank candidate lemmas; the index is readable while they are analyzed
+                if self._common is None:
+                    self._common = load_common_words()
+                words = rank_words(counts, self._common)
+                row.update(status="analyzing", page_count=page_count, token_count=token_count, words=words)
+                await self._save(storage, row)
+
+                # 3. Pre-analyze into the shared cache
+                analyzed, failed = await self._preanalyze(storage, [entry["word"] for entry in words])
+                row.update(status="ready", analyzed=analyzed, failed=failed)
+                await self._save(storage, row)
+                self.indexed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Indexing PDF {pdf_id} failed: {e}")
+                row.update(status="failed", error=str(e)[:500])
+                self.failed += 1
+                await self._save(storage, row)
+
+    async def _preanalyze(self, storage: StorageBackend, words: List[str]) -> Tuple[int, int]:
+        """Fetches the words that are neither answered offline nor cached yet; returns (analyzed, failed)."""
+        analyzer = get_analyzer()
+        if analyzer:
+            # `analyze` rather than `lookup`, which would count these as served requests
+            words = [w for w in words if not ((result := analyzer.analyze(w)) and result[1] >= OFFLINE_MIN_CONFIDENCE)]
+        missing = []
+        for start in range(0, len(words), LOOKUP_CHUNK):
+            chunk = words[start:start + LOOKUP_CHUNK]
+            cached = await storage.get_etymologies(chunk, PROMPT_VERSION)
+            missing.extend(w for w in chunk if w not in cached)
+        if not missing:
+            return 0, 0
+
+        cache = get_etymology_cache()
+        scheduler = get_gemini_scheduler()
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run_chunk(chunk: List[str]) -> int:
+            async with semaphore:
+                for _ in range(PREANALYZE_ATTEMPTS):
+                    try:
+                        entries = await scheduler.run(lambda: fetch_etymology_batch(chunk), BACKGROUND)
+                    except Overloaded as e:
+                        # Live lookups come first; wait until Gemini has room again
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except Exception as e:
+                        print(f"Pre-analysis of {len(chunk)} words failed: {e}")
+                        return 0
+                    # Entries cut off by the output limit are not cached; the reader's lookup asks again
+                    entries = {w: data for w, data in entries.items() if isinstance(data, dict)}
+                    await cache.put_many(storage, entries, PROMPT_VERSION)
+                    self.preanalyzed += len(entries)
+                    return len(entries)
+                return 0
+
+        analyzed = sum(await asyncio.gather(*(run_chunk(c) for c in pack_words(missing))))
+        return analyzed, len(missing) - analyzed
+
+    async def _save(self, storage: StorageBackend, row: dict):
+        row["updated_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            await storage.put_pdf_vocabulary(row)
+        except Exception as e:
+            print(f"Saving vocabulary index for PDF {row['pdf_id']} failed: {e}")
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def stop(self):
+        """Cancels indexing in progress; unfinished indexes are rebuilt once they go stale."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {"running": len(self._tasks), "indexed": self.indexed, "failed": self.failed, "preanalyzed": self.preanalyzed}
+
+
+vocabulary_indexer = VocabularyIndexer()
+
+
+def get_vocabulary_indexer() -> VocabularyIndexer:
+    return vocabulary_indexer
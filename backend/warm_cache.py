@@ -0,0 +1,288 @@
+"""
+Fills the etymology cache ahead of traffic from a word-frequency list.
+
+Usage:
+    python warm_cache.py words.txt --limit 20000
+    python warm_cache.py words.txt --rpm 600 --concurrency 16
+    python warm_cache.py words.txt --dry-run   # count what would be fetched
+
+The list has one word per line, optionally followed by its count ("the 23135851162",
+"the,23135851162" or tab-separated); with counts the most frequent words go first.
+Inflected forms are folded into their lemma ("running" -> "run"), the key the API looks
+them up under. Lemmas already cached for the current PROMPT_VERSION, and words the offline
+analyzer answers, are skipped. Each word is fetched with the same prompt as POST /analyze/,
+so the entries are exactly what a live lookup would have stored.
+
+Progress is appended to a checkpoint file (default: <list>.checkpoint.jsonl) after every
+write, so an interrupted run picks up where it stopped when started again. Exits 1 when
+some words failed, and 2 when it gave up after --max-consecutive-failures in a row.
+Uses the same environment as the server (STORAGE_BACKEND, GEMINI_API_KEY, GEMINI_API_BASE, ...).
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import gemini  # noqa: E402
+from cache import normalize_word  # noqa: E402
+from lemmatizer import get_lemmatizer  # noqa: E402
+from morphology import get_analyzer  # noqa: E402
+from prompts import PROMPT_VERSION, fetch_etymology  # noqa: E402
+from ratelimit import TokenBucket  # noqa: E402
+from storage import StorageBackend, close_storage, init_storage  # noqa: E402
+
+WORD = re.compile(r"^[a-z][a-z'-]*$")
+LOOKUP_CHUNK = 1000
+
+
+class TooManyFailures(Exception):
+    pass
+
+
+def load_words(path: str, limit: Optional[int] = None) -> List[str]:
+    """Reads a frequency list, most frequent first, normalized and deduplicated."""
+    entries: List[Tuple[str, Optional[float]]] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = re.split(r"[\s,;]+", line.strip())
+            if not fields[0] or fields[0].startswith("#"):
+                continue
+            word = normalize_word(fields[0])
+            if not WORD.match(word):
+                continue
+            count = next((float(x) for x in fields[1:] if re.fullmatch(r"\d+(\.\d+)?", x)), None)
+            entries.append((word, count))
+
+    # Lists that carry counts may be in any order; plain lists are taken as already ranked
+    if any(count is not None for _, count in entries):
+        entries.sort(key=lambda e: -(e[1] or 0))
+    words = list(dict.fromkeys(word for word, _ in entries))
+    return words[:limit] if limit else words
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished words. The first line records the prompt
+    version, so a checkpoint from an older prompt is never mistaken for progress.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.warmed: set = set()
+        self.failed: Dict[str, str] = {}
+
+    def load(self, restart: bool):
+        if restart or not os.path.exists(self.path):
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"prompt_version": PROMPT_VERSION}) + "\n")
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        header = json.loads(lines[0]) if lines else {}
+        if header.get("prompt_version") != PROMPT_VERSION:
+            raise SystemExit(
+                f"{self.path} was written for prompt {header.get('prompt_version')}, not {PROMPT_VERSION}. "
+                "Run with --restart to start over."
+            )
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line; those words are simply redone
+                continue
+            self.warmed.update(record.get("warmed", []))
+            self.failed.update(record.get("failed", {}))
+        for word in self.warmed:
+            self.failed.pop(word, None)
+
+    def append(self, warmed: List[str] = (), failed: Optional[Dict[str, str]] = None):
+        record = {}
+        if warmed:
+            record["warmed"] = list(warmed)
+            self.warmed.update(warmed)
+        if failed:
+            record["failed"] = failed
+            self.failed.update(failed)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class Warmer:
+    def __init__(self, storage: StorageBackend, checkpoint: Checkpoint, bucket: TokenBucket, concurrency: int, flush_size: int, max_consecutive_failures: int):
+        self.storage = storage
+        self.checkpoint = checkpoint
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.flush_size = flush_size
+        self.max_consecutive_failures = max_consecutive_failures
+        self.pending: Dict[str, dict] = {}
+        self.warmed = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.last_error = ""
+        self.total = 0
+        self.started = time.monotonic()
+
+    async def run(self, words: List[str], report_interval: float):
+        self.total = len(words)
+        self.started = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue()
+        for word in words:
+            queue.put_nowait(word)
+
+        reporter = asyncio.create_task(self._report(report_interval))
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # One worker giving up (or Ctrl-C) stops the others mid-request
+            for task in [reporter, *workers]:
+                task.cancel()
+            await asyncio.gather(reporter, *workers, return_exceptions=True)
+            # Also runs on Ctrl-C, so answers already paid for are not lost
+            await self.flush()
+
+    async def _worker(self, queue: asyncio.Queue):
+        while not queue.empty():
+            if self.consecutive_failures >= self.max_consecutive_failures:
+                raise TooManyFailures(f"Stopping after {self.consecutive_failures} consecutive failures; last: {self.last_error}")
+            word = queue.get_nowait()
+            await self.bucket.acquire()
+            try:
+                data = await fetch_etymology(word)
+            except Exception as e:
+                self.failed += 1
+                self.consecutive_failures += 1
+                self.last_error = str(e)
+                self.checkpoint.append(failed={word: str(e)[:200]})
+                continue
+            self.consecutive_failures = 0
+            self.pending[word] = data
+            if len(self.pending) >= self.flush_size:
+                await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        # Swap first: other workers keep filling a fresh buffer while this one is written
+        entries, self.pending = self.pending, {}
+        await self.storage.put_etymologies(entries, PROMPT_VERSION)
+        self.checkpoint.append(warmed=list(entries))
+        self.warmed += len(entries)
+
+    def progress(self) -> str:
+        elapsed = time.monotonic() - self.started
+        finished = self.warmed + len(self.pending) + self.failed
+        rate = finished / elapsed if elapsed else 0.0
+        eta = (self.total - finished) / rate if rate else 0.0
+        return (
+            f"[{elapsed:6.0f}s] {finished}/{self.total} done ({self.failed} failed), "
+            f"{rate:.2f} words/s ({rate * 60:.0f}/min), ETA {eta / 60:.1f} min"
+        )
+
+    async def _report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.progress(), flush=True)
+
+
+async def plan(storage: StorageBackend, words: List[str], checkpoint: Checkpoint, retry_failed: bool, include_offline: bool) -> Tuple[List[str], Dict[str, int]]:
+    """Drops words that need no Gemini call, returning the rest and why the others were skipped."""
+    lemmatizer = get_lemmatizer()
+    lemmas = list(dict.fromkeys(lemmatizer.lemmatize(w) for w in words)) if lemmatizer else words
+    skipped = {"inflected": len(words) - len(lemmas), "checkpoint": 0, "failed": 0, "offline": 0, "cached": 0}
+    remaining = []
+    analyzer = None if include_offline else get_analyzer()
+    for word in lemmas:
+        if word in checkpoint.warmed:
+            skipped["checkpoint"] += 1
+        elif word in checkpoint.failed and not retry_failed:
+            skipped["failed"] += 1
+        elif analyzer and analyzer.lookup(word):
+            # Served locally before the cache is consulted, so a cached copy would never be read
+            skipped["offline"] += 1
+        else:
+            remaining.append(word)
+
+    todo = []
+    for start in range(0, len(remaining), LOOKUP_CHUNK):
+        chunk = remaining[start:start + LOOKUP_CHUNK]
+        cached = await storage.get_etymologies(chunk, PROMPT_VERSION)
+        skipped["cached"] += len(cached)
+        todo.extend(w for w in chunk if w not in cached)
+    return todo, skipped
+
+
+async def warm(args) -> int:
+    words = load_words(args.words, args.limit)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.words}.checkpoint.jsonl")
+    checkpoint.load(args.restart)
+
+    storage = await init_storage()
+    try:
+        if storage is None:
+            raise SystemExit("No storage configured; the cache has nowhere to persist (see STORAGE_BACKEND).")
+        client = await gemini.init_gemini()
+        todo, skipped = await plan(storage, words, checkpoint, args.retry_failed, args.include_offline)
+        print(f"{len(words)} words in list; skipping " + ", ".join(f"{count} {reason}" for reason, count in skipped.items()))
+        print(f"{len(todo)} words to fetch at up to {args.rpm:g} requests/min with concurrency {args.concurrency}")
+        if args.dry_run or not todo:
+            return 0
+
+        bucket = TokenBucket.per_minute(args.rpm, burst=args.burst or args.concurrency)
+        warmer = Warmer(storage, checkpoint, bucket, args.concurrency, args.flush_size, args.max_consecutive_failures)
+        try:
+            await warmer.run(todo, args.report_interval)
+        except TooManyFailures as e:
+            print(e)
+            return 2
+        finally:
+            elapsed = time.monotonic() - warmer.started
+            print(warmer.progress())
+            print(
+                f"Warmed {warmer.warmed} words in {elapsed:.1f}s ({warmer.warmed / elapsed if elapsed else 0:.2f} words/s); "
+                f"{warmer.failed} failed. Gemini: {client.requests} requests, {client.retries} retries, "
+                f"{client.tokens['prompt']} prompt / {client.tokens['output']} output tokens."
+            )
+        return 1 if warmer.failed else 0
+    finally:
+        await gemini.close_gemini()
+        await close_storage()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fill the etymology cache from a word-frequency list")
+    parser.add_argument("words", help="Frequency list: one word per line, optionally with a count")
+    parser.add_argument("--limit", type=int, help="Only the N most frequent words")
+    parser.add_argument("--rpm", type=float, default=float(os.environ.get("WARM_CACHE_RPM", "300")), help="Ceiling on words started per minute (Gemini retries come on top)")
+    parser.add_argument("--burst", type=int, help="Requests allowed back to back before the rate applies (default: --concurrency)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Gemini requests in flight at once")
+    parser.add_argument("--flush-size", type=int, default=50, help="Entries per cache write and checkpoint record")
+    parser.add_argument("--checkpoint", help="Progress file (default: <words>.checkpoint.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Ignore and overwrite an existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry words that failed in an earlier run")
+    parser.add_argument("--include-offline", action="store_true", help="Also fetch words the offline analyzer answers")
+    parser.add_argument("--max-consecutive-failures", type=int, default=20, help="Stop when this many lookups fail in a row")
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds between progress lines")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many words would be fetched")
+    args = parser.parse_args()
+    try:
+        return asyncio.run(warm(args))
+    except KeyboardInterrupt:
+        print("Interrupted; progress is saved in the checkpoint, run the same command to resume.")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
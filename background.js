@@ -26,11 +26,18 @@ async function handleWordAnalysis(word, sendResponse) {
             return;
         }
 
-        // 2. 缓存没命中，请求 API
+        // 2. 离线词库 (随扩展打包，见 pack_extension.py --bundle)
+        const bundled = await lookupBundle(lowerWord);
+        if (bundled) {
+            sendResponse({ success: true, data: bundled });
+            return;
+        }
+
+        // 3. 缓存没命中，请求 API
         // console.log(`[API Request] 正在请求 API: ${word}`);
         const apiData = await fetchEtymology(word);
 
-        // 3. 存入缓存 (这里并没有设置过期时间，意味着除非你手动删，否则永久保存)
+        // 4. 存入缓存 (这里并没有设置过期时间，意味着除非你手动删，否则永久保存)
         await chrome.storage.local.set({ [cacheKey]: apiData });
 
         sendResponse({ success: true, data: apiData });
@@ -41,6 +48,72 @@ async function handleWordAnalysis(word, sendResponse) {
     }
 }
 
+// Offline etymology bundle: words sorted bytewise with an offset index, searched in place.
+// Layout in backend/etymology_bundle.py; a missing bundle or unknown format means no bundle.
+const BUNDLE_FILE = 'data/etymology.bin';
+const BUNDLE_MAGIC = 0x42595445; // "ETYB" read as a little-endian u32
+const BUNDLE_FORMAT = 1;
+const BUNDLE_HEADER_SIZE = 16;
+let bundlePromise = null;
+
+function loadBundle() {
+    if (!bundlePromise) {
+        bundlePromise = fetch(chrome.runtime.getURL(BUNDLE_FILE))
+            .then(response => response.ok ? response.arrayBuffer() : null)
+            .then(buffer => buffer && parseBundle(buffer))
+            .catch(() => null);
+    }
+    return bundlePromise;
+}
+
+function parseBundle(buffer) {
+    const view = new DataView(buffer);
+    if (buffer.byteLength < BUNDLE_HEADER_SIZE || view.getUint32(0, true) !== BUNDLE_MAGIC) return null;
+    if (view.getUint16(4, true) !== BUNDLE_FORMAT) {
+        console.warn("Unsupported etymology bundle format, ignoring it");
+        return null;
+    }
+    const count = view.getUint32(8, true);
+    const keyOffsets = BUNDLE_HEADER_SIZE + view.getUint32(12, true);
+    const values = keyOffsets + 4 * (count + 1);
+    const keysStart = values + 8 * count;
+    const valuesStart = keysStart + view.getUint32(keyOffsets + 4 * count, true);
+    return { view, bytes: new Uint8Array(buffer), count, keyOffsets, values, keysStart, valuesStart };
+}
+
+function compareBytes(bytes, start, end, target) {
+    const length = Math.min(end - start, target.length);
+    for (let i = 0; i < length; i++) {
+        if (bytes[start + i] !== target[i]) return bytes[start + i] - target[i];
+    }
+    return (end - start) - target.length;
+}
+
+async function lookupBundle(word) {
+    const bundle = await loadBundle();
+    if (!bundle) return null;
+    const { view, bytes, keyOffsets, values, keysStart, valuesStart } = bundle;
+    const target = new TextEncoder().encode(word);
+    let low = 0;
+    let high = bundle.count;
+    while (low < high) {
+        const middle = (low + high) >>> 1;
+        const start = keysStart + view.getUint32(keyOffsets + 4 * middle, true);
+        const end = keysStart + view.getUint32(keyOffsets + 4 * (middle + 1), true);
+        const order = compareBytes(bytes, start, end, target);
+        if (order < 0) {
+            low = middle + 1;
+        } else if (order > 0) {
+            high = middle;
+        } else {
+            const offset = valuesStart + view.getUint32(values + 8 * middle, true);
+            const length = view.getUint32(values + 8 * middle + 4, true);
+            return JSON.parse(new TextDecoder().decode(bytes.subarray(offset, offset + length)));
+        }
+    }
+    return null;
+}
+
 async function fetchEtymology(word) {
     // 关键修改：将模型版本从 1.5 改为 2.5
     // 注意：如果是 2026 年，gemini-2.5-flash 是最新的稳定版
@@ -0,0 +1,145 @@
+"""
+Times the asset scripts' pixel analysis: the per-pixel Python loops they used to
+run against the NumPy versions in image_utils, checking both give the same answer.
+
+Usage:
+    python bench_images.py
+    python bench_images.py --image images/logo.png --image screenshot.png --repeat 5
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+import image_utils
+
+# Chrome Web Store screenshot size
+SCREENSHOT_SIZE = (1280, 800)
+
+
+# The loops the scripts used before image_utils
+
+def loop_non_white_bbox(img):
+    width, height = img.size
+    pixels = list(img.getdata())
+    left, top, right, bottom = width, height, 0, 0
+    found = False
+    for y in range(height):
+        for x in range(width):
+            r, g, b, a = pixels[y * width + x]
+            if a > 0 and (r < 250 or g < 250 or b < 250):
+                left, top, right, bottom = min(left, x), min(top, y), max(right, x), max(bottom, y)
+                found = True
+    return (left, top, right + 1, bottom + 1) if found else None
+
+
+def loop_mask_white(img):
+    new_data = []
+    for item in img.getdata():
+        if item[0] > 240 and item[1] > 240 and item[2] > 240:
+            new_data.append((255, 255, 255, 0))
+        else:
+            new_data.append(item)
+    temp = Image.new("RGBA", img.size)
+    temp.putdata(new_data)
+    return temp.getbbox()
+
+
+def loop_yellow(img):
+    yellows = []
+    for x in range(img.width):
+        for y in range(img.height):
+            r, g, b, a = img.getpixel((x, y))
+            if a >= 50 and r > 150 and g > 150 and b < 100:
+                yellows.append((r, g, b))
+    if not yellows:
+        return None
+    return tuple(sum(c[i] for c in yellows) // len(yellows) for i in range(3))
+
+
+def loop_dominant(img, count=20):
+    colors = []
+    for x in range(img.width):
+        for y in range(img.height):
+            r, g, b, a = img.getpixel((x, y))
+            if a < 50 or (r > 250 and g > 250 and b > 250) or (r < 10 and g < 10 and b < 10):
+                continue
+            colors.append((r, g, b))
+    return Counter(colors).most_common(count)
+
+
+# The same work on arrays
+
+def array_non_white_bbox(img):
+    pixels = image_utils.load_rgba(img)
+    return image_utils.bbox(image_utils.visible(pixels) & ~image_utils.near_white(pixels, 249))
+
+
+def array_mask_white(img):
+    pixels = image_utils.load_rgba(img)
+    return image_utils.bbox(image_utils.visible(pixels) & ~image_utils.near_white(pixels, 240))
+
+
+def array_yellow(img):
+    pixels = image_utils.load_rgba(img)
+    return image_utils.mean_color(pixels, image_utils.color_range(pixels, (151, 255), (151, 255), (0, 99), min_alpha=50))
+
+
+def array_dominant(img, count=20):
+    pixels = image_utils.load_rgba(img)
+    mask = image_utils.visible(pixels, 50) & ~image_utils.near_white(pixels, 250) & ~image_utils.near_black(pixels, 10)
+    return image_utils.dominant_colors(pixels, mask, count)
+
+
+CASES = [
+    ("non-white bbox (analyze_icon)", loop_non_white_bbox, array_non_white_bbox),
+    ("white masking (optimize_icons)", loop_mask_white, array_mask_white),
+    ("color filter (find_yellow)", loop_yellow, array_yellow),
+    ("dominant colors (extract_colors)", loop_dominant, array_dominant),
+]
+
+
+def best_of(fn, img, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(img)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def screenshot() -> Image.Image:
+    """A synthetic screenshot: white page, flat UI blocks and a noisy photo area."""
+    width, height = SCREENSHOT_SIZE
+    rng = np.random.default_rng(0)
+    pixels = np.full((height, width, 4), 255, dtype=np.uint8)
+    pixels[:64] = (250, 204, 21, 255)
+    pixels[120:680, 80:560, :3] = rng.integers(0, 256, (560, 480, 3), dtype=np.uint8)
+    pixels[160:200, 640:1200] = (33, 33, 33, 255)
+    return image_utils.to_image(pixels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-pixel loops against image_utils")
+    parser.add_argument("--image", action="append", help="Image to analyze (default: images/logo.png and a synthetic screenshot)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best is reported")
+    args = parser.parse_args()
+
+    images = [(path, Image.open(path).convert("RGBA")) for path in args.image or ["images/logo.png"]]
+    if not args.image:
+        images.append((f"synthetic {SCREENSHOT_SIZE[0]}x{SCREENSHOT_SIZE[1]} screenshot", screenshot()))
+
+    for name, img in images:
+        print(f"{name} ({img.width}x{img.height})")
+        for label, loop, array in CASES:
+            if loop(img) != array(img):
+                raise SystemExit(f"  {label}: results differ")
+            before = best_of(loop, img, args.repeat)
+            after = best_of(array, img, args.repeat)
+            print(f"  {label:34} loop {before * 1000:9.1f} ms   numpy {after * 1000:7.2f} ms   {before / after:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Whole-image pixel analysis on NumPy arrays, shared by the asset scripts.
+
+Images are handled as (height, width, 4) uint8 RGBA arrays and every test is a
+boolean mask over them, so a 640x640 logo is one vectorized pass instead of
+400k Python-level `getpixel` calls.
+"""
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+Range = Tuple[int, int]
+
+
+def load_rgba(source: Union[str, Image.Image]) -> np.ndarray:
+    """Opens a path (or takes a PIL image) as an RGBA array."""
+    img = Image.open(source) if isinstance(source, str) else source
+    return np.asarray(img.convert("RGBA"))
+
+
+def to_image(pixels: np.ndarray) -> Image.Image:
+    return Image.fromarray(np.ascontiguousarray(pixels), "RGBA")
+
+
+def rgb_to_hex(rgb) -> str:
+    return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
+
+
+def bbox(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """(left, top, right, bottom) of the True pixels, exclusive like PIL's getbbox; None if there are none."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def visible(pixels: np.ndarray, min_alpha: int = 1) -> np.ndarray:
+    return pixels[..., 3] >= min_alpha
+
+
+def near_white(pixels: np.ndarray, threshold: int = 240) -> np.ndarray:
+    """Pixels whose R, G and B are all above `threshold`."""
+    # Per-channel comparisons; reducing over the short last axis is several times slower
+    return (pixels[..., 0] > threshold) & (pixels[..., 1] > threshold) & (pixels[..., 2] > threshold)
+
+
+def near_black(pixels: np.ndarray, threshold: int = 10) -> np.ndarray:
+    """Pixels whose R, G and B are all below `threshold`."""
+    return (pixels[..., 0] < threshold) & (pixels[..., 1] < threshold) & (pixels[..., 2] < threshold)
+
+
+def color_range(pixels: np.ndarray, red: Range = (0, 255), green: Range = (0, 255), blue: Range = (0, 255), min_alpha: int = 0) -> np.ndarray:
+    """Pixels with each channel inside its inclusive (low, high) range and alpha at least `min_alpha`."""
+    mask = visible(pixels, min_alpha)
+    for channel, (low, high) in enumerate((red, green, blue)):
+        values = pixels[..., channel]
+        mask &= (values >= low) & (values <= high)
+    return mask
+
+
+def mean_color(pixels: np.ndarray, mask: np.ndarray) -> Optional[Tuple[int, int, int]]:
+    """Average RGB of the masked pixels, rounded down; None if the mask is empty."""
+    selected = pixels[mask][:, :3]
+    if len(selected) == 0:
+        return None
+    return tuple(int(v) for v in selected.sum(axis=0, dtype=np.int64) // len(selected))
+
+
+def dominant_colors(pixels: np.ndarray, mask: np.ndarray, count: int = 20) -> List[Tuple[Tuple[int, int, int], int]]:
+    """
+    The `count` most common RGB colors among the masked pixels, as ((r, g, b), n).
+    Ties keep the order in which colors first appear scanning column by column,
+    matching the scripts' old x-then-y loops fed to Counter.most_common.
+    """
+    # Column-major so first occurrences follow the old scan order
+    rgb = pixels[..., :3].transpose(1, 0, 2)[mask.T].astype(np.uint32)
+    if len(rgb) == 0:
+        return []
+    keys = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    colors, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.lexsort((first, -counts))[:count]
+    return [(((int(c) >> 16) & 255, (int(c) >> 8) & 255, int(c) & 255), int(n)) for c, n in zip(colors[order], counts[order])]
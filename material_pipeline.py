@@ -0,0 +1,301 @@
+"""
+Builds the listing material images: every source image in material/ is fitted inside
+each target size, laid over the background and saved as <name>_<width>x<height>.png.
+
+Usage:
+    python material_pipeline.py                              # 640x400 over material/background.png
+    python material_pipeline.py --size 640x400 --size 1280x800
+    python material_pipeline.py --background color:105,240,174 --opacity 1
+    python material_pipeline.py --force                      # rebuild everything
+    python material_pipeline.py --verify-only
+
+Sources are spread over a process pool, and each background is scaled and cropped once
+per size. A manifest (material/.manifest.json) records every source's content hash, the
+parameters used and the outputs written, so a re-run only builds what changed. Afterwards
+every output is checked, like verify_images.py / verify_images_v2.py did: its size, that it
+is RGB, and that the padding around the image shows the untouched background.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+MATERIAL_DIR = 'material'
+BACKGROUND_FILE = 'background.png'
+MANIFEST_FILE = '.manifest.json'
+DEFAULT_SIZE = (640, 400)
+DEFAULT_OPACITY = 0.95
+# Bump when the rendering changes, so every output is rebuilt
+PIPELINE_VERSION = 1
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+OUTPUT_NAME = re.compile(r'_\d+x\d+$')
+
+Size = Tuple[int, int]
+
+# Background bases for this worker process, {size: RGB image}, set by init_worker
+_bases: Dict[Size, Image.Image] = {}
+
+
+def parse_size(value: str) -> Size:
+    match = re.fullmatch(r'(\d+)x(\d+)', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def size_key(size: Size) -> str:
+    return f"{size[0]}x{size[1]}"
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_color(spec: str) -> Tuple[int, int, int]:
+    values = tuple(int(v) for v in spec.split(','))
+    if len(values) != 3 or not all(0 <= v <= 255 for v in values):
+        raise ValueError(f"Background color must be R,G,B, got {spec!r}")
+    return values
+
+
+def background_base(background: str, directory: str, size: Size) -> Image.Image:
+    """The background scaled to cover `size` and center-cropped, or a flat `color:R,G,B`."""
+    width, height = size
+    if background.startswith('color:'):
+        return Image.new('RGB', size, parse_color(background[len('color:'):]))
+
+    with Image.open(os.path.join(directory, background)) as img:
+        img = img.convert('RGB')
+        src_ratio = img.width / img.height
+        if src_ratio > width / height:
+            # Wider than the target: scale by height
+            new_width, new_height = int(height * src_ratio), height
+        else:
+            new_width, new_height = width, int(width / src_ratio)
+        resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        left = (new_width - width) // 2
+        top = (new_height - height) // 2
+        return resized.crop((left, top, left + width, top + height))
+
+
+def init_worker(bases: Dict[Size, Tuple[str, Size, bytes]]):
+    # Sent once per worker as raw bytes instead of once per image
+    _bases.update({size: Image.frombytes(mode, dims, data) for size, (mode, dims, data) in bases.items()})
+
+
+def render(source: str, output_dir: str, sizes: List[Size], opacity: float) -> Dict[str, dict]:
+    """Writes `source` over the background at each size; returns {size: output record}."""
+    outputs = {}
+    with Image.open(source) as original:
+        original = original.convert('RGBA')
+        base_name = os.path.splitext(os.path.basename(source))[0]
+        for size in sizes:
+            img = original.copy()
+            # Fit inside the target (contain)
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            if opacity < 1:
+                img.putalpha(img.getchannel('A').point(lambda p: int(p * opacity)))
+
+            final = _bases[size].copy()
+            left = (size[0] - img.width) // 2
+            top = (size[1] - img.height) // 2
+            final.paste(img, (left, top), img)
+
+            file_name = f"{base_name}_{size_key(size)}.png"
+            path = os.path.join(output_dir, file_name)
+            final.convert('RGB').save(path, format='PNG')
+            outputs[size_key(size)] = {
+                "file": file_name,
+                "sha256": file_hash(path),
+                "box": [left, top, img.width, img.height],
+            }
+    return outputs
+
+
+def verify(path: str, size: Size, box: List[int]) -> List[str]:
+    """Problems with one output: wrong size or mode, or padding that isn't the plain background."""
+    problems = []
+    with Image.open(path) as img:
+        if img.size != size:
+            return [f"size {img.size} != {size}"]
+        if img.mode != 'RGB':
+            problems.append(f"mode is {img.mode}, expected RGB")
+
+        base = _bases[size]
+        left, top, width, height = box
+        # Midpoints of whichever edges the fitted image leaves uncovered
+        probes = []
+        if left > 0:
+            probes.append((0, size[1] // 2))
+        if left + width < size[0]:
+            probes.append((size[0] - 1, size[1] // 2))
+        if top > 0:
+            probes.append((size[0] // 2, 0))
+        if top + height < size[1]:
+            probes.append((size[0] // 2, size[1] - 1))
+        for point in probes:
+            actual, expected = img.getpixel(point), base.getpixel(point)
+            if actual != expected:
+                problems.append(f"pixel {point} is {actual}, expected background {expected}")
+    return problems
+
+
+class Manifest:
+    """Source content hashes, parameters and outputs from previous runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f).get("sources", {})
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": PIPELINE_VERSION, "sources": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def stale_sizes(self, name: str, source_hash: str, params: dict, sizes: List[Size], directory: str) -> List[Size]:
+        """Sizes of `name` that must be (re)built: the source or parameters changed, or the output is missing or edited."""
+        entry = self.entries.get(name)
+        if not entry or entry["sha256"] != source_hash or entry["params"] != params:
+            return sizes
+        stale = []
+        for size in sizes:
+            output = entry["outputs"].get(size_key(size))
+            path = output and os.path.join(directory, output["file"])
+            if not output or not os.path.exists(path) or file_hash(path) != output["sha256"]:
+                stale.append(size)
+        return stale
+
+    def record(self, name: str, source_hash: str, params: dict, outputs: Dict[str, dict]):
+        entry = self.entries.get(name)
+        if not entry or entry["sha256"] != source_hash or entry["params"] != params:
+            entry = self.entries[name] = {"sha256": source_hash, "params": params, "outputs": {}}
+        entry["outputs"].update(outputs)
+
+
+def find_sources(directory: str, background: str) -> List[str]:
+    sources = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS or name == background or OUTPUT_NAME.search(stem):
+            continue
+        sources.append(name)
+    return sources
+
+
+def run(args) -> int:
+    directory = args.dir
+    sizes = list(dict.fromkeys(args.size or [DEFAULT_SIZE]))
+    manifest = Manifest(os.path.join(directory, args.manifest))
+    manifest.load()
+
+    background_id = args.background if args.background.startswith('color:') else f"sha256:{file_hash(os.path.join(directory, args.background))}"
+    params = {"background": background_id, "opacity": args.opacity, "pipeline": PIPELINE_VERSION}
+
+    # 1. Hash sources and keep only the (source, sizes) pairs the manifest can't vouch for
+    sources = find_sources(directory, args.background)
+    hashes = {name: file_hash(os.path.join(directory, name)) for name in sources}
+    jobs = {}
+    for name in sources:
+        stale = sizes if args.force else manifest.stale_sizes(name, hashes[name], params, sizes, directory)
+        if stale:
+            jobs[name] = stale
+    print(f"{len(sources)} source images, {len(sizes)} sizes: {len(jobs)} to build, {len(sources) - len(jobs)} up to date")
+    if args.verify_only:
+        jobs = {}
+
+    # 2. Each background base is computed once per size and shipped to every worker
+    bases = {}
+    for size in sizes:
+        base = background_base(args.background, directory, size)
+        bases[size] = (base.mode, base.size, base.tobytes())
+
+    failed = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(bases,)) as pool:
+        try:
+            futures = {pool.submit(render, os.path.join(directory, name), directory, stale, args.opacity): name for name, stale in jobs.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed to process {name}: {e}")
+                    continue
+                manifest.record(name, hashes[name], params, outputs)
+                print(f"Processed {name} -> {', '.join(o['file'] for o in outputs.values())}")
+        finally:
+            # Sources that were removed no longer need entries; their old outputs are left alone
+            for name in set(manifest.entries) - set(sources):
+                del manifest.entries[name]
+            manifest.save()
+        if jobs:
+            print(f"Built {len(jobs) - failed} sources in {time.perf_counter() - started:.2f}s with {args.workers or os.cpu_count()} workers")
+
+        # 3. Post-stage: check every output this run is responsible for
+        if args.no_verify:
+            return 1 if failed else 0
+        checks = {}
+        for name in sources:
+            entry = manifest.entries.get(name)
+            for size in sizes:
+                output = entry and entry["params"] == params and entry["outputs"].get(size_key(size))
+                if not output:
+                    print(f"[FAIL] {name} has no {size_key(size)} output")
+                    failed += 1
+                    continue
+                path = os.path.join(directory, output["file"])
+                checks[pool.submit(verify, path, size, output["box"])] = output["file"]
+        for future in as_completed(checks):
+            try:
+                problems = future.result()
+            except Exception as e:
+                problems = [f"could not read: {e}"]
+            for problem in problems:
+                print(f"[FAIL] {checks[future]}: {problem}")
+            failed += bool(problems)
+        print(f"Verified {len(checks)} outputs: " + ("all passed" if not failed else f"{failed} problems"))
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit material images onto a background at one or more sizes")
+    parser.add_argument("--dir", default=MATERIAL_DIR, help="Directory with the source images; outputs are written next to them")
+    parser.add_argument("--size", type=parse_size, action="append", help="Target size as WIDTHxHEIGHT; repeat for several (default: 640x400)")
+    parser.add_argument("--background", default=BACKGROUND_FILE, help="Background image in --dir, or color:R,G,B")
+    parser.add_argument("--opacity", type=float, default=DEFAULT_OPACITY, help="Opacity of the image over the background")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="Manifest file name inside --dir")
+    parser.add_argument("--force", action="store_true", help="Rebuild every output regardless of the manifest")
+    parser.add_argument("--verify-only", action="store_true", help="Only check existing outputs")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the verification stage")
+    args = parser.parse_args()
+    if not os.path.isdir(args.dir):
+        print(f"Error: {args.dir} not found.")
+        return 1
+    if not args.background.startswith('color:') and not os.path.exists(os.path.join(args.dir, args.background)):
+        print(f"Error: Background file {args.background} not found.")
+        return 1
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
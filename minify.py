@@ -0,0 +1,199 @@
+"""
+Conservative JS/CSS/JSON minification for packaging the extension.
+
+Only comments and whitespace are removed; nothing is renamed or rewritten. JS keeps a
+line break wherever automatic semicolon insertion could depend on it, so the output
+parses exactly like the input. License comments (@license, @preserve, @licstart, /*!)
+are kept.
+"""
+import json
+import re
+
+IDENT_CHAR = re.compile(r"[\w$\\\u0080-\uffff]")
+LICENSE = re.compile(r"@license|@preserve|@licstart|^/\*!")
+# A number that a following `.` would extend into a decimal point (`1 .x` is not `1.x`)
+PLAIN_INTEGER = re.compile(r"\d[\d_]*")
+
+# Keywords after which a `/` starts a regular expression rather than a division
+REGEX_KEYWORDS = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw",
+    "case", "do", "else", "yield", "await",
+}
+# A line break right after / before these can never end a statement early
+JOIN_AFTER = set("{([,;")
+JOIN_BEFORE = set("})],;")
+
+JS_TOKEN = re.compile(
+    r"""
+    (?P<space>[ \t\f\v\u00a0\ufeff]+)
+  | (?P<newline>(?:\r\n|[\n\r\u2028\u2029])+)
+  | (?P<line_comment>//[^\n\r\u2028\u2029]*)
+  | (?P<block_comment>/\*[\s\S]*?\*/)
+  | (?P<string>"(?:[^"\\\n\r]|\\[\s\S])*"|'(?:[^'\\\n\r]|\\[\s\S])*')
+  | (?P<word>[A-Za-z_$\u0080-\uffff\\][\w$\u0080-\uffff\\]*|\#[\w$]+)
+  | (?P<number>(?:\d[\w.]*|\.\d[\w]*)(?:[eE][+-]\d+)?)
+  | (?P<backtick>`)
+  | (?P<slash>/)
+  | (?P<punct>[\s\S])
+    """,
+    re.VERBOSE,
+)
+# Template literal text up to the closing backtick or the next substitution
+TEMPLATE_CHUNK = re.compile(r"(?:[^`\\$]|\\[\s\S]|\$(?!\{))*")
+# Body and flags of a regular expression literal, after its opening slash
+REGEX_BODY = re.compile(r"(?:[^/\\\[\n\r]|\\.|\[(?:[^\]\\\n\r]|\\.)*\])*/[A-Za-z]*")
+
+
+class MinifyError(ValueError):
+    pass
+
+
+def _needs_space(left: str, right: str) -> bool:
+    """Whether removing the whitespace between two tokens would merge them."""
+    a, b = left[-1], right[0]
+    if IDENT_CHAR.match(a) and IDENT_CHAR.match(b):
+        return True
+    # a + +b, a - -b, a / /re/, x => y stays the same; `a- -b` must not become `a--b`
+    return (
+        (a in "+-" and b == a)
+        or (a == "/" and b in "/*")
+        or (a == "." and b.isdigit())
+        or (b == "." and PLAIN_INTEGER.fullmatch(left) is not None)
+    )
+
+
+def minify_js(source: str) -> str:
+    out = []
+    pending = ""           # whitespace seen since the last token: "", " " or "\n"
+    last = ""              # last significant token ("value" for literals), for the regex-or-division decision
+    braces = []            # open `{` count inside each active ${...} substitution
+    pos = 0
+    length = len(source)
+
+    def emit(text: str):
+        nonlocal pending
+        if pending and out:
+            prev = out[-1]
+            if pending == "\n":
+                if prev[-1] not in JOIN_AFTER and text[0] not in JOIN_BEFORE:
+                    out.append("\n")
+            elif _needs_space(prev, text):
+                out.append(" ")
+        pending = ""
+        out.append(text)
+
+    def template(start: int) -> int:
+        """Emits template text from `start`; returns the position after a closing ` or an opening ${."""
+        end = TEMPLATE_CHUNK.match(source, start).end()
+        if end >= length:
+            raise MinifyError("Unterminated template literal")
+        if source[end] == "`":
+            out.append(source[start:end + 1])
+            return end + 1
+        out.append(source[start:end + 2])
+        braces.append(0)
+        return end + 2
+
+    while pos < length:
+        match = JS_TOKEN.match(source, pos)
+        kind, text = match.lastgroup, match.group()
+        pos = match.end()
+
+        if kind == "space":
+            pending = pending or " "
+        elif kind == "newline":
+            pending = "\n"
+        elif kind == "line_comment":
+            pending = pending or " "
+        elif kind == "block_comment":
+            if LICENSE.search(text):
+                emit(text)
+                pending = "\n"
+            else:
+                # A comment spanning lines still separates statements
+                pending = "\n" if "\n" in text or pending == "\n" else pending or " "
+        elif kind == "backtick":
+            emit("`")
+            pos = template(pos)
+            last = "value"
+        elif kind == "slash":
+            if last in (")", "]", "}", "value") or (IDENT_CHAR.match(last[-1:]) and last not in REGEX_KEYWORDS):
+                emit("/")
+                last = "/"
+            else:
+                body = REGEX_BODY.match(source, pos)
+                if not body:
+                    raise MinifyError(f"Unterminated regular expression at offset {pos}")
+                emit("/" + body.group())
+                pos = body.end()
+                last = "value"
+        elif kind == "punct" and text == "{" and braces:
+            braces[-1] += 1
+            emit(text)
+            last = text
+        elif kind == "punct" and text == "}" and braces:
+            if braces[-1] == 0:
+                # End of a ${...} substitution: back inside the template literal
+                braces.pop()
+                pending = ""
+                out.append("}")
+                pos = template(pos)
+                last = "value"
+            else:
+                braces[-1] -= 1
+                emit(text)
+                last = text
+        else:
+            emit(text)
+            last = "value" if kind in ("string", "number") else text
+
+    if braces:
+        raise MinifyError("Unterminated template literal")
+    return "".join(out) + "\n"
+
+
+CSS_TOKEN = re.compile(
+    r"""
+    (?P<comment>/\*[\s\S]*?\*/)
+  | (?P<string>"(?:[^"\\]|\\[\s\S])*"|'(?:[^'\\]|\\[\s\S])*')
+  | (?P<space>\s+)
+  | (?P<other>[^\s"'/]+|/)
+    """,
+    re.VERBOSE,
+)
+# Whitespace next to these never matters. A space before `:` does (`a :hover` vs `a:hover`),
+# one after it doesn't.
+CSS_TIGHT_BEFORE = set("{};,>:")
+CSS_TIGHT_AFTER = set("{};,>")
+
+
+def minify_css(source: str) -> str:
+    out = []
+    last_kind = ""
+    space = False
+    for match in CSS_TOKEN.finditer(source):
+        kind, text = match.lastgroup, match.group()
+        if kind == "comment" and not LICENSE.search(text):
+            space = space or bool(out)
+            continue
+        if kind == "space":
+            space = True
+            continue
+        if kind == "other":
+            # The last declaration in a block needs no semicolon
+            text = text.replace(";}", "}")
+            if text[0] == "}" and last_kind == "other" and out[-1].endswith(";"):
+                out[-1] = out[-1][:-1]
+                if not out[-1]:
+                    # The semicolon was a token of its own (`red ; }`)
+                    out.pop()
+        if space and out and out[-1][-1] not in CSS_TIGHT_BEFORE and text[0] not in CSS_TIGHT_AFTER:
+            out.append(" ")
+        space = False
+        out.append(text)
+        last_kind = kind
+    return "".join(out) + "\n"
+
+
+def minify_json(source: str) -> str:
+    return json.dumps(json.loads(source), ensure_ascii=False, separators=(",", ":"))
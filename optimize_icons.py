@@ -1,5 +1,6 @@
 from PIL import Image, ImageOps
 import os
+import image_utils
 
 def optimize_icons():
     source_path = "images/logo.png"
@@ -23,20 +24,9 @@ def optimize_icons():
         # 2. If bbox is full image, maybe it has a white background? 
         # Let's try to trim white background as well.
         
-        # Create a mask where non-white pixels are opaque
-        # (considering "white" as > 240 in all channels)
-        datas = original_img.getdata()
-        new_data = []
-        for item in datas:
-            # item is (r, g, b, a)
-            if item[0] > 240 and item[1] > 240 and item[2] > 240:
-                new_data.append((255, 255, 255, 0)) # Make white transparent for cropping purposes
-            else:
-                new_data.append(item)
-        
-        temp_img = Image.new("RGBA", original_img.size)
-        temp_img.putdata(new_data)
-        content_bbox = temp_img.getbbox()
+        # Treat near-white pixels (> 240 in all channels) as transparent for cropping purposes
+        pixels = image_utils.load_rgba(original_img)
+        content_bbox = image_utils.bbox(image_utils.visible(pixels) & ~image_utils.near_white(pixels, 240))
         
         if content_bbox:
             print(f"Found content bbox: {content_bbox}")
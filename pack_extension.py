@@ -1,70 +1,350 @@
-import zipfile
+"""
+Packages the extension into extension.zip.
+
+Usage:
+    python pack_extension.py
+    python pack_extension.py --budget 600 --file-budget 'lib/*=450'
+    python pack_extension.py --no-minify --output /tmp/extension.zip
+    python pack_extension.py --bundle cache --bundle-words words.txt
+
+JS and CSS lose their comments and whitespace (see minify.py), JSON is compacted and
+PNGs are re-encoded losslessly, keeping whichever encoding is smallest. Processed files
+are cached in .pack_cache/ by content hash, so only files that changed are redone. The
+zip itself is reproducible: sorted entries, fixed timestamps and permissions, so the
+same sources always give byte-identical output. The sizes are reported per file and
+the run fails if the package, or any file matched by --file-budget, is over budget.
+
+With --bundle, backend/export_bundle.py builds the offline etymology bundle from the
+backend's cache (or a JSON file) and it is shipped as data/etymology.bin, which
+background.js consults before calling the API.
+"""
+import argparse
+import fnmatch
+import hashlib
+import io
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from minify import MinifyError, minify_css, minify_js, minify_json
+
+# Files and directories to include
+INCLUDE_FILES = [
+    'manifest.json',
+    'background.js',
+    'content.js',
+    'config.js',
+    'style.css',
+    'popup.html',
+    'popup.js',
+    'popup.css',
+    'pdf_viewer.html',
+    'pdf_viewer.js',
+    'pdf_viewer.css',
+]
+INCLUDE_DIRS = [
+    'images',
+    'lib',
+]
+
+OUTPUT_FILE = 'extension.zip'
+BACKEND_DIR = 'backend'
+BUNDLE_FILE = 'data/etymology.bin'
+# Deflated size of the etymology bundle, in KB
+DEFAULT_BUNDLE_MAX_KB = 96
+CACHE_DIR = '.pack_cache'
+# Compressed size of the whole package, in KB, with room for the etymology bundle
+DEFAULT_BUDGET_KB = 700
+# Bump when any processing changes, so cached outputs are redone
+PROCESSOR_VERSION = 1
+
+# Fixed entry metadata for reproducible zips (1980-01-01 is the earliest a zip can store)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644
+ZIP_COMPRESS_LEVEL = 9
+
+
+def collect_files(source_dir: str) -> Dict[str, bytes]:
+    """{archive name: contents} of everything that goes into the package."""
+    files = {}
+    for file in INCLUDE_FILES:
+        path = os.path.join(source_dir, file)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                files[file] = f.read()
+        else:
+            print(f"Warning: File {file} not found, skipping.")
+
+    for directory in INCLUDE_DIRS:
+        dir_path = os.path.join(source_dir, directory)
+        if not os.path.exists(dir_path):
+            print(f"Warning: Directory {directory} not found, skipping.")
+            continue
+        for root, _, names in os.walk(dir_path):
+            for name in names:
+                path = os.path.join(root, name)
+                # Archive names always use forward slashes
+                arcname = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    files[arcname] = f.read()
+    return files
+
+
+def build_bundle(source_dir: str, source: str, words: Optional[str] = None, limit: Optional[int] = None,
+                 max_kb: int = DEFAULT_BUNDLE_MAX_KB) -> bytes:
+    """Runs the backend's exporter; `source` is 'cache' or a {word: entry} JSON file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'etymology.bin')
+        # The exporter runs from backend/, so paths given here must be absolute
+        command = [sys.executable, 'export_bundle.py', '--output', output, '--max-kb', str(max_kb)]
+        if source != 'cache':
+            command += ['--json', os.path.abspath(source)]
+        if words:
+            command += ['--words', os.path.abspath(words)]
+        if limit:
+            command += ['--limit', str(limit)]
+        print("Building etymology bundle...")
+        subprocess.run(command, cwd=os.path.join(source_dir, BACKEND_DIR), check=True)
+        with open(output, 'rb') as f:
+            return f.read()
+
+
+def node_accepts(source: bytes, suffix: str) -> bool:
+    """Whether `node --check` parses the script; True when node isn't installed."""
+    node = shutil.which('node')
+    if not node:
+        return True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'check' + suffix)
+        with open(path, 'wb') as f:
+            f.write(source)
+        return subprocess.run([node, '--check', path], capture_output=True).returncode == 0
+
+
+def process_js(data: bytes, suffix: str) -> bytes:
+    try:
+        minified = minify_js(data.decode('utf-8')).encode('utf-8')
+    except (MinifyError, UnicodeDecodeError) as e:
+        print(f"  Warning: not minified ({e})")
+        return data
+    # Only ship output that still parses; otherwise fall back to the original
+    if not node_accepts(minified, suffix):
+        print("  Warning: minified output doesn't parse, keeping the original")
+        return data
+    return minified
+
+
+def exact_palette(pixels: np.ndarray) -> Optional[Image.Image]:
+    """The RGBA pixels as a palette image with per-entry alpha, if they use at most 256 colors."""
+    flat = pixels.reshape(-1, 4)
+    colors, indexes = np.unique(flat.view(np.uint32).ravel(), return_inverse=True)
+    if len(colors) > 256:
+        return None
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    img = Image.fromarray(indexes.astype(np.uint8).reshape(pixels.shape[:2]), 'P')
+    img.putpalette(palette[:, :3].tobytes())
+    if (palette[:, 3] < 255).any():
+        img.info['transparency'] = palette[:, 3].tobytes()
+    return img
+
+
+def optimize_png(data: bytes) -> bytes:
+    """The smallest lossless re-encoding of a PNG, or the original if none is smaller."""
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        pixels = np.asarray(img.convert('RGBA'))
+        candidates = [img]
+        if (pixels[..., 3] == 255).all() and img.mode != 'RGB':
+            candidates.append(img.convert('RGB'))
+        palette = exact_palette(pixels)
+        if palette is not None:
+            candidates.append(palette)
 
-def create_zip(source_dir, output_filename):
-    # Files and directories to include
-    include_files = [
-        'manifest.json',
-        'background.js',
-        'content.js',
-        'config.js',
-        'style.css',
-        'popup.html',
-        'popup.js',
-        'popup.css',
-        'pdf_viewer.html',
-        'pdf_viewer.js',
-        'pdf_viewer.css'
-    ]
-    
-    include_dirs = [
-        'images',
-        'lib'
-    ]
+        best = data
+        for candidate in candidates:
+            out = io.BytesIO()
+            candidate.save(out, format='PNG', optimize=True, icc_profile=img.info.get('icc_profile'),
+                           transparency=candidate.info.get('transparency'))
+            encoded = out.getvalue()
+            if len(encoded) >= len(best):
+                continue
+            # Keep an encoding only if it decodes to exactly the same pixels
+            with Image.open(io.BytesIO(encoded)) as check:
+                if np.array_equal(np.asarray(check.convert('RGBA')), pixels):
+                    best = encoded
+        return best
 
+
+def process(arcname: str, data: bytes, minify: bool = True) -> bytes:
+    ext = os.path.splitext(arcname)[1].lower()
+    if ext == '.png':
+        return optimize_png(data)
+    if not minify:
+        return data
+    if ext in ('.js', '.mjs'):
+        return process_js(data, ext)
+    if ext == '.css':
+        return minify_css(data.decode('utf-8')).encode('utf-8')
+    if ext == '.json':
+        return minify_json(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+class ProcessCache:
+    """Processed file contents in a directory, keyed by a hash of the input and how it was processed."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, arcname: str, data: bytes, minify: bool) -> str:
+        digest = hashlib.sha256()
+        # Whether node was there to check the JS changes what was produced
+        digest.update(f"{PROCESSOR_VERSION}:{os.path.splitext(arcname)[1].lower()}:{minify}:{bool(shutil.which('node'))}\0".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, key: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def processed(self, arcname: str, data: bytes, minify: bool = True) -> Tuple[bytes, bool]:
+        """(processed contents, whether they came from the cache)."""
+        key = self.key(arcname, data, minify)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, True
+        self.misses += 1
+        print(f"Processing {arcname}...")
+        result = process(arcname, data, minify)
+        self.put(key, result)
+        return result, False
+
+
+def write_zip(output_filename: str, files: Dict[str, bytes]) -> Dict[str, int]:
+    """Writes a reproducible zip; returns {archive name: compressed size}."""
+    tmp = output_filename + '.tmp'
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL) as zipf:
+        for arcname in sorted(files):
+            info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 3  # Unix, so external_attr holds the permissions
+            info.external_attr = ZIP_FILE_MODE << 16
+            zipf.writestr(info, files[arcname], compresslevel=ZIP_COMPRESS_LEVEL)
+        sizes = {info.filename: info.compress_size for info in zipf.infolist()}
+    os.replace(tmp, output_filename)
+    return sizes
+
+
+def parse_file_budget(value: str) -> Tuple[str, int]:
+    pattern, sep, kb = value.rpartition('=')
+    if not sep or not pattern or not kb.isdigit():
+        raise argparse.ArgumentTypeError(f"expected GLOB=KB, got {value!r}")
+    return pattern, int(kb)
+
+
+def report(rows: List[Tuple[str, int, int, int, bool]], total: int, budget_kb: int,
+           file_budgets: List[Tuple[str, int]]) -> bool:
+    """Prints the size table; returns whether everything is within budget."""
+    print(f"\n{'file':40} {'original':>10} {'processed':>10} {'zipped':>10} {'saved':>7}")
+    original_total = 0
+    for arcname, original, processed, compressed, cached in rows:
+        original_total += original
+        saved = 1 - compressed / original if original else 0
+        print(f"{arcname:40} {original:10,} {processed:10,} {compressed:10,} {saved:7.1%}{'  (cached)' if cached else ''}")
+    print(f"{'total':40} {original_total:10,} {'':10} {total:10,} {1 - total / original_total if original_total else 0:7.1%}")
+
+    ok = True
+    for pattern, kb in file_budgets:
+        matched = sum(compressed for arcname, _, _, compressed, _ in rows if fnmatch.fnmatch(arcname, pattern))
+        if matched > kb * 1024:
+            print(f"Over budget: {pattern} is {matched / 1024:.1f} KB, budget {kb} KB")
+            ok = False
+    print(f"Package size {total / 1024:.1f} KB of {budget_kb} KB budget")
+    if total > budget_kb * 1024:
+        print(f"Over budget by {(total - budget_kb * 1024) / 1024:.1f} KB")
+        ok = False
+    return ok
+
+
+def create_zip(source_dir: str, output_filename: str, budget_kb: int = DEFAULT_BUDGET_KB,
+               file_budgets: Optional[List[Tuple[str, int]]] = None, minify: bool = True,
+               cache_dir: str = CACHE_DIR, generated: Optional[Dict[str, bytes]] = None) -> bool:
+    """Packages `source_dir`, plus `generated` {archive name: contents} built for this run."""
     # Check if source dir exists
     if not os.path.exists(source_dir):
         print(f"Error: Source directory '{source_dir}' does not exist.")
         return False
 
     try:
-        with zipfile.ZipFile(output_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add individual files
-            for file in include_files:
-                file_path = os.path.join(source_dir, file)
-                if os.path.exists(file_path):
-                    print(f"Adding {file}...")
-                    zipf.write(file_path, arcname=file)
-                else:
-                    print(f"Warning: File {file} not found, skipping.")
-
-            # Add directories
-            for directory in include_dirs:
-                dir_path = os.path.join(source_dir, directory)
-                if os.path.exists(dir_path):
-                    for root, _, files in os.walk(dir_path):
-                        for file in files:
-                            abs_path = os.path.join(root, file)
-                            # Calculate relative path for archive
-                            rel_path = os.path.relpath(abs_path, source_dir)
-                            print(f"Adding {rel_path}...")
-                            zipf.write(abs_path, arcname=rel_path)
-                else:
-                    print(f"Warning: Directory {directory} not found, skipping.")
-        
-        print(f"\nSuccessfully created {output_filename}")
-        return True
+        # 1. Read, then minify / recompress whatever the cache doesn't already have
+        sources = collect_files(source_dir)
+        sources.update(generated or {})
+        cache = ProcessCache(os.path.join(source_dir, cache_dir))
+        files = {}
+        cached = {}
+        for arcname, data in sources.items():
+            files[arcname], cached[arcname] = cache.processed(arcname, data, minify)
 
+        # 2. Deflate is cheap next to the processing, so the zip is always written in full
+        compressed = write_zip(output_filename, files)
     except Exception as e:
         print(f"Error creating zip: {e}")
         return False
 
+    print(f"\nSuccessfully created {output_filename} ({cache.hits} files cached, {cache.misses} processed)")
+    rows = [(name, len(sources[name]), len(files[name]), compressed[name], cached[name]) for name in sorted(files)]
+    return report(rows, os.path.getsize(output_filename), budget_kb, file_budgets or [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Package the extension into a size-budgeted, reproducible zip")
+    parser.add_argument("--source", default=os.getcwd(), help="Extension directory (default: current directory)")
+    parser.add_argument("--output", help=f"Zip to write (default: {OUTPUT_FILE} in --source)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET_KB, help="Maximum package size in KB")
+    parser.add_argument("--file-budget", type=parse_file_budget, action="append", metavar="GLOB=KB",
+                        help="Maximum zipped size of the files matching GLOB, e.g. 'lib/*=450'; repeatable")
+    parser.add_argument("--no-minify", action="store_true", help="Ship JS/CSS/JSON as they are (PNGs are still optimized)")
+    parser.add_argument("--bundle", metavar="SOURCE",
+                        help=f"Ship an offline etymology bundle as {BUNDLE_FILE}, built from 'cache' (the backend's etymology cache) or a {{word: entry}} JSON file")
+    parser.add_argument("--bundle-words", help="Frequency list ranking the bundled words (default: backend/data/common_words.txt)")
+    parser.add_argument("--bundle-limit", type=int, help="Only consider the N most frequent words of the list")
+    parser.add_argument("--bundle-max-kb", type=int, default=DEFAULT_BUNDLE_MAX_KB, help="Cap on the bundle's zipped size in KB")
+    args = parser.parse_args()
+
+    generated = {}
+    if args.bundle:
+        try:
+            generated[BUNDLE_FILE] = build_bundle(args.source, args.bundle, args.bundle_words, args.bundle_limit, args.bundle_max_kb)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Error building etymology bundle: {e}")
+            return 1
+
+    output_zip = args.output or os.path.join(args.source, OUTPUT_FILE)
+    print(f"Packaging extension from {args.source} to {output_zip}...")
+    ok = create_zip(args.source, output_zip, args.budget, args.file_budget, not args.no_minify, generated=generated)
+    return 0 if ok else 1
+
+
 if __name__ == "__main__":
-    # Get current directory
-    current_dir = os.getcwd()
-    # Define output file
-    output_zip = os.path.join(current_dir, "extension.zip")
-    
-    print(f"Packaging extension from {current_dir} to {output_zip}...")
-    create_zip(current_dir, output_zip)
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The packaging scripts run from the repository root with flat imports; do the same for the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
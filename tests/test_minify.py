@@ -0,0 +1,67 @@
+import pytest
+
+from minify import MinifyError, minify_css, minify_js
+
+
+@pytest.mark.parametrize("source, minified", [
+    # A line break that may end a statement stays; one inside brackets or after an operator goes
+    ("x = 1\ny = 2", "x=1\ny=2"),
+    ("return\nvalue", "return\nvalue"),
+    ("a\n++b", "a\n++b"),
+    ("f(\n  a,\n  b\n)", "f(a,b)"),
+    ("x = [\n1,\n2\n]", "x=[1,2]"),
+])
+def test_keeps_line_breaks_for_semicolon_insertion(source, minified):
+    assert minify_js(source) == minified + "\n"
+
+
+@pytest.mark.parametrize("source, minified", [
+    ("a = b / c / d", "a=b/c/d"),
+    ("x = (a) / 2", "x=(a)/2"),
+    ("return /x\\/y/g.test(s)", "return/x\\/y/g.test(s)"),
+    ("s.replace(/[/*]/g, '')", "s.replace(/[/*]/g,'')"),
+    ("x = y // comment\n/ 2", "x=y\n/2"),
+])
+def test_tells_regex_from_division(source, minified):
+    assert minify_js(source) == minified + "\n"
+
+
+def test_nested_templates_are_copied_verbatim():
+    source = "x = `a ${ `b ${ {c: 1}.c } ` }  d`"
+    assert minify_js(source) == "x=`a ${`b ${{c:1}.c} `}  d`\n"
+
+
+@pytest.mark.parametrize("source, minified", [
+    ("a - -b", "a- -b"),
+    ("a + +b", "a+ +b"),
+    ("a + -b", "a+-b"),
+    ("1 .toString()", "1 .toString()"),
+    ("1.5 .toFixed()", "1.5.toFixed()"),
+    ("x = a . b", "x=a.b"),
+    ("typeof x", "typeof x"),
+])
+def test_keeps_spaces_that_separate_tokens(source, minified):
+    assert minify_js(source) == minified + "\n"
+
+
+def test_keeps_license_comments():
+    source = "/*! keep me */\n/* drop me */\nvar a = 1; // and me"
+    assert minify_js(source) == "/*! keep me */\nvar a=1;\n"
+
+
+@pytest.mark.parametrize("source", ["x = `open", "x = /open", "`${ a `"])
+def test_unterminated_literals(source):
+    with pytest.raises(MinifyError):
+        minify_js(source)
+
+
+@pytest.mark.parametrize("source, minified", [
+    # `a :hover` is a descendant's hover, `a:hover` the link's own
+    ("a :hover { color: red; }", "a :hover{color:red}"),
+    ("a:hover { color: red; }", "a:hover{color:red}"),
+    ("p > a , b { margin: 0 auto ; }", "p>a,b{margin:0 auto}"),
+    ("/* note */ a { content: \"  x  \" }", "a{content:\"  x  \"}"),
+    ("/*! keep */ a { b: c }", "/*! keep */ a{b:c}"),
+])
+def test_minify_css(source, minified):
+    assert minify_css(source) == minified + "\n"